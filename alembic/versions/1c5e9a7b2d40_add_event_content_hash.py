@@ -0,0 +1,145 @@
+"""add event content hash
+
+Revision ID: 1c5e9a7b2d40
+Revises: 3f44d0596d73
+Create Date: 2017-09-02 14:12:08.513201
+
+Events used to be told apart by title only, so the old importer left
+out every row whose title it had already seen. An event's hash
+includes its position in its point, counting those rows too, so the
+backfill replays the stats file the events came from to find it. Point
+it at that file with `alembic -x stats_file=... upgrade head`; it
+defaults to the old importer's STATS_FILE. Events it can't find there
+are numbered in the order they were stored.
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '1c5e9a7b2d40'
+down_revision = '3f44d0596d73'
+
+from collections import defaultdict
+import csv
+import hashlib
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+# The hashes as app.lib.helpers made them when this was written, and
+# the old importer's titles, frozen so this doesn't change with them.
+POINT_COLUMNS = ('date', 'tournament', 'opponent', 'our_score', 'their_score')
+HASH_COLUMNS = ('action', 'passer', 'receiver', 'defender')
+STATS_FILE = 'data/classy_data_2016.csv'
+
+
+def to_unicode(value):
+    if value is None:
+        return u""
+    if isinstance(value, str):
+        return value.decode('utf-8')
+    return unicode(value)
+
+
+def point_key(row):
+    return tuple(to_unicode(row[column]) for column in POINT_COLUMNS)
+
+
+def event_hash(row, sequence):
+    parts = list(point_key(row))
+    parts.append(to_unicode(sequence))
+    parts.extend(to_unicode(row[column]) for column in HASH_COLUMNS)
+    return hashlib.sha1(u"|".join(parts).encode('utf-8')).hexdigest()
+
+
+def play(row):
+    action = row['Action']
+    if action == "Catch":
+        return "{} to {}".format(row['Passer'], row['Receiver'])
+    elif action == "Drop":
+        return "Drop by {}".format(row['Receiver'])
+    elif action == "D":
+        return "Block by {}".format(row['Defender'])
+    elif action == "Goal":
+        return "Goal from {} to {}".format(row['Passer'], row['Receiver'])
+    elif action == "Pull":
+        return "Pull by {}".format(row['Defender'])
+    elif action == "PullOb":
+        return "OB pull by {}".format(row['Defender'])
+    elif action == "Throwaway":
+        return "Throwaway by {}".format(row['Passer'])
+    return "Unknown play"
+
+
+def title(row):
+    return to_unicode("{} > {} > {}-{} > {}".format(
+        row['Tournamemnt'], row['Opponent'], row['Our Score - End of Point'],
+        row['Their Score - End of Point'], play(row)
+    ))
+
+
+def title_positions(stats_file):
+    """
+    The position in its point of the row the old importer kept for each
+    title: the first one with it.
+    """
+    if not os.path.exists(stats_file):
+        return {}
+
+    positions = {}
+    seen = defaultdict(int)
+    with open(stats_file, 'rb') as csvfile:
+        reader = csv.DictReader(csvfile, delimiter=',')
+        reader.next()
+        for row in reader:
+            point = point_key({
+                'date': row['Date/Time'],
+                'tournament': row['Tournamemnt'],
+                'opponent': row['Opponent'],
+                'our_score': row['Our Score - End of Point'],
+                'their_score': row['Their Score - End of Point'],
+            })
+            positions.setdefault(title(row), seen[point])
+            seen[point] += 1
+    return positions
+
+
+def stats_file():
+    from alembic import context
+    return context.get_x_argument(as_dictionary=True).get('stats_file', STATS_FILE)
+
+
+def upgrade():
+    op.add_column('events', sa.Column('content_hash', sa.String(length=40), nullable=True))
+    backfill(stats_file())
+    op.create_index(op.f('ix_events_content_hash'), 'events', ['content_hash'], unique=True)
+
+
+def backfill(stats_file):
+    conn = op.get_bind()
+    events = conn.execute(sa.text(
+        "SELECT id, title, date, tournament, opponent, our_score, their_score, "
+        "action, passer, receiver, defender FROM events ORDER BY id"
+    ))
+    from_file = title_positions(stats_file)
+    stored = defaultdict(int)
+    hashes = []
+    for event in events:
+        point = point_key(event)
+        position = from_file.get(to_unicode(event['title']), stored[point])
+        hashes.append({
+            'event_id': event['id'],
+            'content_hash': event_hash(event, position),
+        })
+        stored[point] += 1
+
+    if hashes:
+        conn.execute(
+            sa.text("UPDATE events SET content_hash = :content_hash WHERE id = :event_id"),
+            hashes
+        )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_events_content_hash'), table_name='events')
+    op.drop_column('events', 'content_hash')
@@ -23,13 +23,13 @@ def upgrade():
     sa.PrimaryKeyConstraint('id')
     )
     op.add_column(u'players', sa.Column('team_id', sa.Integer(), nullable=True))
-    op.create_foreign_key(None, 'players', 'teams', ['team_id'], ['id'])
+    op.create_foreign_key('players_team_id_fkey', 'players', 'teams', ['team_id'], ['id'])
     ### end Alembic commands ###
 
 
 def downgrade():
     ### commands auto generated by Alembic - please adjust! ###
-    op.drop_constraint(None, 'players', type_='foreignkey')
+    op.drop_constraint('players_team_id_fkey', 'players', type_='foreignkey')
     op.drop_column(u'players', 'team_id')
     op.drop_table('teams')
     ### end Alembic commands ###
@@ -0,0 +1,146 @@
+"""add points
+
+Revision ID: 4a9d2f6c8e13
+Revises: 1c5e9a7b2d40
+Create Date: 2017-09-09 11:47:52.106384
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4a9d2f6c8e13'
+down_revision = '1c5e9a7b2d40'
+
+from collections import OrderedDict
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+LINEUP_COLUMNS = [
+    'player_1', 'player_2', 'player_3', 'player_4',
+    'player_5', 'player_6', 'player_7',
+]
+
+# as app.lib.helpers.point_hash was when this was written: points have
+# to keep the keys the importer gives them, but this mustn't change
+# with it.
+POINT_COLUMNS = ('date', 'tournament', 'opponent', 'our_score', 'their_score')
+
+
+def to_unicode(value):
+    if value is None:
+        return u""
+    if isinstance(value, str):
+        return value.decode('utf-8')
+    return unicode(value)
+
+
+def point_hash(row):
+    key = u"|".join(to_unicode(row[column]) for column in POINT_COLUMNS)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def upgrade():
+    op.create_table('points',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=40), nullable=True),
+    sa.Column('date', sa.String(length=55), nullable=True),
+    sa.Column('tournament', sa.String(length=55), nullable=True),
+    sa.Column('opponent', sa.String(length=55), nullable=True),
+    sa.Column('our_score', sa.Integer(), nullable=True),
+    sa.Column('their_score', sa.Integer(), nullable=True),
+    sa.Column('line', sa.String(length=25), nullable=True),
+    sa.Column('outcome', sa.String(length=25), nullable=True),
+    sa.Column('duration', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_points_key'), 'points', ['key'], unique=True)
+    op.create_table('point_players',
+    sa.Column('point_id', sa.Integer(), nullable=False),
+    sa.Column('player_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['player_id'], ['players.id'], ),
+    sa.ForeignKeyConstraint(['point_id'], ['points.id'], ),
+    sa.PrimaryKeyConstraint('point_id', 'player_id')
+    )
+    op.create_index(op.f('ix_point_players_player_id'), 'point_players', ['player_id'], unique=False)
+    op.add_column('events', sa.Column('point_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_events_point_id'), 'events', ['point_id'], unique=False)
+    op.create_foreign_key('events_point_id_fkey', 'events', 'points', ['point_id'], ['id'])
+
+    backfill()
+
+
+def backfill():
+    """
+    Same grouping the importer does: one point per game and score, the
+    lineup from its first event, outcome from its goal.
+    """
+    conn = op.get_bind()
+    events = conn.execute(sa.text(
+        "SELECT id, date, tournament, opponent, our_score, their_score, line, "
+        "seconds_elapsed, event_type, action, {} FROM events ORDER BY id".format(
+            ", ".join(LINEUP_COLUMNS))
+    ))
+
+    points = OrderedDict()
+    event_points = []
+    for event in events:
+        key = point_hash(event)
+        if key not in points:
+            points[key] = {
+                'key': key,
+                'date': event['date'],
+                'tournament': event['tournament'],
+                'opponent': event['opponent'],
+                'our_score': event['our_score'],
+                'their_score': event['their_score'],
+                'line': event['line'],
+                'outcome': None,
+                'duration': 0,
+                'players': set(event[c] for c in LINEUP_COLUMNS) - set([None]),
+            }
+        point = points[key]
+        point['duration'] = max(point['duration'], event['seconds_elapsed'] or 0)
+        if event['action'] == "Goal":
+            point['outcome'] = "won" if event['event_type'] == "Offense" else "lost"
+        event_points.append({'event_id': event['id'], 'key': key})
+
+    if not points:
+        return
+
+    conn.execute(
+        sa.text(
+            "INSERT INTO points (key, date, tournament, opponent, our_score, "
+            "their_score, line, outcome, duration) VALUES (:key, :date, "
+            ":tournament, :opponent, :our_score, :their_score, :line, "
+            ":outcome, :duration)"
+        ),
+        points.values()
+    )
+    point_ids = dict(conn.execute(sa.text("SELECT key, id FROM points")).fetchall())
+
+    conn.execute(
+        sa.text("INSERT INTO point_players (point_id, player_id) VALUES (:point_id, :player_id)"),
+        [
+            {'point_id': point_ids[key], 'player_id': player_id}
+            for key, point in points.iteritems()
+            for player_id in point['players']
+        ]
+    )
+    conn.execute(
+        sa.text("UPDATE events SET point_id = :point_id WHERE id = :event_id"),
+        [
+            {'event_id': e['event_id'], 'point_id': point_ids[e['key']]}
+            for e in event_points
+        ]
+    )
+
+
+def downgrade():
+    op.drop_constraint('events_point_id_fkey', 'events', type_='foreignkey')
+    op.drop_index(op.f('ix_events_point_id'), table_name='events')
+    op.drop_column('events', 'point_id')
+    op.drop_index(op.f('ix_point_players_player_id'), table_name='point_players')
+    op.drop_table('point_players')
+    op.drop_index(op.f('ix_points_key'), table_name='points')
+    op.drop_table('points')
@@ -0,0 +1,83 @@
+"""add aggregate tables
+
+Revision ID: 6d0e2b8f4c17
+Revises: 58b1e3d7a920
+Create Date: 2017-09-23 14:20:08.531946
+
+Fill them afterwards with `python manage.py rebuild_aggregates`.
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '6d0e2b8f4c17'
+down_revision = '58b1e3d7a920'
+
+from alembic import op
+import sqlalchemy as sa
+
+TEAM_COUNTERS = [
+    'events', 'passes', 'receives', 'goals_for', 'goals_against',
+    'turnovers', 'dees',
+]
+
+
+def counters(names):
+    return [
+        sa.Column(name, sa.Integer(), nullable=False, server_default='0')
+        for name in names
+    ]
+
+
+def upgrade():
+    op.create_table('player_stats',
+    sa.Column('player_id', sa.Integer(), nullable=False),
+    *counters([
+        'passes', 'assists', 'throwaways', 'receives', 'goals', 'drops',
+        'dees', 'points_played', 'o_points', 'd_points',
+    ]) + [
+    sa.ForeignKeyConstraint(['player_id'], ['players.id'], ),
+    sa.PrimaryKeyConstraint('player_id')
+    ])
+    op.create_table('pass_stats',
+    sa.Column('passer_id', sa.Integer(), nullable=False),
+    sa.Column('receiver_id', sa.Integer(), nullable=False),
+    sa.Column('passes', sa.Integer(), nullable=False, server_default='0'),
+    sa.ForeignKeyConstraint(['passer_id'], ['players.id'], ),
+    sa.ForeignKeyConstraint(['receiver_id'], ['players.id'], ),
+    sa.PrimaryKeyConstraint('passer_id', 'receiver_id')
+    )
+    op.create_table('point_stats',
+    sa.Column('point_id', sa.Integer(), nullable=False),
+    *counters(TEAM_COUNTERS) + [
+    sa.ForeignKeyConstraint(['point_id'], ['points.id'], ),
+    sa.PrimaryKeyConstraint('point_id')
+    ])
+    op.create_table('point_receives',
+    sa.Column('point_id', sa.Integer(), nullable=False),
+    sa.Column('player_id', sa.Integer(), nullable=False),
+    sa.Column('receives', sa.Integer(), nullable=False, server_default='0'),
+    sa.ForeignKeyConstraint(['player_id'], ['players.id'], ),
+    sa.ForeignKeyConstraint(['point_id'], ['points.id'], ),
+    sa.PrimaryKeyConstraint('point_id', 'player_id')
+    )
+    op.create_table('game_stats',
+    sa.Column('date', sa.String(length=55), nullable=False),
+    sa.Column('tournament', sa.String(length=55), nullable=False),
+    sa.Column('opponent', sa.String(length=55), nullable=False),
+    *counters(TEAM_COUNTERS + ['points']) + [
+    sa.PrimaryKeyConstraint('date', 'tournament', 'opponent')
+    ])
+    op.create_table('tournament_stats',
+    sa.Column('tournament', sa.String(length=55), nullable=False),
+    *counters(TEAM_COUNTERS + ['points']) + [
+    sa.PrimaryKeyConstraint('tournament')
+    ])
+
+
+def downgrade():
+    op.drop_table('tournament_stats')
+    op.drop_table('game_stats')
+    op.drop_table('point_receives')
+    op.drop_table('point_stats')
+    op.drop_table('pass_stats')
+    op.drop_table('player_stats')
@@ -0,0 +1,79 @@
+"""add event team and year
+
+Revision ID: 8e4a1c3b5f27
+Revises: 6d0e2b8f4c17
+Create Date: 2017-09-30 11:12:45.206318
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '8e4a1c3b5f27'
+down_revision = '6d0e2b8f4c17'
+
+from alembic import op
+import sqlalchemy as sa
+
+# every column that can hold a player id, lineup first
+PLAYER_COLUMNS = [
+    'player_1', 'player_2', 'player_3', 'player_4', 'player_5', 'player_6',
+    'player_7', 'passer', 'receiver', 'defender',
+]
+
+EVENT_INDEXES = [
+    ('ix_events_team_year_action', 'action'),
+    ('ix_events_team_year_passer', 'passer'),
+    ('ix_events_team_year_receiver', 'receiver'),
+    ('ix_events_team_year_defender', 'defender'),
+    ('ix_events_team_year_point', 'point_id'),
+]
+
+
+def upgrade():
+    op.add_column('events', sa.Column('team_id', sa.Integer(), nullable=True))
+    op.add_column('events', sa.Column('year', sa.String(length=25), nullable=True))
+    op.create_foreign_key('events_team_id_fkey', 'events', 'teams', ['team_id'], ['id'])
+    op.add_column('points', sa.Column('team_id', sa.Integer(), nullable=True))
+    op.add_column('points', sa.Column('year', sa.String(length=25), nullable=True))
+    op.create_foreign_key('points_team_id_fkey', 'points', 'teams', ['team_id'], ['id'])
+
+    backfill()
+
+    for name, column in EVENT_INDEXES:
+        op.create_index(name, 'events', ['team_id', 'year', column], unique=False)
+    op.create_index('ix_points_team_year', 'points', ['team_id', 'year'], unique=False)
+
+
+def backfill():
+    """
+    Players belong to one team and season, so an event gets those of
+    any of its players. Events without players (an opponent's goal)
+    take them from the rest of their point.
+    """
+    player = "COALESCE({})".format(", ".join(
+        "events.{}".format(column) for column in PLAYER_COLUMNS))
+    for column in ['team_id', 'year']:
+        op.execute(
+            "UPDATE events SET {column} = (SELECT players.{column} FROM players "
+            "WHERE players.id = {player})".format(column=column, player=player)
+        )
+        op.execute(
+            "UPDATE events SET {column} = (SELECT MAX(other.{column}) "
+            "FROM events AS other WHERE other.point_id = events.point_id) "
+            "WHERE {column} IS NULL".format(column=column)
+        )
+        op.execute(
+            "UPDATE points SET {column} = (SELECT MAX(events.{column}) "
+            "FROM events WHERE events.point_id = points.id)".format(column=column)
+        )
+
+
+def downgrade():
+    op.drop_index('ix_points_team_year', table_name='points')
+    for name, _ in EVENT_INDEXES:
+        op.drop_index(name, table_name='events')
+    op.drop_constraint('points_team_id_fkey', 'points', type_='foreignkey')
+    op.drop_column('points', 'year')
+    op.drop_column('points', 'team_id')
+    op.drop_constraint('events_team_id_fkey', 'events', type_='foreignkey')
+    op.drop_column('events', 'year')
+    op.drop_column('events', 'team_id')
@@ -0,0 +1,40 @@
+"""add pass stats outcomes
+
+Revision ID: 9b3f5d2a7c61
+Revises: 8e4a1c3b5f27
+Create Date: 2017-10-07 16:41:22.804113
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '9b3f5d2a7c61'
+down_revision = '8e4a1c3b5f27'
+
+from alembic import op
+import sqlalchemy as sa
+
+# counter to the events it counts, out of every pass between the two
+OUTCOMES = [
+    ('completions', "events.action != 'Drop'"),
+    ('drops', "events.action = 'Drop'"),
+    ('goals', "events.action = 'Goal'"),
+]
+
+
+def upgrade():
+    for name, _ in OUTCOMES:
+        op.add_column('pass_stats', sa.Column(
+            name, sa.Integer(), nullable=False, server_default='0'))
+
+    for name, condition in OUTCOMES:
+        op.execute(
+            "UPDATE pass_stats SET {name} = (SELECT COUNT(*) FROM events "
+            "WHERE events.passer = pass_stats.passer_id "
+            "AND events.receiver = pass_stats.receiver_id "
+            "AND {condition})".format(name=name, condition=condition)
+        )
+
+
+def downgrade():
+    for name, _ in reversed(OUTCOMES):
+        op.drop_column('pass_stats', name)
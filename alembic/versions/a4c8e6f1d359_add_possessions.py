@@ -0,0 +1,43 @@
+"""add possessions
+
+Revision ID: a4c8e6f1d359
+Revises: 9b3f5d2a7c61
+Create Date: 2017-10-14 10:27:51.390264
+
+Fill it afterwards with `python manage.py rebuild_aggregates`.
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'a4c8e6f1d359'
+down_revision = '9b3f5d2a7c61'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('possessions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('point_id', sa.Integer(), nullable=True),
+    sa.Column('team_id', sa.Integer(), nullable=True),
+    sa.Column('year', sa.String(length=25), nullable=True),
+    sa.Column('sequence', sa.Integer(), nullable=True),
+    sa.Column('line', sa.String(length=25), nullable=True),
+    sa.Column('offense', sa.Boolean(), nullable=True),
+    sa.Column('seconds_elapsed', sa.Integer(), nullable=True),
+    sa.Column('duration', sa.Integer(), nullable=True),
+    sa.Column('events', sa.Integer(), nullable=True),
+    sa.Column('outcome', sa.String(length=25), nullable=True),
+    sa.ForeignKeyConstraint(['point_id'], ['points.id'], ),
+    sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_possessions_point_id'), 'possessions', ['point_id'], unique=False)
+    op.create_index('ix_possessions_team_year', 'possessions', ['team_id', 'year'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_possessions_team_year', table_name='possessions')
+    op.drop_index(op.f('ix_possessions_point_id'), table_name='possessions')
+    op.drop_table('possessions')
@@ -0,0 +1,72 @@
+"""add played at
+
+Revision ID: b7d2e5a9c804
+Revises: a4c8e6f1d359
+Create Date: 2017-10-21 14:05:37.518240
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e5a9c804'
+down_revision = 'a4c8e6f1d359'
+
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+# as app.lib.helpers.TIMESTAMP_FORMATS
+TIMESTAMP_FORMATS = ('%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+
+INDEXES = [
+    ('ix_points_played_at', 'points', ['played_at']),
+    ('ix_points_team_played_at', 'points', ['team_id', 'played_at']),
+    ('ix_events_team_played_at', 'events', ['team_id', 'played_at']),
+    ('ix_events_played_at', 'events', ['played_at', 'point_id', 'seconds_elapsed']),
+]
+
+
+def parse_timestamp(value):
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime((value or '').strip(), fmt)
+        except ValueError:
+            pass
+    return None
+
+
+def upgrade():
+    for table in ['points', 'events']:
+        op.add_column(table, sa.Column('played_at', sa.DateTime(), nullable=True))
+
+    backfill()
+
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def backfill():
+    """
+    There's a date string per game, so each is parsed once and set on
+    its points; events take their point's.
+    """
+    connection = op.get_bind()
+    statement = sa.text(
+        "UPDATE points SET played_at = :played_at WHERE date = :date"
+    ).bindparams(sa.bindparam('played_at', type_=sa.DateTime()))
+    for (date,) in connection.execute("SELECT DISTINCT date FROM points").fetchall():
+        played_at = parse_timestamp(date)
+        if played_at is not None:
+            connection.execute(statement, played_at=played_at, date=date)
+
+    op.execute(
+        "UPDATE events SET played_at = (SELECT points.played_at FROM points "
+        "WHERE points.id = events.point_id)"
+    )
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    for table in ['events', 'points']:
+        op.drop_column(table, 'played_at')
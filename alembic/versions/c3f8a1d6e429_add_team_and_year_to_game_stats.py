@@ -0,0 +1,72 @@
+"""add team and year to game stats
+
+Revision ID: c3f8a1d6e429
+Revises: b7d2e5a9c804
+Create Date: 2017-10-28 15:32:04.118527
+
+Games and tournaments are counted per team and season now, which the
+old rows can't be split into. Refill them afterwards with `python
+manage.py rebuild_aggregates`.
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8a1d6e429'
+down_revision = 'b7d2e5a9c804'
+
+from alembic import op
+import sqlalchemy as sa
+
+TEAM_COUNTERS = [
+    'events', 'passes', 'receives', 'goals_for', 'goals_against',
+    'turnovers', 'dees',
+]
+
+
+def counters(names):
+    return [
+        sa.Column(name, sa.Integer(), nullable=False, server_default='0')
+        for name in names
+    ]
+
+
+def upgrade():
+    op.drop_table('tournament_stats')
+    op.drop_table('game_stats')
+
+    op.create_table('game_stats',
+    sa.Column('team_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('year', sa.String(length=25), nullable=False),
+    sa.Column('date', sa.String(length=55), nullable=False),
+    sa.Column('tournament', sa.String(length=55), nullable=False),
+    sa.Column('opponent', sa.String(length=55), nullable=False),
+    *counters(TEAM_COUNTERS + ['points']) + [
+    sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+    sa.PrimaryKeyConstraint('team_id', 'year', 'date', 'tournament', 'opponent')
+    ])
+    op.create_table('tournament_stats',
+    sa.Column('team_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('year', sa.String(length=25), nullable=False),
+    sa.Column('tournament', sa.String(length=55), nullable=False),
+    *counters(TEAM_COUNTERS + ['points']) + [
+    sa.ForeignKeyConstraint(['team_id'], ['teams.id'], ),
+    sa.PrimaryKeyConstraint('team_id', 'year', 'tournament')
+    ])
+
+
+def downgrade():
+    op.drop_table('tournament_stats')
+    op.drop_table('game_stats')
+
+    op.create_table('game_stats',
+    sa.Column('date', sa.String(length=55), nullable=False),
+    sa.Column('tournament', sa.String(length=55), nullable=False),
+    sa.Column('opponent', sa.String(length=55), nullable=False),
+    *counters(TEAM_COUNTERS + ['points']) + [
+    sa.PrimaryKeyConstraint('date', 'tournament', 'opponent')
+    ])
+    op.create_table('tournament_stats',
+    sa.Column('tournament', sa.String(length=55), nullable=False),
+    *counters(TEAM_COUNTERS + ['points']) + [
+    sa.PrimaryKeyConstraint('tournament')
+    ])
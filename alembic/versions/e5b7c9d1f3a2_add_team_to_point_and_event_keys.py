@@ -0,0 +1,259 @@
+"""add team to point and event keys
+
+Revision ID: e5b7c9d1f3a2
+Revises: c3f8a1d6e429
+Create Date: 2017-11-04 10:21:45.302917
+
+Points and event hashes didn't include the team, so a second team
+importing the same games got the first team's points, and any of its
+events that matched one of theirs were dropped as duplicates. This
+rehashes them with team and season, and moves events filed under
+another team's point to a point of their own.
+
+Events that were dropped can't be recovered here: import those files
+again, which now only adds what's missing. Then refill the aggregate
+and possession tables with `python manage.py rebuild_aggregates`.
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'e5b7c9d1f3a2'
+down_revision = 'c3f8a1d6e429'
+
+from collections import OrderedDict
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+# app.lib.helpers' hashes before and after this, frozen so the
+# migration keeps doing what it did when it was written.
+OLD_POINT_COLUMNS = ('date', 'tournament', 'opponent', 'our_score', 'their_score')
+NEW_POINT_COLUMNS = ('team_id', 'year') + OLD_POINT_COLUMNS
+HASH_COLUMNS = ('action', 'passer', 'receiver', 'defender')
+
+LINEUP_COLUMNS = [
+    'player_1', 'player_2', 'player_3', 'player_4',
+    'player_5', 'player_6', 'player_7',
+]
+
+# furthest into a point to look for an event's position
+MAX_POSITION = 10000
+
+
+def to_unicode(value):
+    if value is None:
+        return u""
+    if isinstance(value, str):
+        return value.decode('utf-8')
+    return unicode(value)
+
+
+def point_hash(row, columns):
+    key = u"|".join(to_unicode(row[column]) for column in columns)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def event_hash(row, columns, position):
+    parts = [to_unicode(row[column]) for column in columns]
+    parts.append(to_unicode(position))
+    parts.extend(to_unicode(row[column]) for column in HASH_COLUMNS)
+    return hashlib.sha1(u"|".join(parts).encode('utf-8')).hexdigest()
+
+
+def position(event, columns, fallback):
+    """
+    The position in its point an event was hashed with. Events dropped
+    as duplicates leave gaps, so this is found from the stored hash;
+    fallback (its place among the stored ones) if there's no match.
+    """
+    for i in xrange(MAX_POSITION):
+        if event_hash(event, columns, i) == event['content_hash']:
+            return i
+    return fallback
+
+
+def table(name, column='id'):
+    return sa.table(name, sa.column(column))
+
+
+def select_events():
+    return sa.text(
+        "SELECT id, point_id, content_hash, team_id, year, date, tournament, "
+        "opponent, our_score, their_score, line, seconds_elapsed, "
+        "event_type, played_at, {} FROM events ORDER BY id".format(
+            ", ".join(HASH_COLUMNS + tuple(LINEUP_COLUMNS)))
+    )
+
+
+def rehash(old_columns, new_columns):
+    """
+    New point keys and event hashes, from the positions the old hashes
+    were made with.
+
+    returns
+        - the events, each with its new 'key' and 'content_hash'
+    """
+    conn = op.get_bind()
+    events = []
+    counts = {}
+    for event in conn.execute(select_events()):
+        event = dict(event)
+        old = point_hash(event, old_columns)
+        fallback = counts.get(old, 0)
+        counts[old] = fallback + 1
+
+        i = position(event, old_columns, fallback)
+        event['key'] = point_hash(event, new_columns)
+        event['content_hash'] = event_hash(event, new_columns, i)
+        events.append(event)
+    return events
+
+
+def update_hashes(events):
+    if events:
+        op.get_bind().execute(
+            sa.text("UPDATE events SET content_hash = :content_hash WHERE id = :id"),
+            [{'id': e['id'], 'content_hash': e['content_hash']} for e in events]
+        )
+
+
+def upgrade():
+    conn = op.get_bind()
+    points = dict(
+        (row['id'], point_hash(row, NEW_POINT_COLUMNS)) for row in conn.execute(sa.text(
+            "SELECT id, team_id, year, date, tournament, opponent, "
+            "our_score, their_score FROM points"
+        ))
+    )
+    if points:
+        conn.execute(
+            sa.text("UPDATE points SET key = :key WHERE id = :id"),
+            [{'id': point_id, 'key': key} for point_id, key in points.iteritems()]
+        )
+
+    # events whose team isn't their point's get a point of their own,
+    # built like the importer would: the lineup from its first event,
+    # the outcome from its goal
+    moved = OrderedDict()
+    events = rehash(OLD_POINT_COLUMNS, NEW_POINT_COLUMNS)
+    update_hashes(events)
+    for event in events:
+        if event['point_id'] is None or points[event['point_id']] == event['key']:
+            continue
+        point = moved.get(event['key'])
+        if point is None:
+            point = moved[event['key']] = {
+                'key': event['key'],
+                'team_id': event['team_id'],
+                'year': event['year'],
+                'date': event['date'],
+                'played_at': event['played_at'],
+                'tournament': event['tournament'],
+                'opponent': event['opponent'],
+                'our_score': event['our_score'],
+                'their_score': event['their_score'],
+                'line': event['line'],
+                'outcome': None,
+                'duration': 0,
+                'players': set(event[c] for c in LINEUP_COLUMNS) - set([None]),
+                'events': [],
+            }
+        point['duration'] = max(point['duration'], event['seconds_elapsed'] or 0)
+        if event['action'] == "Goal":
+            point['outcome'] = "won" if event['event_type'] == "Offense" else "lost"
+        point['events'].append(event['id'])
+
+    if not moved:
+        return
+
+    conn.execute(
+        sa.text(
+            "INSERT INTO points (key, team_id, year, date, played_at, "
+            "tournament, opponent, our_score, their_score, line, outcome, "
+            "duration) VALUES (:key, :team_id, :year, :date, :played_at, "
+            ":tournament, :opponent, :our_score, :their_score, :line, "
+            ":outcome, :duration)"
+        ),
+        moved.values()
+    )
+    point_ids = dict(conn.execute(
+        sa.select([sa.column('key'), sa.column('id')]).select_from(
+            sa.table('points')
+        ).where(sa.column('key').in_(moved.keys()))
+    ).fetchall())
+
+    players = [
+        {'point_id': point_ids[key], 'player_id': player_id}
+        for key, point in moved.iteritems()
+        for player_id in point['players']
+    ]
+    if players:
+        conn.execute(
+            sa.text("INSERT INTO point_players (point_id, player_id) VALUES (:point_id, :player_id)"),
+            players
+        )
+    conn.execute(
+        sa.text("UPDATE events SET point_id = :point_id WHERE id = :event_id"),
+        [
+            {'event_id': event_id, 'point_id': point_ids[key]}
+            for key, point in moved.iteritems()
+            for event_id in point['events']
+        ]
+    )
+
+
+def downgrade():
+    conn = op.get_bind()
+    events = table('events')
+    points = table('points')
+    by_point = [
+        table(name, 'point_id') for name in
+        ['point_players', 'possessions', 'point_stats', 'point_receives']
+    ]
+
+    # points that only differ by team share a key again: keep the first
+    keep = {}
+    for point_id, key in sorted(
+        (row['id'], point_hash(row, OLD_POINT_COLUMNS)) for row in conn.execute(sa.text(
+            "SELECT id, date, tournament, opponent, our_score, their_score "
+            "FROM points"
+        ))
+    ):
+        keep.setdefault(key, point_id)
+    dropped = set(point_id for (point_id,) in conn.execute(
+        sa.text("SELECT id FROM points"))) - set(keep.values())
+
+    # and so do events of theirs that match: keep the first, as the old
+    # importer would have
+    seen = set()
+    kept = []
+    duplicates = []
+    for event in rehash(NEW_POINT_COLUMNS, OLD_POINT_COLUMNS):
+        if event['content_hash'] in seen:
+            duplicates.append(event['id'])
+            continue
+        seen.add(event['content_hash'])
+        kept.append(event)
+
+    if duplicates:
+        conn.execute(events.delete().where(events.c.id.in_(duplicates)))
+    update_hashes(kept)
+    moved = [
+        {'event_id': e['id'], 'point_id': keep[e['key']]}
+        for e in kept if e['point_id'] in dropped
+    ]
+    if moved:
+        conn.execute(
+            sa.text("UPDATE events SET point_id = :point_id WHERE id = :event_id"),
+            moved
+        )
+    if dropped:
+        for t in by_point:
+            conn.execute(t.delete().where(t.c.point_id.in_(dropped)))
+        conn.execute(points.delete().where(points.c.id.in_(dropped)))
+    if keep:
+        conn.execute(
+            sa.text("UPDATE points SET key = :key WHERE id = :id"),
+            [{'id': point_id, 'key': key} for key, point_id in keep.iteritems()]
+        )
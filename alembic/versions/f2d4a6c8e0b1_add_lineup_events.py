@@ -0,0 +1,43 @@
+"""add lineup events
+
+Revision ID: f2d4a6c8e0b1
+Revises: e5b7c9d1f3a2
+Create Date: 2017-11-11 14:08:37.625190
+
+lineup_events counts events by the line on for them, for the aggregate
+handler_gender_split. data_version.aggregates_built records whether
+the aggregate tables count every event: on a database with events they
+don't until `python manage.py rebuild_aggregates` has run, and reports
+use the python backend meanwhile.
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'f2d4a6c8e0b1'
+down_revision = 'e5b7c9d1f3a2'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('lineup_events',
+    sa.Column('point_id', sa.Integer(), nullable=False),
+    sa.Column('lineup', sa.String(length=100), nullable=False),
+    sa.Column('events', sa.Integer(), nullable=False, server_default='0'),
+    sa.ForeignKeyConstraint(['point_id'], ['points.id'], ),
+    sa.PrimaryKeyConstraint('point_id', 'lineup')
+    )
+    op.add_column('data_version', sa.Column(
+        'aggregates_built', sa.Boolean(), nullable=False,
+        server_default=sa.true()))
+
+    conn = op.get_bind()
+    if conn.execute(sa.text("SELECT id FROM events LIMIT 1")).first():
+        data_version = sa.table('data_version', sa.column('aggregates_built'))
+        conn.execute(data_version.update().values(aggregates_built=False))
+
+
+def downgrade():
+    op.drop_column('data_version', 'aggregates_built')
+    op.drop_table('lineup_events')
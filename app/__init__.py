@@ -5,7 +5,36 @@ from flask.ext.sqlalchemy import SQLAlchemy
 # this needs to be here to run scripts. shrug.
 SQLALCHEMY_DATABASE_URI = "postgresql://localhost:5432/classy2017"
 
-CACHE_TYPE = "simple"
+# Cached values are keyed by data version, so they never need to expire.
+# See app.lib.cache. Use "filesystem" (with CACHE_DIR) or "memcached" to
+# share one cache between gunicorn workers.
+CACHE_TYPE = "app.lib.cache_backends.lru"
+CACHE_DEFAULT_TIMEOUT = 0
+CACHE_LRU_MAX_BYTES = 64 * 1024 * 1024
+
+# Where Event analytics are computed: "aggregate" (from the tables the
+# importer maintains), "python" (numpy, over one scan of the events) or
+# "sql" (aggregate queries over the events). See app.lib.reports.
+# "aggregate" falls back to "python" on a migrated database until
+# `python manage.py rebuild_aggregates` has filled the tables.
+STATS_BACKEND = "aggregate"
+
+# Events per chunk when the python backend scans. 0 keeps the whole
+# EventFrame in memory in every process, which is fastest; set it to
+# bound worker memory on large datasets.
+SCAN_BATCH_SIZE = 0
+
+# Serve read-only stats from a snapshot file made by `python manage.py
+# snapshot`, see app.lib.stats_snapshot. Every SNAPSHOT_CHECK_SECONDS its
+# data version is checked against the database's, falling back to live
+# responses once it's out of date; 0 never checks, so reads need no
+# database at all.
+SNAPSHOT_PATH = None
+SNAPSHOT_CHECK_SECONDS = 30
+
+# Log every request and analytic call as a JSON line, see
+# app.lib.instrument. Totals are always on /api/_metrics.
+METRICS_LOG = False
 
 app = Flask(__name__, template_folder='static/templates')
 
@@ -18,6 +47,7 @@ db = SQLAlchemy(app)
 def create_app(config):
     app.config.from_object('config.flask.' + config)
     db.init_app(app)
+    app.cache.init_app(app)
     return app
 
 
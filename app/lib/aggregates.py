@@ -0,0 +1,471 @@
+"""
+Aggregate tables, kept up to date by the importer.
+
+Every count here is a sum over events (or points), so an import only
+has to add the counts of the events it inserted: AggregateDeltas
+collects them and apply() adds them to the tables. rebuild() runs the
+same code over every event, and verify() compares what's stored with a
+from-scratch recount.
+
+The 'aggregate' report backend (see app.lib.reports) reads metrics from
+these tables, so its cost depends on the number of players and points,
+not events. Metrics without a reader here use the python backend.
+Players and points belong to one team and season, so readers limit
+stats to a team or season through them. Games and tournaments are
+counted per team and season.
+
+Tables added to a database that already has events start out empty, so
+the 'aggregate' backend is only used once built() says they count every
+event; until then reports fall back to the python backend.
+"""
+from collections import Counter, OrderedDict, defaultdict
+
+import numpy as np
+from sqlalchemy import and_, case, func, select
+
+from app import db
+from app.lib.bulk import increment_rows
+from app.lib.event_frame import LINEUP_COLUMNS
+from app.lib.helpers import team_season_filter
+from app.lib.player_index import get_player_index
+
+PLAYER_COUNTERS = [
+    'passes', 'assists', 'throwaways', 'receives', 'goals', 'drops', 'dees',
+    'points_played', 'o_points', 'd_points',
+]
+TEAM_COUNTERS = [
+    'events', 'passes', 'receives', 'goals_for', 'goals_against',
+    'turnovers', 'dees',
+]
+
+# table name to (key columns, counter columns)
+TABLES = OrderedDict([
+    ('player_stats', (['player_id'], PLAYER_COUNTERS)),
+    ('pass_stats', (
+        ['passer_id', 'receiver_id'],
+        ['passes', 'completions', 'drops', 'goals'])),
+    ('point_stats', (['point_id'], TEAM_COUNTERS)),
+    ('point_receives', (['point_id', 'player_id'], ['receives'])),
+    ('lineup_events', (['point_id', 'lineup'], ['events'])),
+    ('game_stats', (
+        ['team_id', 'year', 'date', 'tournament', 'opponent'],
+        TEAM_COUNTERS + ['points'])),
+    ('tournament_stats', (
+        ['team_id', 'year', 'tournament'], TEAM_COUNTERS + ['points'])),
+])
+
+READERS = {}
+
+
+def _table(name):
+    return db.metadata.tables[name]
+
+
+def team_counts(row):
+    """
+    What one event row adds to its point, game and tournament.
+    """
+    counts = Counter(events=1)
+    if row['receiver'] is not None:
+        counts['receives'] += 1
+        if row['passer'] is not None:
+            counts['passes'] += 1
+    if row['action'] == "Goal":
+        # Goals for opponent will have None receiver
+        if row['receiver'] is not None:
+            counts['goals_for'] += 1
+        else:
+            counts['goals_against'] += 1
+    elif row['action'] in ("Drop", "Throwaway"):
+        counts['turnovers'] += 1
+    elif row['action'] == "D":
+        counts['dees'] += 1
+
+    return counts
+
+
+def lineup_key(row):
+    """
+    lineup_events key of an event row's line: its player ids, sorted
+    and comma separated.
+    """
+    return ",".join(str(player_id) for player_id in sorted(
+        row[column] for column in LINEUP_COLUMNS if row[column] is not None
+    ))
+
+
+def game_key(row):
+    """
+    game_stats key of an event or point row. Games and tournaments are
+    counted per team and season, so rows without a team (imports always
+    have one) are left out of them.
+    """
+    return (
+        row['team_id'], row['year'], row['date'], row['tournament'],
+        row['opponent'],
+    )
+
+
+def tournament_key(row):
+    return row['team_id'], row['year'], row['tournament']
+
+
+class AggregateDeltas(object):
+    """
+    Counts to add to the aggregate tables, collected from event rows
+    (with point_id set) and new points.
+    """
+
+    def __init__(self):
+        self.counts = dict((name, defaultdict(Counter)) for name in TABLES)
+
+    def add_event(self, row):
+        passer, receiver = row['passer'], row['receiver']
+        players = self.counts['player_stats']
+
+        if passer is not None:
+            if receiver is not None:
+                players[(passer,)]['passes'] += 1
+                passes = self.counts['pass_stats'][(passer, receiver)]
+                passes['passes'] += 1
+                if row['action'] == "Drop":
+                    passes['drops'] += 1
+                else:
+                    passes['completions'] += 1
+                if row['action'] == "Goal":
+                    passes['goals'] += 1
+            if row['action'] == "Goal":
+                players[(passer,)]['assists'] += 1
+            elif row['action'] == "Throwaway":
+                players[(passer,)]['throwaways'] += 1
+
+        if receiver is not None:
+            players[(receiver,)]['receives'] += 1
+            if row['action'] == "Goal":
+                players[(receiver,)]['goals'] += 1
+            elif row['action'] == "Drop":
+                players[(receiver,)]['drops'] += 1
+            point_receives = self.counts['point_receives']
+            point_receives[(row['point_id'], receiver)]['receives'] += 1
+
+        if row['defender'] is not None:
+            players[(row['defender'],)]['dees'] += 1
+
+        lineup = (row['point_id'], lineup_key(row))
+        self.counts['lineup_events'][lineup]['events'] += 1
+
+        counts = team_counts(row)
+        self.counts['point_stats'][(row['point_id'],)].update(counts)
+        if row['team_id'] is not None:
+            self.counts['game_stats'][game_key(row)].update(counts)
+            self.counts['tournament_stats'][tournament_key(row)].update(counts)
+
+    def add_point(self, point, player_ids):
+        """
+        point: the point's row (see import_data.create_point)
+        player_ids: its lineup
+        """
+        for player_id in player_ids:
+            played = self.counts['player_stats'][(player_id,)]
+            played['points_played'] += 1
+            if point['line'] == "O":
+                played['o_points'] += 1
+            elif point['line'] == "D":
+                played['d_points'] += 1
+
+        if point['team_id'] is not None:
+            self.counts['game_stats'][game_key(point)]['points'] += 1
+            self.counts['tournament_stats'][tournament_key(point)]['points'] += 1
+
+    def apply(self):
+        for name, (keys, counters) in TABLES.iteritems():
+            increment_rows(_table(name), keys, counters, self.counts[name])
+            self.counts[name].clear()
+
+
+def count_all():
+    """
+    AggregateDeltas for every event and point in the db.
+    """
+    from app.models import Event, Point, point_players
+
+    deltas = AggregateDeltas()
+
+    lineups = defaultdict(set)
+    for point_id, player_id in db.session.execute(
+        select([point_players.c.point_id, point_players.c.player_id])
+    ):
+        lineups[point_id].add(player_id)
+
+    points = Point.__table__
+    for point in db.session.execute(select([
+        points.c.id, points.c.team_id, points.c.year, points.c.date,
+        points.c.tournament, points.c.opponent, points.c.line,
+    ])):
+        deltas.add_point(point, lineups[point['id']])
+
+    events = Event.__table__
+    for row in db.session.execute(select([
+        events.c.point_id, events.c.team_id, events.c.year, events.c.date,
+        events.c.tournament, events.c.opponent, events.c.action,
+        events.c.passer, events.c.receiver, events.c.defender,
+    ] + [events.c[column] for column in LINEUP_COLUMNS])):
+        deltas.add_event(row)
+
+    return deltas
+
+
+def rebuild():
+    """
+    Recompute every aggregate table from the events and points, and
+    record that they're complete.
+    """
+    from app.models import DataVersion
+
+    for name in TABLES:
+        db.session.execute(_table(name).delete())
+    count_all().apply()
+
+    table = DataVersion.__table__
+    updated = db.session.execute(
+        table.update().where(table.c.id == 1).values(aggregates_built=True)
+    )
+    if not updated.rowcount:
+        db.session.execute(table.insert().values(id=1, version=0))
+
+
+def built():
+    """
+    Whether the aggregate tables count every event. They do unless they
+    were added (by a migration) to a database that already had events,
+    and rebuild() hasn't run since.
+    """
+    from app.models import DataVersion
+
+    built = db.session.query(DataVersion.aggregates_built).filter_by(
+        id=1).scalar()
+    return built is not False
+
+
+def verify():
+    """
+    Compare the aggregate tables with a recount from the events.
+
+    returns
+        - list of (table name, key, stored counts, expected counts) for
+          every row that differs
+    """
+    expected = count_all().counts
+
+    mismatches = []
+    for name, (keys, counters) in TABLES.iteritems():
+        table = _table(name)
+        stored = dict(
+            (tuple(row[:len(keys)]), dict(zip(counters, row[len(keys):])))
+            for row in db.session.execute(
+                select([table.c[c] for c in keys + counters])
+            )
+        )
+        for key in set(stored) | set(expected[name]):
+            want = dict((c, expected[name][key][c]) for c in counters)
+            have = stored.get(key, dict((c, 0) for c in counters))
+            if have != want:
+                mismatches.append((name, key, have, want))
+
+    return mismatches
+
+
+def reader(name):
+    """
+    Decorator registering a function that fills in metric name's
+    Accumulator from the aggregate tables.
+    """
+    def register(fn):
+        READERS[name] = fn
+        return fn
+    return register
+
+
+def _sum_by_gender(column, team_id, year, *where):
+    """
+    Sum a player_stats counter by the player's gender.
+
+    returns
+        - (total, female, male) sums
+    """
+    from app.models import Player, PlayerStats
+
+    query = select([Player.gender, func.sum(column)]).select_from(
+        PlayerStats.__table__.outerjoin(
+            Player.__table__, Player.id == PlayerStats.player_id
+        )
+    ).where(and_(
+        *team_season_filter(Player.__table__, team_id, year) + list(where)
+    )).group_by(Player.gender)
+    counts = dict(
+        (gender, int(count or 0))
+        for gender, count in db.session.execute(query)
+    )
+
+    return sum(counts.values()), counts.get("F", 0), counts.get("M", 0)
+
+
+@reader('off_gender_passes')
+def off_gender_passes(accumulator, team_id, year):
+    from app.models import PassStats, Player
+
+    stats = PassStats.__table__
+    passers = Player.__table__.alias('passers')
+    receivers = Player.__table__.alias('receivers')
+    same_gender = case(
+        [(and_(
+            passers.c.gender == receivers.c.gender,
+            passers.c.gender.in_(["F", "M"])
+        ), stats.c.passes)],
+        else_=0
+    )
+    passes, same = db.session.execute(
+        select([func.sum(stats.c.passes), func.sum(same_gender)]).select_from(
+            stats.outerjoin(
+                passers, passers.c.id == stats.c.passer_id
+            ).outerjoin(
+                receivers, receivers.c.id == stats.c.receiver_id
+            )
+        ).where(
+            and_(*team_season_filter(passers, team_id, year))
+        )
+    ).fetchone()
+
+    accumulator.passes = int(passes or 0)
+    accumulator.same_gender = int(same or 0)
+
+
+@reader('goals_by_gender')
+def goals_by_gender(accumulator, team_id, year):
+    from app.models import PlayerStats
+
+    accumulator.total, accumulator.female, accumulator.male = _sum_by_gender(
+        PlayerStats.goals, team_id, year
+    )
+
+
+@reader('dees_by_gender')
+def dees_by_gender(accumulator, team_id, year):
+    from app.models import PlayerStats
+
+    accumulator.total, accumulator.female, accumulator.male = _sum_by_gender(
+        PlayerStats.dees, team_id, year
+    )
+
+
+@reader('receives_by_gender')
+def receives_by_gender(accumulator, team_id, year):
+    from app.models import PlayerStats
+
+    accumulator.total, accumulator.female, accumulator.male = _sum_by_gender(
+        PlayerStats.receives, team_id, year
+    )
+
+
+def _receives_for_position(accumulator, team_id, year):
+    from app.models import Player, PlayerStats
+
+    accumulator.total, accumulator.female, accumulator.male = _sum_by_gender(
+        PlayerStats.receives, team_id, year,
+        Player.position == accumulator.position
+    )
+
+
+reader('receives_for_handlers')(_receives_for_position)
+reader('receives_for_cutters')(_receives_for_position)
+
+
+@reader('handler_gender_split')
+def handler_gender_split(accumulator, team_id, year):
+    """
+    Every event counts with its own line, as the other backends count
+    it. Handlers are looked up now, so roster changes count.
+    """
+    from app.models import LineupEvents, Point
+
+    lineups = LineupEvents.__table__
+    points = Point.__table__
+    rows = db.session.execute(
+        select([lineups.c.lineup, func.sum(lineups.c.events)]).select_from(
+            lineups.join(points, points.c.id == lineups.c.point_id)
+        ).where(
+            and_(*team_season_filter(points, team_id, year))
+        ).group_by(lineups.c.lineup)
+    )
+
+    index = get_player_index()
+    male = index.ids(gender="M", position="Handler")
+    female = index.ids(gender="F", position="Handler")
+
+    accumulator.counts[:] = 0
+    accumulator.total = 0
+    for lineup, count in rows:
+        players = [int(player_id) for player_id in lineup.split(",") if player_id]
+        male_count = sum(1 for player_id in players if player_id in male)
+        female_count = sum(1 for player_id in players if player_id in female)
+        accumulator.counts[male_count * 8 + female_count] += count
+        accumulator.total += int(count)
+
+
+@reader('gender_contribution_to_score')
+def gender_contribution_to_score(accumulator, team_id, year):
+    from app.models import Player, Point, PointReceives, PointStats
+
+    receives = PointReceives.__table__
+    stats = PointStats.__table__
+    points = Point.__table__
+    rows = db.session.execute(
+        select([
+            Player.gender,
+            func.sum(receives.c.receives * stats.c.goals_for),
+            func.sum(receives.c.receives * stats.c.goals_against),
+        ]).select_from(
+            receives.join(
+                stats, stats.c.point_id == receives.c.point_id
+            ).join(
+                points, points.c.id == receives.c.point_id
+            ).outerjoin(
+                Player.__table__, Player.id == receives.c.player_id
+            )
+        ).where(
+            and_(*team_season_filter(points, team_id, year))
+        ).group_by(Player.gender)
+    )
+
+    accumulator.winning = [0, 0, 0]
+    accumulator.losing = [0, 0, 0]
+    for gender, winning, losing in rows:
+        for counts, count in [(accumulator.winning, winning),
+                              (accumulator.losing, losing)]:
+            count = int(count or 0)
+            counts[0] += count
+            if gender == "F":
+                counts[1] += count
+            elif gender == "M":
+                counts[2] += count
+
+
+@reader('points_played')
+def points_played(accumulator, team_id, year):
+    from app.models import Player, PlayerStats
+
+    counts = dict(db.session.execute(
+        select([PlayerStats.player_id, PlayerStats.points_played]).select_from(
+            PlayerStats.__table__.join(
+                Player.__table__, Player.id == PlayerStats.player_id
+            )
+        ).where(and_(
+            PlayerStats.points_played > 0,
+            *team_season_filter(Player.__table__, team_id, year)
+        ))
+    ).fetchall())
+
+    size = max(counts) + 1 if counts else 1
+    accumulator.counts = np.zeros(size, dtype=np.int64)
+    for player_id, count in counts.iteritems():
+        accumulator.counts[player_id] = count
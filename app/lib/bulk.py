@@ -0,0 +1,215 @@
+from cStringIO import StringIO
+
+from sqlalchemy import and_, bindparam, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import Insert
+
+from app import db
+
+# sqlite allows 999 bound parameters per statement.
+IN_CHUNK_SIZE = 500
+
+
+class InsertIgnore(Insert):
+    """
+    INSERT that silently skips rows which would violate a unique
+    constraint. ON CONFLICT DO NOTHING on postgres, OR IGNORE on sqlite.
+    """
+
+
+@compiles(InsertIgnore)
+def _insert_ignore(insert, compiler, **kw):
+    return compiler.visit_insert(insert, **kw)
+
+
+@compiles(InsertIgnore, 'sqlite')
+def _insert_ignore_sqlite(insert, compiler, **kw):
+    sql = compiler.visit_insert(insert, **kw)
+    return sql.replace("INSERT", "INSERT OR IGNORE", 1)
+
+
+@compiles(InsertIgnore, 'postgresql')
+def _insert_ignore_postgres(insert, compiler, **kw):
+    return compiler.visit_insert(insert, **kw) + " ON CONFLICT DO NOTHING"
+
+
+def csv_field(value):
+    """
+    One value as a field of COPY ... WITH CSV input. COPY reads an
+    unquoted empty field as NULL and a quoted one as an empty string, so
+    None is left empty and everything else but numbers is quoted. (The
+    csv module writes None as "", which COPY would load as "".)
+    """
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, (int, long)):
+        return str(value)
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    else:
+        value = str(value)
+    return '"' + value.replace('"', '""') + '"'
+
+
+def copy_rows(table, columns, rows, ignore_conflicts=False):
+    """
+    Postgres only: stream rows through COPY, which is much faster
+    than an INSERT per row. None values are loaded as NULL.
+
+    COPY can't skip duplicates, so with ignore_conflicts the rows go
+    into a temp staging table first and are moved over with a single
+    INSERT ... ON CONFLICT DO NOTHING.
+    """
+    buf = StringIO()
+    for row in rows:
+        buf.write(",".join(csv_field(row[column]) for column in columns))
+        buf.write("\n")
+    buf.seek(0)
+
+    column_list = ", ".join(columns)
+    cursor = db.session.connection().connection.cursor()
+
+    if not ignore_conflicts:
+        cursor.copy_expert(
+            "COPY {} ({}) FROM STDIN WITH CSV".format(table.name, column_list),
+            buf
+        )
+        return
+
+    staging = "staging_{}".format(table.name)
+    cursor.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DROP AS "
+        "SELECT {columns} FROM {table} WITH NO DATA".format(
+            staging=staging, columns=column_list, table=table.name)
+    )
+    cursor.copy_expert(
+        "COPY {} ({}) FROM STDIN WITH CSV".format(staging, column_list),
+        buf
+    )
+    cursor.execute(
+        "INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+        "ON CONFLICT DO NOTHING".format(
+            table=table.name, columns=column_list, staging=staging)
+    )
+    cursor.execute("TRUNCATE {}".format(staging))
+
+
+def insert_rows(table, columns, rows, ignore_conflicts=False):
+    """
+    Write a batch of row dicts to table in as few round trips as the
+    database allows.
+    """
+    if not rows:
+        return
+
+    if db.engine.dialect.name == 'postgresql':
+        copy_rows(table, columns, rows, ignore_conflicts=ignore_conflicts)
+    elif ignore_conflicts:
+        db.session.execute(InsertIgnore(table), rows)
+    else:
+        db.session.execute(table.insert(), rows)
+
+
+def insert_rows_returning_ids(table, rows, key):
+    """
+    Insert a batch of row dicts and return their new primary keys.
+
+    returns
+        - dict of row[key] to id. key has to be unique within rows.
+    """
+    if not rows:
+        return {}
+
+    if db.engine.dialect.name == 'postgresql':
+        # one multi-values INSERT ... RETURNING
+        result = db.session.execute(
+            table.insert().values(rows).returning(table.c[key], table.c.id)
+        )
+        return dict((row[0], row[1]) for row in result)
+
+    # no RETURNING here (sqlite), but every insert reports its own id.
+    return dict(
+        (row[key], db.session.execute(table.insert(), row).inserted_primary_key[0])
+        for row in rows
+    )
+
+
+def increment_rows(table, key_columns, counter_columns, increments):
+    """
+    Add to the counters of rows identified by key_columns, creating the
+    rows that don't exist yet. One SELECT per IN_CHUNK_SIZE keys to find
+    the existing rows, then one executemany UPDATE and one batch insert.
+
+    args:
+        - increments: dict of key tuple to dict of counter to amount
+    """
+    if not increments:
+        return
+
+    keys = [table.c[column] for column in key_columns]
+    first = sorted(set(key[0] for key in increments))
+    existing = set()
+    for start in xrange(0, len(first), IN_CHUNK_SIZE):
+        existing.update(
+            tuple(row) for row in db.session.execute(
+                select(keys).where(
+                    keys[0].in_(first[start:start + IN_CHUNK_SIZE])
+                )
+            )
+        )
+
+    updates = []
+    inserts = []
+    for key, counts in increments.iteritems():
+        if key in existing:
+            updates.append(dict(
+                [('key_' + c, v) for c, v in zip(key_columns, key)] +
+                [('add_' + c, counts.get(c, 0)) for c in counter_columns]
+            ))
+        else:
+            inserts.append(dict(
+                zip(key_columns, key) +
+                [(c, counts.get(c, 0)) for c in counter_columns]
+            ))
+
+    if updates:
+        db.session.execute(
+            table.update().where(
+                and_(*[
+                    table.c[c] == bindparam('key_' + c) for c in key_columns
+                ])
+            ).values(
+                dict(
+                    (c, table.c[c] + bindparam('add_' + c))
+                    for c in counter_columns
+                )
+            ),
+            updates
+        )
+    insert_rows(table, key_columns + counter_columns, inserts)
+
+
+def replace_rows(table, key_column, keys, columns, rows, scope=None):
+    """
+    Delete every row whose key_column is one of keys, one DELETE per
+    IN_CHUNK_SIZE keys, and write rows in their place.
+
+    args:
+        - scope: {column: value} the deleted rows must also match, so
+          one writer's replace never takes another's rows with it
+    """
+    where = [
+        table.c[column] == value
+        for column, value in sorted((scope or {}).items())
+    ]
+    keys = sorted(set(keys))
+    for start in xrange(0, len(keys), IN_CHUNK_SIZE):
+        db.session.execute(
+            table.delete().where(and_(
+                table.c[key_column].in_(keys[start:start + IN_CHUNK_SIZE]),
+                *where
+            ))
+        )
+    insert_rows(table, columns, rows)
@@ -0,0 +1,141 @@
+"""
+Caching keyed by data version.
+
+Events and players only change when something is imported, and every
+import bumps a counter in the data_version table. Cached values are keyed
+by that counter, so they stay valid until the next import instead of
+expiring on a timer.
+
+- @versioned caches a function's return value in app.cache. Use a shared
+  CACHE_TYPE (filesystem, memcached) and every gunicorn worker reuses the
+  values computed by the first one.
+- VersionedLocal holds one object per process (EventFrame, PlayerIndex)
+  that is too big to pickle on every request, and reloads it when the
+  version moves.
+- app.lib.cache_backends.lru is the default backend: in-process,
+  evicting least recently used entries past CACHE_LRU_MAX_BYTES.
+"""
+import hashlib
+from collections import Counter
+
+from flask import g, has_request_context
+
+from app import app, db
+from app.lib.helpers import wraps
+
+# hits and misses per cached function, for this process.
+stats = {'hits': Counter(), 'misses': Counter()}
+
+
+def _read_data_version():
+    from app.models import DataVersion
+
+    version = db.session.query(DataVersion.version).filter_by(id=1).scalar()
+    return version or 0
+
+
+def data_version():
+    """
+    The current data version. Read once per request.
+    """
+    if not has_request_context():
+        return _read_data_version()
+
+    if not hasattr(g, 'data_version'):
+        g.data_version = _read_data_version()
+    return g.data_version
+
+
+def bump_data_version():
+    """
+    Mark everything cached so far as stale. Call from importers, inside
+    the transaction that changes the data.
+    """
+    from app.models import DataVersion
+
+    table = DataVersion.__table__
+    updated = db.session.execute(
+        table.update().where(table.c.id == 1).values(version=table.c.version + 1)
+    )
+    if not updated.rowcount:
+        db.session.execute(table.insert().values(id=1, version=1))
+
+    if has_request_context() and hasattr(g, 'data_version'):
+        del g.data_version
+
+
+def _record(name, hit):
+    stats['hits' if hit else 'misses'][name] += 1
+
+
+def cache_stats():
+    """
+    Hit and miss counts per cached function, for this process.
+    """
+    names = set(stats['hits']) | set(stats['misses'])
+    return dict(
+        (name, {'hits': stats['hits'][name], 'misses': stats['misses'][name]})
+        for name in names
+    )
+
+
+def cache_key(name, version, args, kwargs):
+    """
+    The key a call is cached under: the function's name, the data
+    version and a sha1 of the arguments' repr. Reprs have spaces and
+    can be long, and memcached skips keys with either.
+    """
+    arguments = repr((args, sorted(kwargs.items())))
+    return "{}:{}:{}".format(
+        name, version, hashlib.sha1(arguments).hexdigest())
+
+
+def versioned(fn):
+    """
+    Cache fn's return value in app.cache until the data version changes.
+    Arguments are part of the key, so they need a stable repr.
+    """
+    name = "{}.{}".format(fn.__module__, fn.__name__)
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = cache_key(name, data_version(), args, kwargs)
+        cached = app.cache.get(key)
+        if cached is not None:
+            _record(name, True)
+            return cached[0]
+
+        _record(name, False)
+        value = fn(*args, **kwargs)
+        # wrapped so a cached None doesn't look like a miss
+        app.cache.set(key, (value,), timeout=0)
+        return value
+
+    return wrapper
+
+
+class VersionedLocal(object):
+    """
+    One value per process, rebuilt with loader() when the data version
+    changes.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.version = None
+        self.value = None
+
+    def get(self):
+        version = data_version()
+        if self.value is None or self.version != version:
+            _record(self.name, False)
+            self.value = self.loader()
+            self.version = version
+        else:
+            _record(self.name, True)
+
+        return self.value
+
+    def clear(self):
+        self.value = None
@@ -0,0 +1,70 @@
+"""
+Flask-Cache backends. Kept apart from app.lib.cache because Flask-Cache
+imports them while the app is still being set up.
+"""
+import cPickle as pickle
+from collections import OrderedDict
+
+from werkzeug.contrib.cache import BaseCache
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class LRUCache(BaseCache):
+    """
+    In-process cache that evicts least recently used entries once the
+    pickled values take more than max_bytes. A value bigger than that on
+    its own isn't kept.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, default_timeout=0):
+        super(LRUCache, self).__init__(default_timeout)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        try:
+            value = self._entries.pop(key)
+        except KeyError:
+            return None
+        self._entries[key] = value
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=None):
+        self.delete(key)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(value) > self.max_bytes:
+            return False
+        self._entries[key] = value
+        self.size += len(value)
+
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+        return True
+
+    def add(self, key, value, timeout=None):
+        if key in self._entries:
+            return False
+        return self.set(key, value, timeout)
+
+    def delete(self, key):
+        value = self._entries.pop(key, None)
+        if value is None:
+            return False
+        self.size -= len(value)
+        return True
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+        return True
+
+
+def lru(app, config, args, kwargs):
+    """
+    Flask-Cache backend factory: CACHE_TYPE = "app.lib.cache_backends.lru"
+    """
+    kwargs.update(max_bytes=config.get('CACHE_LRU_MAX_BYTES', DEFAULT_MAX_BYTES))
+    return LRUCache(*args, **kwargs)
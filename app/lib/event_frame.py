@@ -0,0 +1,243 @@
+import numpy as np
+from sqlalchemy import and_, select
+
+from app.lib.cache import VersionedLocal
+from app.lib.helpers import team_season_filter
+from app.lib.rows import ROW_BATCH_SIZE, iter_batches
+
+# Player id columns, in the order they're stored in an EventFrame.
+PLAYER_COLUMNS = ['passer', 'receiver', 'defender']
+LINEUP_COLUMNS = [
+    'player_1', 'player_2', 'player_3', 'player_4',
+    'player_5', 'player_6', 'player_7',
+]
+
+# Missing players (None in the db) are stored as 0, which is never a
+# real id. That way player ids can index straight into lookup arrays.
+NO_PLAYER = 0
+
+
+class EventFrame(object):
+    """
+    The events table held in memory column by column, as numpy arrays.
+
+    Analytics work on whole columns at once (masks, bincounts) instead
+    of looping over ORM objects.
+
+    - ids: event ids, grouped by point and in id order within one
+    - actions: action code per event, see action_code()
+    - passer, receiver, defender: player ids
+    - lineups: N x 7 matrix of player ids on the line
+    - points: point number per event, numbered in point id order
+    - lines: 'O'/'D' per point
+    """
+
+    def __init__(self, ids, actions, action_names, passer, receiver,
+                 defender, lineups, points, lines):
+        self.ids = ids
+        self.actions = actions
+        self.action_names = action_names
+        self.passer = passer
+        self.receiver = receiver
+        self.defender = defender
+        self.lineups = lineups
+        self.points = points
+        self.lines = lines
+        self._id_space = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def query(cls, team_id=None, year=None, start=None, end=None):
+        """
+        Core select of the columns from_rows needs, for one team, season
+        and/or date range if given. Events are grouped by point so the
+        table can be read in chunks of whole points.
+        """
+        from app.models import Event
+
+        table = Event.__table__
+        columns = (
+            ['id', 'action', 'line'] + PLAYER_COLUMNS + LINEUP_COLUMNS +
+            ['point_id']
+        )
+        return select([table.c[c] for c in columns]).where(
+            and_(*team_season_filter(table, team_id, year, start, end))
+        ).order_by(
+            table.c.point_id, table.c.id
+        )
+
+    @classmethod
+    def load(cls, batch_size=ROW_BATCH_SIZE, team_id=None, year=None,
+             start=None, end=None):
+        """
+        Read the events table into one frame. Rows are streamed and
+        packed a batch at a time, so they're never all in memory.
+        """
+        return cls.concat(list(
+            cls.iter_chunks(batch_size, team_id, year, start, end)
+        ))
+
+    @classmethod
+    def iter_chunks(cls, batch_size=ROW_BATCH_SIZE, team_id=None, year=None,
+                    start=None, end=None):
+        """
+        Yield frames of about batch_size events each, covering the events
+        table. A point is never split between two frames, so per point
+        analytics can run on one chunk at a time.
+        """
+        pending = []
+        chunks = 0
+        query = cls.query(team_id, year, start, end)
+        for rows in iter_batches(query, batch_size):
+            pending.extend(rows)
+
+            # hold back the last point, its events may continue in the
+            # next batch.
+            last_point = pending[-1][13]
+            cut = len(pending)
+            while cut and pending[cut - 1][13] == last_point:
+                cut -= 1
+            if cut:
+                chunks += 1
+                yield cls.from_rows(pending[:cut])
+                pending = pending[cut:]
+
+        # always at least one frame, even for an empty table
+        if pending or not chunks:
+            yield cls.from_rows(pending)
+
+    @classmethod
+    def concat(cls, frames):
+        """
+        Join frames read in point order (see iter_chunks) into one.
+        """
+        action_names = []
+        for frame in frames:
+            action_names.extend(
+                a for a in frame.action_names if a not in action_names
+            )
+
+        points = []
+        offset = 0
+        for frame in frames:
+            points.append(frame.points + offset)
+            offset += frame.num_points
+
+        def join(column):
+            return np.concatenate([getattr(frame, column) for frame in frames])
+
+        return cls(
+            ids=join('ids'),
+            actions=np.concatenate([
+                np.array(
+                    [action_names.index(a) for a in frame.action_names],
+                    dtype=np.int16
+                )[frame.actions] if len(frame) else frame.actions
+                for frame in frames
+            ]),
+            action_names=action_names,
+            passer=join('passer'),
+            receiver=join('receiver'),
+            defender=join('defender'),
+            lineups=np.concatenate([frame.lineups for frame in frames]),
+            points=np.concatenate(points).astype(np.int32),
+            lines=join('lines'),
+        )
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        rows: sequence of (id, action, line, passer, receiver, defender,
+        player_1 ... player_7, point_id)
+        """
+        columns = zip(*rows) if rows else [()] * 14
+
+        action_codes = {}
+        actions = [
+            action_codes.setdefault(a, len(action_codes)) for a in columns[1]
+        ]
+        action_names = sorted(action_codes, key=action_codes.get)
+
+        point_ids = np.array(
+            [-1 if p is None else p for p in columns[13]], dtype=np.int64
+        )
+        _, first, points = np.unique(
+            point_ids, return_index=True, return_inverse=True
+        )
+
+        players = np.array(
+            [[p or NO_PLAYER for p in column] for column in columns[3:13]],
+            dtype=np.int32
+        ).reshape(10, len(rows)).T.copy()
+
+        return cls(
+            ids=np.array(columns[0], dtype=np.int64),
+            actions=np.array(actions, dtype=np.int16),
+            action_names=action_names,
+            passer=players[:, 0],
+            receiver=players[:, 1],
+            defender=players[:, 2],
+            lineups=players[:, 3:],
+            points=points.astype(np.int32),
+            lines=np.array(columns[2], dtype=object)[first],
+        )
+
+    @property
+    def num_points(self):
+        return len(self.lines)
+
+    def action_code(self, action):
+        """
+        Code used for action in self.actions, or -1 if it never happens.
+        """
+        try:
+            return self.action_names.index(action)
+        except ValueError:
+            return -1
+
+    def is_action(self, action):
+        return self.actions == self.action_code(action)
+
+    def id_space(self):
+        """
+        One past the largest player id referenced by any event. Player
+        masks of this size can be indexed with any player id column,
+        e.g. mask[frame.receiver].
+        """
+        if self._id_space is None:
+            self._id_space = 1
+            if len(self):
+                self._id_space += int(max(
+                    self.passer.max(), self.receiver.max(),
+                    self.defender.max(), self.lineups.max()
+                ))
+        return self._id_space
+
+    def first_events(self):
+        """
+        Index of the first event of every point, ordered by point.
+        Its lineup is the lineup for the entire point.
+        """
+        _, first = np.unique(self.points, return_index=True)
+        return first
+
+    def point_lineups(self):
+        return self.lineups[self.first_events()]
+
+
+_frame = VersionedLocal('event_frame', EventFrame.load)
+
+
+def get_frame(team_id=None, year=None, start=None, end=None):
+    """
+    The current EventFrame, reloaded only after an import. Frames for
+    one team, season or date range aren't kept, they're read through the
+    (team_id, year, ...) and played_at indexes.
+    """
+    if team_id is None and year is None and start is None and end is None:
+        return _frame.get()
+    return EventFrame.load(
+        team_id=team_id, year=year, start=start, end=end
+    )
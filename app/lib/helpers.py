@@ -1,3 +1,25 @@
+import functools
+import hashlib
+from collections import defaultdict
+from datetime import datetime
+
+
+# Columns that identify which point of which game an event belongs to.
+# Two teams can play the same tournament and opponent (or import the
+# same file), so the team and season are part of it.
+POINT_COLUMNS = (
+    'team_id', 'year', 'date', 'tournament', 'opponent', 'our_score',
+    'their_score',
+)
+
+# Columns that, together with the point and the event's position in it,
+# identify a single event.
+HASH_COLUMNS = ('action', 'passer', 'receiver', 'defender')
+
+# How exports write Date/Time, tried in order.
+TIMESTAMP_FORMATS = ('%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+
+
 def percentage(subset, total):
     """
     Given a subset (int) and total(int), return
@@ -5,3 +27,155 @@ def percentage(subset, total):
     """
     percentage = float(subset) / float(total) * 100
     return "{0:.2f}".format(round(percentage, 2))
+
+
+def percent_label(subset, total):
+    """
+    percentage() with a % sign, or None when total is 0 (a team or
+    season with nothing to count).
+    """
+    if not total:
+        return None
+    return "{}%".format(percentage(subset, total))
+
+
+def gender_split(total, female_count, male_count):
+    """
+    Given a total and female/male counts (ints), return the
+    total and formatted percentages for each gender (None if the
+    total is 0).
+    """
+    return {
+        'total': int(total),
+        'female': percent_label(female_count, total),
+        'male': percent_label(male_count, total),
+    }
+
+
+def _to_unicode(value):
+    if value is None:
+        return u""
+    if isinstance(value, str):
+        return value.decode('utf-8')
+    return unicode(value)
+
+
+def point_key(row):
+    """
+    Given an event row (dict-like), return a tuple identifying its point.
+    Works the same for csv rows (all strings) and db rows (ints).
+    """
+    return tuple(_to_unicode(row[column]) for column in POINT_COLUMNS)
+
+
+def point_hash(row):
+    """
+    Deterministic hash identifying the point an event row belongs to.
+    """
+    return hashlib.sha1(u"|".join(point_key(row)).encode('utf-8')).hexdigest()
+
+
+def event_hash(row, sequence):
+    """
+    Deterministic content hash for an event: team, game, point, position
+    of the event within the point, action and players involved.
+    """
+    parts = list(point_key(row))
+    parts.append(_to_unicode(sequence))
+    parts.extend(_to_unicode(row[column]) for column in HASH_COLUMNS)
+    return hashlib.sha1(u"|".join(parts).encode('utf-8')).hexdigest()
+
+
+class EventHasher(object):
+    """
+    point_hash, event_hash and the game's timestamp for a stream of event
+    rows in file order. Everything about a point is worked out from its
+    first event, so the rest only hash their own columns.
+
+        hasher = EventHasher()
+        for row in rows:
+            key = hasher.stamp(row)
+    """
+
+    def __init__(self):
+        # a point's POINT_COLUMNS as given, to (point hash, played_at,
+        # sha1 of the point's part of event_hash)
+        self.points = {}
+        # events seen so far per point hash
+        self.positions = defaultdict(int)
+
+    def stamp(self, row):
+        """
+        Set content_hash and played_at on row.
+
+        returns
+            - the row's point hash
+        """
+        columns = tuple(row[column] for column in POINT_COLUMNS)
+        point = self.points.get(columns)
+        if point is None:
+            parts = point_key(row)
+            point = self.points[columns] = (
+                point_hash(row),
+                parse_timestamp(row['date']),
+                hashlib.sha1(u"|".join(parts + (u"",)).encode('utf-8')),
+            )
+        key, played_at, prefix = point
+
+        parts = [_to_unicode(self.positions[key])]
+        parts.extend(_to_unicode(row[column]) for column in HASH_COLUMNS)
+        content_hash = prefix.copy()
+        content_hash.update(u"|".join(parts).encode('utf-8'))
+
+        row['content_hash'] = content_hash.hexdigest()
+        row['played_at'] = played_at
+        self.positions[key] += 1
+        return key
+
+
+def parse_timestamp(value):
+    """
+    An export's Date/Time as a datetime, or None if it's blank or in a
+    format we don't know.
+    """
+    value = _to_unicode(value).strip()
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    return None
+
+
+def team_season_filter(table, team_id=None, year=None, start=None, end=None):
+    """
+    Where clauses limiting table (events or points) to one team and/or
+    season. Both together match the leading columns of their indexes.
+
+    start and end limit it to games played from start up to (not
+    including) end, on the (team_id, played_at) and played_at indexes.
+    Only events and points have played_at.
+    """
+    clauses = []
+    if team_id is not None:
+        clauses.append(table.c.team_id == team_id)
+    if year is not None:
+        clauses.append(table.c.year == year)
+    if start is not None:
+        clauses.append(table.c.played_at >= start)
+    if end is not None:
+        clauses.append(table.c.played_at < end)
+    return clauses
+
+
+def wraps(fn):
+    """
+    functools.wraps for a decorator's wrapper, which also sets
+    __wrapped__ to fn as python 3 does, so the undecorated function can
+    still be reached (see benchmarks.run.unwrap).
+    """
+    def decorate(wrapper):
+        wrapper = functools.wraps(fn)(wrapper)
+        wrapper.__wrapped__ = fn
+        return wrapper
+    return decorate
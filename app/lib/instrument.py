@@ -0,0 +1,203 @@
+"""
+Instrumentation: SQL queries, time, rows scanned and cache hits, per
+request and per analytic.
+
+- Every SQL statement is counted and timed through SQLAlchemy engine
+  events, against each Tally active at the time.
+- Each request gets a Tally, summed up per endpoint.
+- @instrumented gives an analytic its own Tally and records wall time,
+  queries, rows read by scans (see app.lib.rows) and cache hits.
+- query_budget fails when a block runs more queries than allowed:
+
+      with query_budget(6):
+          player.female_passing_percentage()
+
+Totals are per process and served on /api/_metrics. With METRICS_LOG
+set, every request and analytic call is also logged as a JSON line.
+"""
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import app
+from app.lib import cache
+from app.lib.helpers import wraps
+
+_local = threading.local()
+
+SUMMARY_FIELDS = [
+    'calls', 'time', 'max_time', 'queries', 'query_time', 'rows',
+    'cache_hits', 'cache_misses',
+]
+
+# name to summed up SUMMARY_FIELDS, for this process.
+totals = {
+    'requests': defaultdict(lambda: dict.fromkeys(SUMMARY_FIELDS, 0)),
+    'analytics': defaultdict(lambda: dict.fromkeys(SUMMARY_FIELDS, 0)),
+}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class Tally(object):
+    """
+    What ran while this tally was active.
+    """
+    __slots__ = ['queries', 'query_time', 'rows']
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.rows = 0
+
+
+def _active():
+    if not hasattr(_local, 'tallies'):
+        _local.tallies = []
+    return _local.tallies
+
+
+@contextmanager
+def tally():
+    """
+    Count queries and rows for the duration of the block.
+    """
+    current = Tally()
+    _active().append(current)
+    try:
+        yield current
+    finally:
+        _active().remove(current)
+
+
+@contextmanager
+def query_budget(max_queries):
+    """
+    Raise QueryBudgetExceeded if the block runs more than max_queries
+    SQL statements.
+    """
+    with tally() as current:
+        yield current
+    if current.queries > max_queries:
+        raise QueryBudgetExceeded("{} queries, budget was {}".format(
+            current.queries, max_queries))
+
+
+def add_rows(count):
+    for current in _active():
+        current.rows += count
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info.setdefault('query_start', []).append(time.time())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    elapsed = time.time() - conn.info['query_start'].pop()
+    for current in _active():
+        current.queries += 1
+        current.query_time += elapsed
+
+
+def _cache_counts():
+    return (
+        sum(cache.stats['hits'].values()),
+        sum(cache.stats['misses'].values()),
+    )
+
+
+def _record(kind, name, elapsed, current, hits=0, misses=0):
+    summary = totals[kind][name]
+    summary['calls'] += 1
+    summary['time'] += elapsed
+    summary['max_time'] = max(summary['max_time'], elapsed)
+    summary['queries'] += current.queries
+    summary['query_time'] += current.query_time
+    summary['rows'] += current.rows
+    summary['cache_hits'] += hits
+    summary['cache_misses'] += misses
+
+    if app.config.get('METRICS_LOG'):
+        app.logger.info(json.dumps({
+            'metric': kind,
+            'name': name,
+            'time': round(elapsed, 6),
+            'queries': current.queries,
+            'query_time': round(current.query_time, 6),
+            'rows': current.rows,
+            'cache_hits': hits,
+            'cache_misses': misses,
+        }, sort_keys=True))
+
+
+def instrumented(fn):
+    """
+    Record time, queries, rows and cache hits for every call of fn.
+    Goes above @versioned, so cached calls are counted too.
+    """
+    name = "{}.{}".format(fn.__module__, fn.__name__)
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        hits, misses = _cache_counts()
+        start = time.time()
+        with tally() as current:
+            value = fn(*args, **kwargs)
+        elapsed = time.time() - start
+        after_hits, after_misses = _cache_counts()
+
+        _record('analytics', name, elapsed, current,
+                after_hits - hits, after_misses - misses)
+        return value
+
+    return wrapper
+
+
+@app.before_request
+def _start_request():
+    g.metrics_start = time.time()
+    g.metrics_cache = _cache_counts()
+    g.metrics_tally = Tally()
+    _active().append(g.metrics_tally)
+
+
+@app.teardown_request
+def _finish_request(exc):
+    current = getattr(g, 'metrics_tally', None)
+    if current is None:
+        return
+
+    # g can outlive the request (it belongs to the app context), so
+    # don't leave the tally there for an outer teardown to find.
+    del g.metrics_tally
+    _active().remove(current)
+
+    hits, misses = _cache_counts()
+    _record(
+        'requests', request.endpoint or request.path,
+        time.time() - g.metrics_start, current,
+        hits - g.metrics_cache[0], misses - g.metrics_cache[1]
+    )
+
+
+def snapshot():
+    """
+    Totals so far in this process, plus cache stats.
+    """
+    return {
+        'requests': dict(totals['requests']),
+        'analytics': dict(totals['analytics']),
+        'cache': cache.cache_stats(),
+    }
@@ -0,0 +1,285 @@
+"""
+Lineup stats: plus/minus, holds and breaks for every pair, trio or full
+line of players that played points together.
+
+Lineups are held as bitsets, both ways round:
+
+- per point, a fixed-width mask over roster bits (uint64 words), so the
+  points a group played together are one AND and compare, and full
+  lines group with np.unique
+- per player, a packed bitset over points, so the points a combination
+  played is the AND of its players' bitsets and every stat is a
+  popcount. A combination is only extended while it still has
+  min_points, which keeps trios and up from going combinatorial.
+
+Points come from point_players, the lineup from each point's first event.
+"""
+from collections import namedtuple
+
+import numpy as np
+from sqlalchemy import and_, select
+
+from app import db
+from app.lib.cache import VersionedLocal
+from app.lib.helpers import percentage, team_season_filter
+
+FULL_LINE = 7
+WORD_BITS = 64
+
+STATS = [
+    'points', 'o_points', 'd_points', 'won', 'lost', 'holds', 'breaks',
+]
+SORT_KEYS = STATS + ['plus_minus', 'hold_rate', 'break_rate']
+
+# set bits in every byte value
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+LineStats = namedtuple('LineStats', ['player_ids'] + STATS)
+
+
+def popcount(bits):
+    """
+    Set bits in packed uint8 bitsets, summed over the last axis.
+    """
+    return POPCOUNT[bits].sum(axis=-1)
+
+
+class LineupEngine(object):
+    """
+    Points and their lineups for one team and/or season.
+
+    - player_ids: roster, in bit order
+    - masks: points x words uint64 matrix, bit i set when player_ids[i]
+      was on the line
+    - player_bits: players x bytes, point bitsets per player
+    - o_bits, d_bits, won_bits, lost_bits: point bitsets by line and
+      outcome
+    """
+
+    def __init__(self, player_ids, lineups, lines, outcomes):
+        """
+        player_ids: sorted ids of every player in lineups
+        lineups: points x players boolean matrix
+        lines, outcomes: 'O'/'D' and 'won'/'lost' per point
+        """
+        self.player_ids = np.asarray(player_ids, dtype=np.int64)
+        self._bit = dict((pid, i) for i, pid in enumerate(player_ids))
+
+        lines = np.asarray(lines, dtype=object)
+        outcomes = np.asarray(outcomes, dtype=object)
+        self.masks = self._pack_words(lineups)
+        self.player_bits = np.packbits(lineups, axis=0).T.copy()
+        self.o_bits = np.packbits(lines == "O")
+        self.d_bits = np.packbits(lines == "D")
+        self.won_bits = np.packbits(outcomes == "won")
+        self.lost_bits = np.packbits(outcomes == "lost")
+
+    @staticmethod
+    def _pack_words(lineups):
+        points, players = lineups.shape
+        words = max(1, -(-players // WORD_BITS))
+        padded = np.zeros((points, words * WORD_BITS), dtype=np.uint64)
+        padded[:, :players] = lineups
+        shifts = np.arange(WORD_BITS, dtype=np.uint64)
+        return np.bitwise_or.reduce(
+            padded.reshape(points, words, WORD_BITS) << shifts, axis=2
+        )
+
+    @classmethod
+    def load(cls, team_id=None, year=None, start=None, end=None):
+        from app.models import Point, point_players
+
+        points = Point.__table__
+        rows = db.session.execute(
+            select([points.c.id, points.c.line, points.c.outcome]).where(
+                and_(*team_season_filter(points, team_id, year, start, end))
+            ).order_by(points.c.id)
+        ).fetchall()
+        lineup_rows = db.session.execute(
+            select([point_players.c.point_id, point_players.c.player_id]).select_from(
+                point_players.join(points, points.c.id == point_players.c.point_id)
+            ).where(
+                and_(*team_season_filter(points, team_id, year, start, end))
+            )
+        ).fetchall()
+
+        point_index = dict((row[0], i) for i, row in enumerate(rows))
+        player_ids = sorted(set(player_id for _, player_id in lineup_rows))
+        bit = dict((pid, i) for i, pid in enumerate(player_ids))
+
+        lineups = np.zeros((len(rows), len(player_ids)), dtype=bool)
+        for point_id, player_id in lineup_rows:
+            lineups[point_index[point_id], bit[player_id]] = True
+
+        return cls(
+            player_ids, lineups,
+            [row[1] for row in rows], [row[2] for row in rows]
+        )
+
+    def mask(self, player_ids):
+        """
+        Roster mask (one row of self.masks) for a group of players, or
+        None if one of them never played.
+        """
+        mask = np.zeros(self.masks.shape[1], dtype=np.uint64)
+        for player_id in player_ids:
+            if player_id not in self._bit:
+                return None
+            i = self._bit[player_id]
+            mask[i // WORD_BITS] |= np.uint64(1) << np.uint64(i % WORD_BITS)
+        return mask
+
+    def _stats(self, bits):
+        """
+        Counts for point bitsets (one per row of bits).
+        """
+        return {
+            'points': popcount(bits),
+            'o_points': popcount(bits & self.o_bits),
+            'd_points': popcount(bits & self.d_bits),
+            'won': popcount(bits & self.won_bits),
+            'lost': popcount(bits & self.lost_bits),
+            'holds': popcount(bits & self.o_bits & self.won_bits),
+            'breaks': popcount(bits & self.d_bits & self.won_bits),
+        }
+
+    def group(self, player_ids):
+        """
+        LineStats for the points all of player_ids played together.
+        """
+        mask = self.mask(player_ids)
+        if mask is None:
+            together = np.zeros(len(self.masks), dtype=bool)
+        else:
+            together = np.all(self.masks & mask == mask, axis=1)
+        counts = self._stats(np.packbits(together)[np.newaxis])
+        return LineStats(
+            tuple(player_ids), **dict((k, int(v[0])) for k, v in counts.items())
+        )
+
+    def combinations(self, size, min_points=1):
+        """
+        LineStats for every group of size players that played at least
+        min_points points together.
+        """
+        players = len(self.player_ids)
+        if not 1 <= size <= players:
+            return []
+
+        # (member bit indexes, their shared point bitset)
+        keep = popcount(self.player_bits) >= min_points
+        members = np.flatnonzero(keep)[:, np.newaxis]
+        bits = self.player_bits[keep]
+
+        for _ in range(size - 1):
+            next_members, next_bits = [], []
+            for group, group_bits in zip(members, bits):
+                after = np.arange(group[-1] + 1, players)
+                together = group_bits & self.player_bits[after]
+                keep = popcount(together) >= min_points
+                if keep.any():
+                    added = after[keep][:, np.newaxis]
+                    next_members.append(np.hstack(
+                        [np.repeat(group[np.newaxis], len(added), axis=0), added]
+                    ))
+                    next_bits.append(together[keep])
+            if not next_members:
+                return []
+            members = np.vstack(next_members)
+            bits = np.vstack(next_bits)
+
+        return self._line_stats(members, self._stats(bits))
+
+    def full_lines(self, min_points=1):
+        """
+        LineStats for every distinct seven that started a point.
+        """
+        full = popcount(self.masks.view(np.uint8)) == FULL_LINE
+        if not full.any():
+            return []
+
+        lines, inverse = np.unique(self.masks[full], axis=0, return_inverse=True)
+        line_of = np.full(len(self.masks), -1, dtype=np.int64)
+        line_of[full] = inverse
+        point_bits = np.packbits(
+            line_of[np.newaxis] == np.arange(len(lines))[:, np.newaxis], axis=1
+        )
+
+        counts = self._stats(point_bits)
+        keep = counts['points'] >= min_points
+        members = [np.flatnonzero(self._word_bits(words)) for words in lines]
+        return [
+            stats for stats, kept in zip(self._line_stats(members, counts), keep)
+            if kept
+        ]
+
+    def _word_bits(self, words):
+        shifts = np.arange(WORD_BITS, dtype=np.uint64)
+        return ((words[:, np.newaxis] >> shifts) & np.uint64(1)).ravel()
+
+    def _line_stats(self, members, counts):
+        return [
+            LineStats(
+                tuple(int(pid) for pid in self.player_ids[group]),
+                **dict((k, int(v[i])) for k, v in counts.items())
+            )
+            for i, group in enumerate(members)
+        ]
+
+    def top(self, size, k=10, by='plus_minus', min_points=1):
+        """
+        The k best groups of size players (FULL_LINE for whole lines)
+        by one of SORT_KEYS, most points first on ties.
+        """
+        if by not in SORT_KEYS:
+            raise ValueError("can't sort lineups by {}".format(by))
+
+        if size == FULL_LINE:
+            groups = self.full_lines(min_points)
+        else:
+            groups = self.combinations(size, min_points)
+
+        def value(stats):
+            return (sort_value(stats, by), stats.points)
+
+        return sorted(groups, key=value, reverse=True)[:k]
+
+
+def sort_value(stats, by):
+    if by == 'plus_minus':
+        return stats.won - stats.lost
+    elif by == 'hold_rate':
+        return float(stats.holds) / stats.o_points if stats.o_points else -1
+    elif by == 'break_rate':
+        return float(stats.breaks) / stats.d_points if stats.d_points else -1
+    return getattr(stats, by)
+
+
+def to_api_dict(stats):
+    """
+    LineStats with plus/minus and hold/break percentages, as the
+    analytics return it.
+    """
+    result = dict(stats._asdict())
+    result['player_ids'] = list(stats.player_ids)
+    result['plus_minus'] = stats.won - stats.lost
+    result['hold_rate'] = (
+        percentage(stats.holds, stats.o_points) if stats.o_points else None
+    )
+    result['break_rate'] = (
+        percentage(stats.breaks, stats.d_points) if stats.d_points else None
+    )
+    return result
+
+
+_engine = VersionedLocal('lineups', LineupEngine.load)
+
+
+def get_lineups(team_id=None, year=None, start=None, end=None):
+    """
+    The LineupEngine for every point, kept per process; or for one team,
+    season and/or date range, loaded on demand.
+    """
+    if team_id is None and year is None and start is None and end is None:
+        return _engine.get()
+    return LineupEngine.load(team_id, year, start, end)
@@ -0,0 +1,264 @@
+"""
+The pass network: every passer to receiver connection, with how many of
+those passes were caught, dropped or went for a goal.
+
+pass_stats holds the counts and the importer adds to them as events come
+in (see app.lib.aggregates), so building the network reads one row per
+connection, never the events; a date range, which pass_stats can't
+give, is counted from the events in it. It's held as a sparse matrix in CSR form:
+a passer's row is receivers[indptr[i]:indptr[i + 1]], with the counts
+for each in the same slice of counts[name]. Whole-roster questions
+(gender flow, everyone's passing split) are then a bincount over it
+instead of a query per player.
+"""
+import numpy as np
+from sqlalchemy import and_, case, func, select
+
+from app import db
+from app.lib.cache import VersionedLocal
+from app.lib.helpers import gender_split, team_season_filter
+from app.lib.player_index import get_player_index
+
+COUNTS = ['passes', 'completions', 'drops', 'goals']
+GENDERS = ['F', 'M']
+# GENDERS, then everyone else
+LABELS = GENDERS + ['unknown']
+
+
+class PassNetwork(object):
+    """
+    - player_ids: everyone who threw or caught a pass, sorted; a
+      player's position here is their row and column
+    - indptr, receivers: the CSR structure, rows by passer
+    - counts: COUNTS name to an array lined up with receivers
+    - throwaways: per player, throws that never reached a receiver
+    """
+
+    def __init__(self, passes, throwaways):
+        """
+        passes: rows of (passer_id, receiver_id) + COUNTS
+        throwaways: rows of (player_id, throwaways)
+        """
+        passes = sorted(tuple(row) for row in passes)
+        throwaways = [row for row in throwaways if row[1]]
+        self.player_ids = np.array(sorted(
+            set(row[0] for row in passes) |
+            set(row[1] for row in passes) |
+            set(row[0] for row in throwaways)
+        ), dtype=np.int64)
+
+        passers = self._positions([row[0] for row in passes])
+        self.receivers = self._positions([row[1] for row in passes])
+        self.indptr = np.concatenate([
+            [0], np.cumsum(np.bincount(passers, minlength=len(self.player_ids)))
+        ])
+        self.counts = dict(
+            (name, np.array([row[2 + i] for row in passes], dtype=np.int64))
+            for i, name in enumerate(COUNTS)
+        )
+        self.throwaways = np.zeros(len(self.player_ids), dtype=np.int64)
+        self.throwaways[self._positions([row[0] for row in throwaways])] = [
+            row[1] for row in throwaways
+        ]
+        self._by_gender = None
+
+    def _positions(self, player_ids):
+        return np.searchsorted(
+            self.player_ids, np.asarray(player_ids, dtype=np.int64)
+        )
+
+    def _position(self, player_id):
+        i = np.searchsorted(self.player_ids, player_id)
+        if i < len(self.player_ids) and self.player_ids[i] == player_id:
+            return i
+        return None
+
+    @classmethod
+    def load(cls, team_id=None, year=None, start=None, end=None):
+        """
+        The network for passes thrown by one team's and/or season's
+        players, and/or in games played from start up to end.
+        """
+        from app.models import PassStats, Player, PlayerStats
+
+        if start is not None or end is not None:
+            return cls.load_events(team_id, year, start, end)
+
+        stats = PassStats.__table__
+        passers = Player.__table__
+        passes = db.session.execute(
+            select(
+                [stats.c.passer_id, stats.c.receiver_id] +
+                [stats.c[name] for name in COUNTS]
+            ).select_from(
+                stats.join(passers, passers.c.id == stats.c.passer_id)
+            ).where(
+                and_(*team_season_filter(passers, team_id, year))
+            )
+        ).fetchall()
+        throwaways = db.session.execute(
+            select([PlayerStats.player_id, PlayerStats.throwaways]).select_from(
+                PlayerStats.__table__.join(
+                    passers, passers.c.id == PlayerStats.player_id
+                )
+            ).where(
+                and_(*team_season_filter(passers, team_id, year))
+            )
+        ).fetchall()
+
+        return cls(passes, throwaways)
+
+    @classmethod
+    def load_events(cls, team_id=None, year=None, start=None, end=None):
+        """
+        The network counted from the events rather than pass_stats.
+        """
+        from app.models import Event
+
+        events = Event.__table__
+        where = team_season_filter(events, team_id, year, start, end)
+
+        def count_where(condition):
+            return func.sum(case([(condition, 1)], else_=0))
+
+        passes = db.session.execute(
+            select([
+                events.c.passer, events.c.receiver, func.count(),
+                count_where(events.c.action != "Drop"),
+                count_where(events.c.action == "Drop"),
+                count_where(events.c.action == "Goal"),
+            ]).where(and_(
+                events.c.passer.isnot(None),
+                events.c.receiver.isnot(None),
+                *where
+            )).group_by(events.c.passer, events.c.receiver)
+        ).fetchall()
+        throwaways = db.session.execute(
+            select([events.c.passer, func.count()]).where(and_(
+                events.c.passer.isnot(None),
+                events.c.action == "Throwaway",
+                *where
+            )).group_by(events.c.passer)
+        ).fetchall()
+
+        return cls(passes, throwaways)
+
+    def _passer_rows(self):
+        # passer position for every entry of receivers
+        return np.repeat(
+            np.arange(len(self.player_ids)), np.diff(self.indptr)
+        )
+
+    def _genders(self):
+        index = get_player_index()
+        size = self.player_ids.max() + 1 if len(self.player_ids) else 0
+        codes = np.full(len(self.player_ids), len(GENDERS), dtype=np.int64)
+        for code, gender in enumerate(GENDERS):
+            codes[index.mask(size, gender=gender)[self.player_ids]] = code
+        return codes
+
+    def connections(self, player_id, k=5, by='completions'):
+        """
+        player_id's top k receivers by one of COUNTS.
+
+        returns
+            - [{'receiver_id': 2, 'passes': 10, 'completions': 9, ...}]
+        """
+        i = self._position(player_id)
+        if i is None:
+            return []
+
+        start, end = self.indptr[i], self.indptr[i + 1]
+        order = np.argsort(-self.counts[by][start:end], kind='mergesort')[:k]
+        result = []
+        for j in start + order:
+            connection = dict(
+                (name, int(self.counts[name][j])) for name in COUNTS
+            )
+            connection['receiver_id'] = int(self.player_ids[self.receivers[j]])
+            result.append(connection)
+        return result
+
+    def throws(self):
+        """
+        Throws per player: passes to a receiver plus throwaways, lined up
+        with player_ids.
+        """
+        return np.bincount(
+            self._passer_rows(), weights=self.counts['passes'],
+            minlength=len(self.player_ids)
+        ).astype(np.int64) + self.throwaways
+
+    def passes_to(self, gender):
+        """
+        Passes per player to receivers of gender, lined up with
+        player_ids.
+        """
+        to_gender = self._genders()[self.receivers] == GENDERS.index(gender)
+        return np.bincount(
+            self._passer_rows()[to_gender],
+            weights=self.counts['passes'][to_gender],
+            minlength=len(self.player_ids)
+        ).astype(np.int64)
+
+    def gender_flow(self, by='passes'):
+        """
+        Passes from each gender to each gender, see LABELS.
+
+        returns
+            - {'F': {'F': 120, 'M': 80, 'unknown': 0}, 'M': {...}, ...}
+        """
+        genders = self._genders()
+        flow = np.zeros((len(LABELS), len(LABELS)), dtype=np.int64)
+        np.add.at(
+            flow,
+            (genders[self._passer_rows()], genders[self.receivers]),
+            self.counts[by]
+        )
+        return dict(
+            (passer, dict(
+                (receiver, int(flow[i, j])) for j, receiver in enumerate(LABELS)
+            ))
+            for i, passer in enumerate(LABELS)
+        )
+
+    def _gender_totals(self):
+        if self._by_gender is None:
+            self._by_gender = (
+                self.throws(), self.passes_to("F"), self.passes_to("M")
+            )
+        return self._by_gender
+
+    def gender_counts(self, player_id):
+        """
+        (throws, passes to female receivers, passes to male receivers)
+        for one player.
+        """
+        i = self._position(player_id)
+        if i is None:
+            return 0, 0, 0
+        return tuple(int(totals[i]) for totals in self._gender_totals())
+
+    def gender_splits(self):
+        """
+        Every thrower's passes by receiver gender, as gender_split gives
+        it: {player_id: {'total': 50, 'female': '40.00%', 'male': '52.00%'}}
+        """
+        throws, female, male = self._gender_totals()
+        return dict(
+            (int(pid), gender_split(throws[i], female[i], male[i]))
+            for i, pid in enumerate(self.player_ids) if throws[i]
+        )
+
+
+_network = VersionedLocal('pass_network', PassNetwork.load)
+
+
+def get_pass_network(team_id=None, year=None, start=None, end=None):
+    """
+    The whole PassNetwork, kept per process; or one team's, season's
+    and/or date range's, loaded on demand.
+    """
+    if team_id is None and year is None and start is None and end is None:
+        return _network.get()
+    return PassNetwork.load(team_id, year, start, end)
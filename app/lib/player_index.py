@@ -0,0 +1,77 @@
+from collections import defaultdict
+
+import numpy as np
+
+from app import db
+from app.lib.cache import VersionedLocal
+
+ATTRIBUTES = ['gender', 'position', 'od', 'team_id', 'year']
+
+
+class PlayerIndex(object):
+    """
+    Player ids grouped by attribute value, for O(1) membership checks.
+
+    ids(gender="F", position="Handler") intersects the matching sets.
+    mask() gives the same thing as a boolean array indexed by player id,
+    to use against EventFrame columns.
+    """
+
+    def __init__(self, players):
+        """
+        players: rows of (id, gender, position, od, team_id, year)
+        """
+        self.all_ids = frozenset(player[0] for player in players)
+        self._ids = dict((attr, defaultdict(set)) for attr in ATTRIBUTES)
+        for player in players:
+            for attr, value in zip(ATTRIBUTES, player[1:]):
+                self._ids[attr][value].add(player[0])
+
+        self._frozen = {}
+        self._masks = {}
+
+    @classmethod
+    def load(cls):
+        from app.models import Player
+
+        players = db.session.query(
+            Player.id, *[getattr(Player, attr) for attr in ATTRIBUTES]
+        ).all()
+        return cls(players)
+
+    def ids(self, **attrs):
+        """
+        frozenset of ids of players matching every attr=value given.
+        """
+        key = tuple(sorted(attrs.iteritems()))
+        if key not in self._frozen:
+            matching = self.all_ids
+            for attr, value in key:
+                matching = matching.intersection(self._ids[attr].get(value, ()))
+            self._frozen[key] = frozenset(matching)
+
+        return self._frozen[key]
+
+    def mask(self, size, **attrs):
+        """
+        Boolean array of length size: mask[player_id] is True for players
+        matching attrs. Ids past size are left out.
+        """
+        key = (size, tuple(sorted(attrs.iteritems())))
+        if key not in self._masks:
+            mask = np.zeros(size, dtype=bool)
+            ids = np.fromiter(self.ids(**attrs), dtype=np.int64)
+            mask[ids[ids < size]] = True
+            self._masks[key] = mask
+
+        return self._masks[key]
+
+
+_index = VersionedLocal('player_index', PlayerIndex.load)
+
+
+def get_player_index():
+    """
+    The current PlayerIndex, rebuilt only after an import.
+    """
+    return _index.get()
@@ -0,0 +1,122 @@
+"""
+Possessions: each point's events split into the stretches where one
+team had the disc.
+
+A possession is a run of events of one event_type (Offense is us,
+Defense them), ended by a goal, a drop, a throwaway or a D. The importer
+feeds every event through a PossessionSegmenter in file order and
+writes the possessions of the points it touched, so conversion, hold
+and break rates are a GROUP BY over the possessions table rather than a
+scan of the events. rebuild() segments the events already in the db.
+"""
+from sqlalchemy import select
+
+from app import db
+from app.lib.bulk import insert_rows
+from app.lib.rows import ROW_BATCH_SIZE, iter_rows
+
+# action that ends a possession, to the possession's outcome
+OUTCOMES = {
+    "Goal": "goal",
+    "Drop": "drop",
+    "Throwaway": "throwaway",
+    "D": "d",
+}
+
+POSSESSION_COLUMNS = [
+    'point_id', 'team_id', 'year', 'sequence', 'line', 'offense',
+    'seconds_elapsed', 'duration', 'events', 'outcome',
+]
+
+
+class PossessionSegmenter(object):
+    """
+    Splits each point's events into possessions as they're added. Events
+    of a point have to come in order, but points can be interleaved.
+
+        segmenter = PossessionSegmenter()
+        for key, row in events:
+            segmenter.add(key, row)
+        rows = segmenter.rows(key, point_id)
+
+    Rows need event_type, action, seconds_elapsed, line, team_id and year.
+    """
+
+    def __init__(self):
+        # point key to its possessions so far. The last one stays open
+        # (outcome None) until an event ends it.
+        self.points = {}
+
+    def add(self, key, row):
+        possessions = self.points.setdefault(key, [])
+        offense = row['event_type'] == "Offense"
+
+        current = possessions[-1] if possessions else None
+        if (current is None or current['outcome'] is not None or
+                current['offense'] != offense):
+            current = {
+                'team_id': row['team_id'],
+                'year': row['year'],
+                'sequence': len(possessions),
+                'line': row['line'],  # the line the point started on
+                'offense': offense,
+                'seconds_elapsed': row['seconds_elapsed'],
+                'duration': 0,
+                'events': 0,
+                'outcome': None,
+            }
+            possessions.append(current)
+
+        current['events'] += 1
+        current['duration'] = max(
+            current['duration'],
+            row['seconds_elapsed'] - current['seconds_elapsed']
+        )
+        if row['action'] in OUTCOMES:
+            current['outcome'] = OUTCOMES[row['action']]
+
+    def rows(self, key, point_id):
+        """
+        Possession rows (POSSESSION_COLUMNS) for one point.
+        """
+        return [
+            dict(possession, point_id=point_id)
+            for possession in self.points.get(key, [])
+        ]
+
+
+def rebuild():
+    """
+    Segment every event in the db into the possessions table, one point
+    at a time.
+    """
+    from app.models import Event, Possession
+
+    db.session.execute(Possession.__table__.delete())
+
+    events = Event.__table__
+    columns = [
+        'point_id', 'team_id', 'year', 'line', 'seconds_elapsed',
+        'event_type', 'action',
+    ]
+    segmenter = PossessionSegmenter()
+    rows = []
+    for event in iter_rows(
+        select([events.c[c] for c in columns]).order_by(
+            events.c.point_id, events.c.id
+        )
+    ):
+        event = dict(zip(columns, event))
+        point_id = event['point_id']
+        if point_id not in segmenter.points:
+            for done in segmenter.points.keys():
+                rows.extend(segmenter.rows(done, done))
+                del segmenter.points[done]
+            if len(rows) >= ROW_BATCH_SIZE:
+                insert_rows(Possession.__table__, POSSESSION_COLUMNS, rows)
+                rows = []
+        segmenter.add(point_id, event)
+
+    for done in segmenter.points:
+        rows.extend(segmenter.rows(done, done))
+    insert_rows(Possession.__table__, POSSESSION_COLUMNS, rows)
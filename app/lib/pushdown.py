@@ -0,0 +1,193 @@
+"""
+SQL backend for the report metrics.
+
+Each function here computes a metric with GROUP BY / JOIN-to-players
+aggregate queries, so the database sends back a handful of numbers
+instead of every event. It fills in the state of the metric's
+Accumulator (see app.lib.reports), so results are formatted exactly
+like the python backend's.
+
+Metrics without a function here always use the python backend. Every
+function takes the accumulator and the team_id and year to limit the
+events to (None for all of them), and optionally a start and end date.
+"""
+import numpy as np
+from sqlalchemy import and_, case, func, select
+
+from app import db
+from app.lib.event_frame import LINEUP_COLUMNS
+from app.lib.helpers import team_season_filter
+
+PUSHDOWNS = {}
+
+
+def pushdown(name):
+    """
+    Decorator registering a SQL implementation of metric name.
+    """
+    def register(fn):
+        PUSHDOWNS[name] = fn
+        return fn
+    return register
+
+
+def _tables():
+    from app.models import Event, Player
+
+    return Event.__table__, Player.__table__
+
+
+def _count_by_gender(column, team_id, year, dates, *where):
+    """
+    Count events by the gender of the player in column. dates is the
+    start and end, see team_season_filter.
+
+    returns
+        - (total, female, male) counts
+    """
+    events, players = _tables()
+    rows = db.session.execute(
+        select([players.c.gender, func.count()]).select_from(
+            events.outerjoin(players, players.c.id == events.c[column])
+        ).where(and_(
+            events.c[column].isnot(None),
+            *team_season_filter(events, team_id, year, *dates) + list(where)
+        )).group_by(players.c.gender)
+    )
+    counts = dict(rows.fetchall())
+
+    return sum(counts.values()), counts.get("F", 0), counts.get("M", 0)
+
+
+@pushdown('off_gender_passes')
+def off_gender_passes(accumulator, team_id, year, start=None, end=None):
+    events, players = _tables()
+    passers = players.alias('passers')
+    receivers = players.alias('receivers')
+
+    same_gender = case(
+        [(and_(
+            passers.c.gender == receivers.c.gender,
+            passers.c.gender.in_(["F", "M"])
+        ), 1)],
+        else_=0
+    )
+    passes, same = db.session.execute(
+        select([func.count(), func.sum(same_gender)]).select_from(
+            events.outerjoin(
+                passers, passers.c.id == events.c.passer
+            ).outerjoin(
+                receivers, receivers.c.id == events.c.receiver
+            )
+        ).where(and_(
+            events.c.passer.isnot(None),
+            events.c.receiver.isnot(None),
+            *team_season_filter(events, team_id, year, start, end)
+        ))
+    ).fetchone()
+
+    accumulator.passes = passes
+    accumulator.same_gender = same or 0
+
+
+@pushdown('goals_by_gender')
+def goals_by_gender(accumulator, team_id, year, start=None, end=None):
+    events, _ = _tables()
+    accumulator.total, accumulator.female, accumulator.male = _count_by_gender(
+        'receiver', team_id, year, (start, end), events.c.action == "Goal"
+    )
+
+
+@pushdown('dees_by_gender')
+def dees_by_gender(accumulator, team_id, year, start=None, end=None):
+    accumulator.total, accumulator.female, accumulator.male = _count_by_gender(
+        'defender', team_id, year, (start, end)
+    )
+
+
+@pushdown('receives_by_gender')
+def receives_by_gender(accumulator, team_id, year, start=None, end=None):
+    accumulator.total, accumulator.female, accumulator.male = _count_by_gender(
+        'receiver', team_id, year, (start, end)
+    )
+
+
+def _receives_for_position(accumulator, team_id, year, start=None, end=None):
+    events, players = _tables()
+    rows = db.session.execute(
+        select([players.c.gender, func.count()]).select_from(
+            events.join(players, players.c.id == events.c.receiver)
+        ).where(and_(
+            players.c.position == accumulator.position,
+            *team_season_filter(events, team_id, year, start, end)
+        )).group_by(players.c.gender)
+    )
+    counts = dict(rows.fetchall())
+
+    accumulator.total = sum(counts.values())
+    accumulator.female = counts.get("F", 0)
+    accumulator.male = counts.get("M", 0)
+
+
+pushdown('receives_for_handlers')(_receives_for_position)
+pushdown('receives_for_cutters')(_receives_for_position)
+
+
+@pushdown('handler_gender_split')
+def handler_gender_split(accumulator, team_id, year, start=None, end=None):
+    events, players = _tables()
+
+    # one join to players per spot on the line
+    lineup = [players.alias(column) for column in LINEUP_COLUMNS]
+    joined = events
+    for column, player in zip(LINEUP_COLUMNS, lineup):
+        joined = joined.outerjoin(player, player.c.id == events.c[column])
+
+    def handlers(gender):
+        return sum(
+            case(
+                [(and_(
+                    player.c.gender == gender,
+                    player.c.position == "Handler"
+                ), 1)],
+                else_=0
+            )
+            for player in lineup
+        )
+
+    male_count = handlers("M")
+    female_count = handlers("F")
+    rows = db.session.execute(
+        select([male_count, female_count, func.count()]).select_from(
+            joined
+        ).where(
+            and_(*team_season_filter(events, team_id, year, start, end))
+        ).group_by(male_count, female_count)
+    )
+
+    accumulator.counts[:] = 0
+    accumulator.total = 0
+    for male, female, count in rows:
+        accumulator.counts[male * 8 + female] = count
+        accumulator.total += count
+
+
+@pushdown('points_played')
+def points_played(accumulator, team_id, year, start=None, end=None):
+    from app.models import Point, point_players
+
+    points = Point.__table__
+    counts = dict(db.session.execute(
+        select([point_players.c.player_id, func.count()]).select_from(
+            point_players.join(points, points.c.id == point_players.c.point_id)
+        ).where(
+            and_(*team_season_filter(points, team_id, year, start, end))
+        ).group_by(
+            point_players.c.player_id
+        )
+    ).fetchall())
+
+    size = max(counts) + 1 if counts else 1
+    accumulator.counts = np.zeros(size, dtype=np.int64)
+    for player_id, count in counts.iteritems():
+        accumulator.counts[player_id] = count
@@ -0,0 +1,388 @@
+"""
+Single pass report engine.
+
+Every metric is an accumulator registered with @metric. build_report
+loads the events once and feeds them to all the requested accumulators,
+so a dashboard costs one scan no matter how many metrics it shows.
+
+With the 'sql' backend, metrics that have a SQL implementation in
+app.lib.pushdown are computed by the database instead, and only the
+rest share the scan. The 'aggregate' backend reads them from the
+tables the importer maintains, see app.lib.aggregates.
+
+update() may be called several times, once per chunk of events (see
+SCAN_BATCH_SIZE); a point's events always arrive in the same chunk.
+To add a metric, subclass Accumulator, count what you need in update()
+and format it in result():
+
+    @metric('pulls')
+    class Pulls(Accumulator):
+        def __init__(self):
+            self.count = 0
+
+        def update(self, frame, players):
+            self.count += int(frame.is_action("Pull").sum())
+
+        def result(self):
+            return self.count
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from app import app
+from app.lib import aggregates
+from app.lib.aggregates import READERS
+from app.lib.cache import versioned
+from app.lib.event_frame import NO_PLAYER, EventFrame, get_frame
+from app.lib.helpers import gender_split, percent_label
+from app.lib.player_index import get_player_index
+from app.lib.pushdown import PUSHDOWNS
+
+# backend name to the metrics it computes without the scan
+BACKENDS = {
+    'python': {},
+    'sql': PUSHDOWNS,
+    'aggregate': READERS,
+}
+
+METRICS = OrderedDict()
+
+
+def metric(name):
+    """
+    Class decorator registering an Accumulator under name.
+    """
+    def register(cls):
+        METRICS[name] = cls
+        return cls
+    return register
+
+
+class Accumulator(object):
+    """
+    Collects one metric. update() is called with an EventFrame and the
+    PlayerIndex, result() once all events have been seen.
+    """
+
+    def update(self, frame, players):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+
+@metric('off_gender_passes')
+class OffGenderPasses(Accumulator):
+    """
+    Count how many times a pass happens between same gendered players
+    """
+
+    def __init__(self):
+        self.passes = 0
+        self.same_gender = 0
+
+    def update(self, frame, players):
+        male = players.mask(frame.id_space(), gender="M")
+        female = players.mask(frame.id_space(), gender="F")
+
+        passes = (frame.passer != NO_PLAYER) & (frame.receiver != NO_PLAYER)
+        passer = frame.passer[passes]
+        receiver = frame.receiver[passes]
+
+        self.passes += int(passes.sum())
+        self.same_gender += int((
+            male[passer] & male[receiver] | female[passer] & female[receiver]
+        ).sum())
+
+    def result(self):
+        return {
+            'off_gender': self.passes - self.same_gender,
+            'same_gender': self.same_gender,
+        }
+
+
+class GenderCount(Accumulator):
+    """
+    Base for metrics splitting a column of player ids by gender.
+    Subclasses pick the player ids with select().
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.female = 0
+        self.male = 0
+
+    def select(self, frame):
+        raise NotImplementedError
+
+    def update(self, frame, players):
+        ids = self.select(frame)
+        female = players.mask(frame.id_space(), gender="F")
+        male = players.mask(frame.id_space(), gender="M")
+
+        self.total += len(ids)
+        self.female += int(female[ids].sum())
+        self.male += int(male[ids].sum())
+
+
+@metric('goals_by_gender')
+class GoalsByGender(GenderCount):
+
+    def select(self, frame):
+        # Goals for opponent will have None receiver
+        return frame.receiver[
+            frame.is_action("Goal") & (frame.receiver != NO_PLAYER)
+        ]
+
+    def result(self):
+        return {
+            'female': percent_label(self.female, self.total),
+            'male': percent_label(self.male, self.total),
+        }
+
+
+@metric('dees_by_gender')
+class DeesByGender(GenderCount):
+
+    def select(self, frame):
+        return frame.defender[frame.defender != NO_PLAYER]
+
+    def result(self):
+        return gender_split(self.total, self.female, self.male)
+
+
+@metric('receives_by_gender')
+class ReceivesByGender(GenderCount):
+
+    def select(self, frame):
+        return frame.receiver[frame.receiver != NO_PLAYER]
+
+    def result(self):
+        return gender_split(self.total, self.female, self.male)
+
+
+@metric('handler_gender_split')
+class HandlerGenderSplit(Accumulator):
+    """
+    Count of events by number of male-female handlers on the line.
+    """
+
+    def __init__(self):
+        # at most 7 of each, so male * 8 + female is unique per breakdown
+        self.counts = np.zeros(64, dtype=np.int64)
+        self.total = 0
+
+    def update(self, frame, players):
+        female_handlers = players.mask(
+            frame.id_space(), gender="F", position="Handler"
+        )
+        male_handlers = players.mask(
+            frame.id_space(), gender="M", position="Handler"
+        )
+
+        # handlers of each gender on the line, per event
+        male_count = male_handlers[frame.lineups].sum(axis=1)
+        female_count = female_handlers[frame.lineups].sum(axis=1)
+
+        self.counts += np.bincount(male_count * 8 + female_count, minlength=64)
+        self.total += len(frame)
+
+    def result(self):
+        ret = {}
+        if self.total:
+            ret['total'] = self.total
+        for breakdown in np.flatnonzero(self.counts):
+            key = "{}-{}".format(breakdown // 8, breakdown % 8)
+            ret[key] = int(self.counts[breakdown])
+
+        return ret
+
+
+@metric('gender_contribution_to_score')
+class GenderContributionToScore(Accumulator):
+    """
+    Receives by gender on winning vs losing points.
+    """
+
+    def __init__(self):
+        self.winning = [0, 0, 0]
+        self.losing = [0, 0, 0]
+
+    def update(self, frame, players):
+        goals = frame.is_action("Goal")
+        has_receiver = frame.receiver != NO_PLAYER
+
+        # Goals for opponent will have None receiver. Every receive in
+        # a point counts once per goal scored in that point.
+        winning = np.bincount(
+            frame.points[goals & has_receiver], minlength=frame.num_points
+        )[frame.points][has_receiver]
+        losing = np.bincount(
+            frame.points[goals & ~has_receiver], minlength=frame.num_points
+        )[frame.points][has_receiver]
+
+        receivers = frame.receiver[has_receiver]
+        female = players.mask(frame.id_space(), gender="F")[receivers]
+        male = players.mask(frame.id_space(), gender="M")[receivers]
+
+        for counts, weights in [(self.winning, winning), (self.losing, losing)]:
+            counts[0] += int(weights.sum())
+            counts[1] += int(weights[female].sum())
+            counts[2] += int(weights[male].sum())
+
+    def result(self):
+        return {
+            'winning': gender_split(*self.winning),
+            'losing': gender_split(*self.losing),
+        }
+
+
+class ReceivesForPosition(Accumulator):
+    """
+    Receives by gender for players of one position.
+    """
+    position = None
+    position_name = None
+
+    def __init__(self):
+        self.total = 0
+        self.female = 0
+        self.male = 0
+
+    def update(self, frame, players):
+        size = frame.id_space()
+        receivers = frame.receiver[frame.receiver != NO_PLAYER]
+
+        self.total += int(
+            players.mask(size, position=self.position)[receivers].sum()
+        )
+        self.female += int(players.mask(
+            size, gender="F", position=self.position
+        )[receivers].sum())
+        self.male += int(players.mask(
+            size, gender="M", position=self.position
+        )[receivers].sum())
+
+    def result(self):
+        return {
+            'position': self.position_name,
+            'female': percent_label(self.female, self.total),
+            'male': percent_label(self.male, self.total),
+        }
+
+
+@metric('receives_for_handlers')
+class ReceivesForHandlers(ReceivesForPosition):
+    position = "Handler"
+    position_name = "handlers"
+
+
+@metric('receives_for_cutters')
+class ReceivesForCutters(ReceivesForPosition):
+    position = "Cutter"
+    position_name = "cutters"
+
+
+@metric('points_played')
+class PointsPlayed(Accumulator):
+    """
+    Number of points played per player id, for players with any.
+    """
+
+    def __init__(self):
+        self.counts = np.zeros(1, dtype=np.int64)
+
+    def update(self, frame, players):
+        # we only care about the first event of each point because
+        # that'll have the lineup for the entire point.
+        counts = np.bincount(
+            frame.point_lineups().ravel(), minlength=len(self.counts)
+        )
+        counts[:len(self.counts)] += self.counts
+        counts[NO_PLAYER] = 0
+        self.counts = counts
+
+    def result(self):
+        return dict(
+            (int(player_id), int(self.counts[player_id]))
+            for player_id in np.flatnonzero(self.counts)
+        )
+
+
+@versioned
+def build_report(names=None, backend=None, team_id=None, year=None,
+                 start=None, end=None):
+    """
+    Run the named metrics (default: all of them) over one scan of the
+    events. Cached until the next import.
+
+    args:
+        - names: list of metric names
+        - backend: 'python', 'sql' or 'aggregate'. Defaults to the
+          STATS_BACKEND config, or python while the aggregate tables
+          wait for a rebuild.
+        - team_id, year: only count that team's and/or season's events
+        - start, end: only count games played from start up to end
+
+    returns
+        - dict of metric name to its result
+    """
+    return _build_report(names, backend, team_id, year, start, end)
+
+
+def _build_report(names, backend, team_id=None, year=None, start=None,
+                  end=None):
+    if names is None:
+        names = METRICS.keys()
+    if backend is None:
+        backend = app.config.get('STATS_BACKEND', 'python')
+        if backend == 'aggregate' and not aggregates.built():
+            backend = 'python'
+    if backend not in BACKENDS:
+        raise ValueError("backend {} unknown".format(backend))
+
+    dates = {}
+    if start is not None or end is not None:
+        dates = {'start': start, 'end': end}
+        # the aggregate tables only have all-time counts; the events
+        # have the dates.
+        if backend == 'aggregate':
+            backend = 'sql'
+
+    accumulators = [(name, METRICS[name]()) for name in names]
+
+    scan = []
+    for name, accumulator in accumulators:
+        if name in BACKENDS[backend]:
+            BACKENDS[backend][name](accumulator, team_id, year, **dates)
+        else:
+            scan.append(accumulator)
+
+    if scan:
+        players = get_player_index()
+        for frame in _scan_frames(team_id, year, start, end):
+            for accumulator in scan:
+                accumulator.update(frame, players)
+
+    return dict(
+        (name, accumulator.result()) for name, accumulator in accumulators
+    )
+
+
+def _scan_frames(team_id, year, start=None, end=None):
+    """
+    The events to feed the accumulators: the whole cached EventFrame, or
+    with SCAN_BATCH_SIZE set, streamed chunks of whole points so memory
+    stays bounded.
+    """
+    batch_size = app.config.get('SCAN_BATCH_SIZE')
+    if batch_size:
+        return EventFrame.iter_chunks(batch_size, team_id, year, start, end)
+    return [get_frame(team_id, year, start, end)]
+
+
+@versioned
+def run_metric(name, backend=None, team_id=None, year=None, start=None,
+               end=None):
+    return _build_report([name], backend, team_id, year, start, end)[name]
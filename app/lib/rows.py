@@ -0,0 +1,43 @@
+"""
+Plain row access for full-table scans.
+
+ORM queries build an instance per row, with identity map bookkeeping
+and instrumented attributes, and keep them all alive until the query is
+done. These helpers run Core selects of just the columns needed,
+through a server-side cursor on postgres (stream_results), and hand
+rows out batch_size at a time, so a scan holds one batch in memory.
+"""
+from app import db
+from app.lib.instrument import add_rows
+
+ROW_BATCH_SIZE = 5000
+
+
+def iter_batches(query, batch_size=ROW_BATCH_SIZE):
+    """
+    Run a Core select and yield its rows in lists of up to batch_size.
+    """
+    connection = db.session.connection().execution_options(
+        stream_results=True
+    )
+    result = connection.execute(query)
+    try:
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            add_rows(len(rows))
+            yield rows
+    finally:
+        result.close()
+
+
+def iter_rows(query, record=None, batch_size=ROW_BATCH_SIZE):
+    """
+    Run a Core select and yield its rows one at a time, as plain tuples
+    or as record (a namedtuple class with the select's columns).
+    """
+    make = record._make if record else tuple
+    for rows in iter_batches(query, batch_size):
+        for row in rows:
+            yield make(row)
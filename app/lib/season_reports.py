@@ -0,0 +1,123 @@
+"""
+End of season reports: every Event analytic for each team and season,
+computed in parallel.
+
+Pairs are handed out to a pool of worker processes, so the run takes
+about 1/processes as long as doing them one after the other. Each
+worker opens its own database connections (nothing is shared across
+the fork) and loads the player index once, read-only, for all the
+pairs it gets.
+
+    $ python manage.py report --output season_report.json
+"""
+import multiprocessing
+import time
+
+from app import db
+from app.lib.player_index import get_player_index
+from app.lib.reports import build_report
+
+
+def _analytics():
+    from app.models import Event
+
+    # name to a function of (team_id, year)
+    return [
+        ('report', lambda team_id, year: build_report(
+            team_id=team_id, year=year)),
+        ('points_played_by_players', Event.points_played_by_players),
+        ('line_split_count_O', lambda team_id, year: Event.line_split_count(
+            "O", team_id, year)),
+        ('line_split_count_D', lambda team_id, year: Event.line_split_count(
+            "D", team_id, year)),
+        ('receives_by_gender_4-3', lambda team_id, year: Event.receives_by_gender(
+            breakdown="4-3", team_id=team_id, year=year)),
+        ('receives_by_gender_3-4', lambda team_id, year: Event.receives_by_gender(
+            breakdown="3-4", team_id=team_id, year=year)),
+        ('conversion_rate', Event.conversion_rate),
+        ('pass_network', lambda team_id, year: Event.pass_network(
+            team_id=team_id, year=year)),
+        ('top_pairs', lambda team_id, year: Event.top_lineups(
+            2, team_id=team_id, year=year)),
+        ('top_trios', lambda team_id, year: Event.top_lineups(
+            3, team_id=team_id, year=year)),
+        ('top_lines', lambda team_id, year: Event.top_lineups(
+            7, min_points=1, team_id=team_id, year=year)),
+    ]
+
+
+def report_pairs():
+    """
+    (team id, team name, year) for every team and season with events.
+    """
+    from app.models import Event, Team
+
+    return db.session.query(
+        Event.team_id, Team.name, Event.year
+    ).join(
+        Team, Team.id == Event.team_id
+    ).distinct().order_by(Team.name, Event.year).all()
+
+
+def season_report(team_id, year):
+    """
+    Every analytic for one team and season. One that fails doesn't
+    stop the rest, its error is reported instead.
+    """
+    report = {}
+    for name, analytic in _analytics():
+        try:
+            report[name] = analytic(team_id, year)
+        except Exception as e:
+            db.session.rollback()
+            report[name] = {'error': "{}: {}".format(type(e).__name__, e)}
+    return report
+
+
+def _init_worker():
+    # connections made before the fork belong to the parent.
+    db.session.remove()
+    db.engine.dispose()
+    get_player_index()
+
+
+def _run_pair(pair):
+    team_id, team_name, year = pair
+    start = time.time()
+    report = season_report(team_id, year)
+    db.session.remove()
+    return pair, report, time.time() - start
+
+
+def generate_reports(pairs, processes=None):
+    """
+    Run season_report for every (team id, team name, year) in pairs on
+    a pool of processes (default: one per core), printing progress.
+
+    returns
+        - {team name: {year: report}}
+    """
+    processes = processes or multiprocessing.cpu_count()
+    db.session.remove()
+    db.engine.dispose()
+
+    reports = {}
+    start = time.time()
+    pool = multiprocessing.Pool(processes, initializer=_init_worker)
+    try:
+        results = pool.imap_unordered(_run_pair, pairs)
+        for done, (pair, report, elapsed) in enumerate(results, 1):
+            team_id, team_name, year = pair
+            reports.setdefault(team_name or str(team_id), {})[year] = report
+            print "[{}/{}] {} {} in {:.2f}s".format(
+                done, len(pairs), team_name, year, elapsed)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    print "{} reports in {:.2f}s on {} processes.".format(
+        len(pairs), time.time() - start, processes)
+    return reports
@@ -0,0 +1,292 @@
+"""
+Stats snapshots: the read-only API responses, computed ahead of time.
+
+Views marked @snapshotted are run by `python manage.py snapshot` for
+every team and season (see requests()) and their bodies written, gzipped,
+to one file. While SNAPSHOT_PATH points at a fresh snapshot, those views
+answer from it without a query - or a database connection:
+
+- the file is mmapped, so every gunicorn worker shares one copy through
+  the page cache, and a response is a slice of it. Clients that accept
+  gzip get the stored bytes as they are.
+- every body has an ETag, and GETs with a matching If-None-Match get a
+  304.
+- the snapshot records the data version it was built at. Every
+  SNAPSHOT_CHECK_SECONDS that's compared with the database's, and once
+  an import has moved it on, views compute their responses live again
+  until the next snapshot. With SNAPSHOT_CHECK_SECONDS = 0 the database
+  is never asked; rerun the snapshot command after importing instead.
+- a new snapshot is written next to the old one and renamed over it, and
+  each process picks it up on its next request.
+
+File layout: MAGIC, then the format version and index length (struct
+HEADER), the JSON index, and the bodies back to back.
+"""
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+import urllib
+import zlib
+from StringIO import StringIO
+
+from flask import make_response, request
+
+from app import app
+from app.lib.cache import data_version
+from app.lib.helpers import wraps
+
+MAGIC = "FSSNAP"
+FORMAT = 1
+# format version and index length
+HEADER = struct.Struct('>HI')
+
+# request parameters scoped views are snapshotted for. Requests with
+# any others (a date range, say) are always computed live.
+SCOPE_PARAMS = ['team_id', 'year']
+
+# endpoint name to (the undecorated view, whether it's scoped), filled
+# in by @snapshotted
+VIEWS = {}
+
+
+def request_key(path, params):
+    """
+    What a response is stored under: its path and non-empty parameters,
+    sorted.
+    """
+    params = sorted((name, value) for name, value in params if value)
+    if not params:
+        return path
+    return "{}?{}".format(path, urllib.urlencode(params))
+
+
+def requests():
+    """
+    The (path, params) to build a snapshot of: every @snapshotted view,
+    and scoped ones for each team, each season and each team's season
+    too.
+    """
+    from app.lib.season_reports import report_pairs
+
+    pairs = [(team_id, year) for team_id, _, year in report_pairs()]
+    scopes = [(None, None)]
+    scopes.extend(sorted(set((team_id, None) for team_id, _ in pairs)))
+    scopes.extend(sorted(set((None, year) for _, year in pairs)))
+    scopes.extend(pairs)
+
+    result = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if rule.endpoint not in VIEWS or rule.arguments:
+            continue
+        if not VIEWS[rule.endpoint][1]:
+            result.append((rule.rule, []))
+            continue
+        for scope in scopes:
+            params = zip(SCOPE_PARAMS, scope)
+            result.append((rule.rule, [
+                (name, str(value)) for name, value in params
+                if value is not None
+            ]))
+    return result
+
+
+def _gzip(body):
+    out = StringIO()
+    # mtime=0 so the same body always gzips to the same bytes
+    with gzip.GzipFile(fileobj=out, mode='wb', mtime=0) as f:
+        f.write(body)
+    return out.getvalue()
+
+
+def render(url, params):
+    """
+    The body of a @snapshotted view for a GET of url with params,
+    computed live.
+    """
+    context = app.test_request_context(
+        url, method='GET', query_string=dict(params))
+    with context:
+        body = VIEWS[request.endpoint][0]()
+    if isinstance(body, unicode):
+        body = body.encode('utf-8')
+    return body
+
+
+def build(path):
+    """
+    Run every request() and write their responses to a snapshot at path.
+
+    returns
+        - number of responses, size of the file in bytes
+    """
+    version = data_version()
+    entries = {}
+    bodies = []
+    offset = 0
+    for url, params in requests():
+        body = render(url, params)
+        data = _gzip(body)
+        entries[request_key(url, params)] = [
+            offset, len(data), hashlib.sha1(body).hexdigest()
+        ]
+        bodies.append(data)
+        offset += len(data)
+
+    index = json.dumps({
+        'data_version': version,
+        'created': time.time(),
+        'entries': entries,
+    })
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(FORMAT, len(index)))
+        f.write(index)
+        for data in bodies:
+            f.write(data)
+    os.rename(tmp_path, path)
+
+    return len(entries), os.path.getsize(path)
+
+
+class Snapshot(object):
+    """
+    A snapshot file, mmapped read-only.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.stat = os.fstat(f.fileno())
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        start = len(MAGIC) + HEADER.size
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError("{} isn't a stats snapshot".format(path))
+        file_format, index_length = HEADER.unpack(self.data[len(MAGIC):start])
+        if file_format != FORMAT:
+            raise ValueError("{} is format {}, expected {}".format(
+                path, file_format, FORMAT))
+
+        index = json.loads(self.data[start:start + index_length])
+        self.data_version = index['data_version']
+        self.created = index['created']
+        self.entries = index['entries']
+        self.body_start = start + index_length
+
+    def get(self, key):
+        """
+        returns
+            - (gzipped body, etag), or None if key isn't in the snapshot
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        offset, length, etag = entry
+        start = self.body_start + offset
+        return self.data[start:start + length], etag
+
+
+class SnapshotLoader(object):
+    """
+    The current snapshot at SNAPSHOT_PATH for this process: reopened when
+    the file is replaced, and put aside while it's stale.
+    """
+
+    def __init__(self):
+        self.snapshot = None
+        self.fresh = False
+        self.checked = 0
+
+    def _changed(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return True
+        current = self.snapshot.stat
+        return (stat.st_ino, stat.st_mtime, stat.st_size) != (
+            current.st_ino, current.st_mtime, current.st_size)
+
+    def get(self):
+        path = app.config['SNAPSHOT_PATH']
+        if not path:
+            return None
+
+        if self.snapshot is None or self._changed(path):
+            # the old map is unmapped once no response holds on to it
+            self.snapshot = None
+            if not os.path.exists(path):
+                return None
+            self.snapshot = Snapshot(path)
+            self.checked = 0
+
+        interval = app.config['SNAPSHOT_CHECK_SECONDS']
+        if not interval:
+            return self.snapshot
+        if time.time() - self.checked >= interval:
+            self.fresh = self.snapshot.data_version == data_version()
+            self.checked = time.time()
+        return self.snapshot if self.fresh else None
+
+
+_loader = SnapshotLoader()
+
+
+def get_snapshot():
+    """
+    The Snapshot views are serving from, or None.
+    """
+    return _loader.get()
+
+
+def serve():
+    """
+    The current request's response from the snapshot, or None if it has
+    to be computed.
+    """
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return None
+    found = snapshot.get(request_key(request.path, request.values.items()))
+    if found is None:
+        return None
+
+    data, etag = found
+    if 'gzip' in request.accept_encodings:
+        response = make_response(data)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = make_response(zlib.decompress(data, 16 + zlib.MAX_WBITS))
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def snapshotted(scoped=False):
+    """
+    View decorator: serve the response from the snapshot when there's a
+    fresh one. Live responses get an ETag too. Goes below @app.route.
+
+    args:
+        - scoped: the view takes SCOPE_PARAMS, so the snapshot has it
+          for every team and season
+    """
+    def decorate(fn):
+        VIEWS[fn.__name__] = (fn, scoped)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            response = serve()
+            if response is not None:
+                return response
+
+            response = make_response(fn(*args, **kwargs))
+            # the same tag as the body would have in a snapshot
+            response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+            return response.make_conditional(request)
+
+        return wrapper
+    return decorate
@@ -0,0 +1,97 @@
+"""
+Warm-up: load what the first requests would otherwise have to, before
+any request comes in.
+
+With gunicorn's preload_app (see config/gunicorn.conf.py) this runs once
+in the master, and every worker forked from it starts out with the
+player index, the EventFrame and the other per-process objects loaded,
+and - with the in-process cache - the views' cached values. Forked
+memory is shared copy-on-write, and most of it is numpy arrays that
+nothing writes to, so the workers keep sharing it.
+
+Each step is timed and printed:
+
+    $ python manage.py warm_up
+    Warm-up: player_index 0.02s
+    ...
+
+To add a step:
+
+    @step('rosters')
+    def rosters():
+        Player.query.all()
+"""
+import time
+from collections import OrderedDict
+
+from app import db
+from app.lib import stats_snapshot
+from app.lib.event_frame import get_frame
+from app.lib.lineups import get_lineups
+from app.lib.pass_network import get_pass_network
+from app.lib.player_index import get_player_index
+
+# name to a function of no arguments, run in order
+STEPS = OrderedDict()
+
+
+def step(name):
+    """
+    Decorator registering a warm-up step.
+    """
+    def register(fn):
+        STEPS[name] = fn
+        return fn
+    return register
+
+
+step('player_index')(get_player_index)
+step('event_frame')(get_frame)
+step('lineups')(get_lineups)
+step('pass_network')(get_pass_network)
+step('snapshot')(stats_snapshot.get_snapshot)
+
+
+@step('views')
+def views():
+    # each @snapshotted view without a team or season, so the values
+    # land under the same cache keys a request looks up. Not needed while
+    # a fresh snapshot answers them.
+    if stats_snapshot.get_snapshot() is not None:
+        return
+    for url, params in stats_snapshot.requests():
+        if not params:
+            stats_snapshot.render(url, params)
+
+
+def warm_up():
+    """
+    Run every step, printing how long each took. A step that fails is
+    reported and skipped; whatever it loads is then loaded by the first
+    request that needs it, as it would be without warm-up.
+
+    returns
+        - dict of step name to seconds, None for the ones that failed
+    """
+    timings = OrderedDict()
+    start = time.time()
+    for name, fn in STEPS.iteritems():
+        step_start = time.time()
+        try:
+            fn()
+        except Exception as e:
+            db.session.rollback()
+            timings[name] = None
+            print "Warm-up: {} failed: {}: {}".format(
+                name, type(e).__name__, e)
+            continue
+        timings[name] = time.time() - step_start
+        print "Warm-up: {} {:.2f}s".format(name, timings[name])
+
+    # connections opened here belong to this process: forked workers have
+    # to open their own.
+    db.session.remove()
+    db.engine.dispose()
+
+    print "Warm-up done in {:.2f}s.".format(time.time() - start)
+    return timings
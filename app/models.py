@@ -1,8 +1,31 @@
-from collections import defaultdict
-from sqlalchemy import and_
+from collections import defaultdict, namedtuple
 
-from app import app, db
-from app.lib.helpers import percentage
+from sqlalchemy import and_, case, func, select
+
+from app import db
+from app.lib import lineups
+from app.lib.cache import versioned
+from app.lib.helpers import gender_split, percentage, team_season_filter
+from app.lib.instrument import instrumented
+from app.lib.pass_network import get_pass_network
+from app.lib.player_index import get_player_index
+from app.lib.reports import run_metric
+from app.lib.rows import iter_rows
+
+
+class DataVersion(db.Model):
+    """
+    Single row (id 1) counting imports. Caches are keyed by it,
+    see app.lib.cache.
+    """
+    __tablename__ = "data_version"
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    # whether the aggregate tables count every event: they do when the
+    # importer kept them from the start, or after rebuild_aggregates.
+    # See app.lib.aggregates.built.
+    aggregates_built = db.Column(db.Boolean, nullable=False, default=True)
 
 
 class Team(db.Model):
@@ -40,6 +63,7 @@ class Player(db.Model):
             'team_name': self.team.name,
         }
 
+    @instrumented
     def female_passing_percentage(self):
         """ Out of total passes this player does, what percentage
         of those are going to a female player?
@@ -47,52 +71,123 @@ class Player(db.Model):
         Take into account lineup? For example, if there's only 1
         female cutter out there, should that handler be considered
         more female friendly if they throw it to them?
-        """
-        female_ids = self.female_ids()
 
-        events = Event.query.filter_by(passer=self.id).all()
-        count = 0
-        for event in events:
-            if event.receiver in female_ids:
-                count += 1
+        Throws are passes plus throwaways, from the pass network.
+        """
+        throws, count, _ = get_pass_network().gender_counts(self.id)
+        if not throws:
+            return "{}: no throws".format(self.name)
 
-        return "{}: {}% of {} throws".format(self.name, percentage(count, len(events)), len(events))
+        return "{}: {}% of {} throws".format(self.name, percentage(count, throws), throws)
 
     @classmethod
-    @app.cache.memoize(timeout=30)
     def female_ids(cls):
-        players = cls.query.filter_by(gender="F").all()
-        return [player.id for player in players]
+        return get_player_index().ids(gender="F")
 
     @classmethod
-    @app.cache.memoize(timeout=30)
     def male_ids(cls):
-        players = cls.query.filter_by(gender="M").all()
-        return [player.id for player in players]
+        return get_player_index().ids(gender="M")
 
     @classmethod
-    @app.cache.memoize(timeout=30)
     def handler_ids(cls):
-        players = cls.query.filter_by(position="Handler").all()
-        return [player.id for player in players]
+        return get_player_index().ids(position="Handler")
 
     @classmethod
-    @app.cache.memoize(timeout=30)
     def cutter_ids(cls):
-        players = cls.query.filter_by(position="Cutter").all()
-        return [player.id for player in players]
+        return get_player_index().ids(position="Cutter")
+
+
+point_players = db.Table(
+    'point_players',
+    db.Column('point_id', db.Integer, db.ForeignKey('points.id'), primary_key=True),
+    db.Column('player_id', db.Integer, db.ForeignKey('players.id'), primary_key=True, index=True),
+)
+
+
+class Point(db.Model):
+    """
+    One point of a game, built by the importer from the point's events.
+    point_players has the lineup.
+    """
+    __tablename__ = "points"
+    __table_args__ = (
+        db.Index('ix_points_team_year', 'team_id', 'year'),
+        db.Index('ix_points_team_played_at', 'team_id', 'played_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # sha1 of team, season, game and score, see app.lib.helpers.point_hash
+    key = db.Column(db.String(40), unique=True, index=True)
+
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'))
+    year = db.Column(db.String(25))
+
+    date = db.Column(db.String(55))  # as the export has it
+    played_at = db.Column(db.DateTime, index=True)  # date, parsed
+    tournament = db.Column(db.String(55))
+    opponent = db.Column(db.String(55))
+    our_score = db.Column(db.Integer)
+    their_score = db.Column(db.Integer)
+    line = db.Column(db.String(25))  # O or D, the line we started on
+    outcome = db.Column(db.String(25))  # won or lost
+    duration = db.Column(db.Integer)  # seconds
+
+    players = db.relationship('Player', secondary=point_players, backref='points')
+    events = db.relationship('Event', backref='point')
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__, self.id)
+
+
+# An event's analytics columns as a plain tuple, for scans that would
+# otherwise build an ORM instance per event. See app.lib.rows.
+EventRecord = namedtuple('EventRecord', [
+    'id', 'point_id', 'date', 'tournament', 'opponent', 'seconds_elapsed',
+    'line', 'our_score', 'their_score', 'event_type', 'action', 'passer',
+    'receiver', 'defender', 'player_1', 'player_2', 'player_3', 'player_4',
+    'player_5', 'player_6', 'player_7',
+])
 
 
 class Event(db.Model):
     __tablename__ = "events"
+    __table_args__ = (
+        db.Index('ix_events_team_year_action', 'team_id', 'year', 'action'),
+        db.Index('ix_events_team_year_passer', 'team_id', 'year', 'passer'),
+        db.Index('ix_events_team_year_receiver', 'team_id', 'year', 'receiver'),
+        db.Index('ix_events_team_year_defender', 'team_id', 'year', 'defender'),
+        db.Index('ix_events_team_year_point', 'team_id', 'year', 'point_id'),
+        db.Index('ix_events_team_played_at', 'team_id', 'played_at'),
+        # every event in the order it happened
+        db.Index(
+            'ix_events_played_at', 'played_at', 'point_id', 'seconds_elapsed'
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
-    # unique string to identify event. Same as plasticdisco.
+    # human readable string to identify event. Same as plasticdisco.
     # "{tourny} > {opp} > {our_score}-{their_score} > {play}"
+    # Not unique: same people can throw to each other in the same point.
     title = db.Column(db.String(255))
 
+    # sha1 of team, game, point, position in point, action and players.
+    # See app.lib.helpers.event_hash. This is what imports dedupe on.
+    content_hash = db.Column(db.String(40), unique=True, index=True)
+
+    point_id = db.Column(db.Integer, db.ForeignKey('points.id'), index=True)
+
+    # same as the players', so analytics can be limited to one team
+    # and season. See app.lib.helpers.team_season_filter.
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'))
+    year = db.Column(db.String(25))
+
+    # date is the export's string. played_at is it parsed, once, by the
+    # importer: date ranges and ordering use it. Within a game, events
+    # go by point, then seconds_elapsed into the point.
     date = db.Column(db.String(55))
+    played_at = db.Column(db.DateTime)
     tournament = db.Column(db.String(55))
     opponent = db.Column(db.String(55))
     seconds_elapsed = db.Column(db.Integer)
@@ -119,124 +214,113 @@ class Event(db.Model):
         Helpful for sorting events into same points. self.title
         is too specific, because it takes "play" into account.
 
-        Could probably add this to the import script and have it
-        as a property instead.
+        The import script now does this: use self.point / self.point_id.
+        A tuple, so points sort by when they were played.
         """
-        return "{date}{opponent}{our_score}{their_score}".format(
-            date=self.date,
-            opponent=self.opponent.encode('utf-8'),
-            our_score=self.our_score,
-            their_score=self.their_score
+        return (
+            self.played_at, self.opponent, self.our_score, self.their_score
         )
 
     @classmethod
-    def off_gender_passes(cls):
+    @instrumented
+    def off_gender_passes(cls, backend=None, team_id=None, year=None,
+                          start=None, end=None):
         """
         Count how many times a pass happens between same gendered players
 
+        Like every analytic here, team_id and year limit it to one team
+        and/or season, and start and end to games played in that range
+        (end not included).
+
         returns
             - counts (ints) of same vs off gendered passes
         """
-        off_gender_passes = 0
-        same_gender_passes = 0
-
-        male_ids = Player.male_ids()
-        female_ids = Player.female_ids()
-        events = cls.query.all()
-
-        for event in events:
-            if event.passer == None or event.receiver == None:
-                continue
-            same_gender = (
-                event.passer in male_ids and event.receiver in male_ids or
-                event.passer in female_ids and event.receiver in female_ids
-            )
-            if same_gender:
-                same_gender_passes += 1
-            else:
-                off_gender_passes += 1
+        return run_metric(
+            'off_gender_passes', backend, team_id, year, start, end
+        )
 
-        return {
-            'off_gender': off_gender_passes,
-            'same_gender': same_gender_passes
+    @classmethod
+    @instrumented
+    @versioned
+    def points_played_by_players(cls, team_id=None, year=None,
+                                 start=None, end=None):
+        """
+        Points played by every player, from a single grouped query
+        over point_players.
+
+        returns {
+            player_id: {
+                'total': 20, 'O': 12, 'D': 8, 'seasons': {'2016': 20}
+            }
         }
+        """
+        rows = db.session.query(
+            point_players.c.player_id, Point.line, Point.year, func.count()
+        ).join(
+            Point, Point.id == point_players.c.point_id
+        ).filter(
+            *team_season_filter(Point.__table__, team_id, year, start, end)
+        ).group_by(point_players.c.player_id, Point.line, Point.year)
 
-    @classmethod
-    def points_played_by_players(cls):
         num_points_by_player = {}
-        players = Player.query.all()
-        for player in players:
-            num_points_by_player[player.name] = cls.points_played_by_player(player.id)
+        for player_id, line, season, count in rows:
+            played = num_points_by_player.setdefault(
+                player_id, {'total': 0, 'O': 0, 'D': 0, 'seasons': {}}
+            )
+            played['total'] += count
+            if line in ('O', 'D'):
+                played[line] += count
+            played['seasons'][season] = played['seasons'].get(season, 0) + count
 
         return num_points_by_player
 
     @classmethod
+    @instrumented
     def points_played_by_player(cls, user_id):
-        points_played = 0
-        points_to_events = cls.points_to_events()
-
-        for point, events in points_to_events.iteritems():
-            # we only care about the first event because that'll have
-            # the lineup for the entire point.
-            event = events[0]
-            if user_id in [
-                event.player_1,
-                event.player_2,
-                event.player_3,
-                event.player_4,
-                event.player_5,
-                event.player_6,
-                event.player_7,
-            ]:
-                points_played += 1
-
-        return points_played
+        # indexed lookup on point_players.player_id
+        return db.session.query(func.count()).select_from(point_players).filter(
+            point_players.c.player_id == user_id
+        ).scalar()
 
     @classmethod
-    @app.cache.memoize(timeout=30)
-    def points_to_events(cls):
+    @instrumented
+    def points_to_events(cls, team_id=None, year=None, start=None, end=None):
         """
-        Distinguish points by unique title and put them in a dict.
-        Keys are points, values are list of events for that point.
+        Put events in a dict by point.
+        Keys are point ids, values are list of EventRecords for that point.
+        Not cached: it's every event, and the analytics don't use it.
         """
+        table = cls.__table__
         points_to_events = defaultdict(list)
-        all_events = cls.query.all()
-        for event in all_events:
-            points_to_events[event.point_title()].append(event)
+        for event in iter_rows(
+            select([table.c[c] for c in EventRecord._fields]).where(
+                and_(*team_season_filter(table, team_id, year, start, end))
+            ).order_by(table.c.id),
+            record=EventRecord
+        ):
+            points_to_events[event.point_id].append(event)
 
         return points_to_events
 
     @classmethod
-    def goals_by_gender(cls):
-        female_ids = Player.female_ids()
-        male_ids = Player.male_ids()
-        male_count = 0
-        female_count = 0
-
-        # Goals for opponent will have None receiver
-        goals = cls.query.filter(
-            cls.action == "Goal",
-            cls.receiver.isnot(None)
-        ).all()
-
-        for goal in goals:
-            if goal.receiver in female_ids:
-                female_count += 1
-            elif goal.receiver in male_ids:
-                male_count += 1
-
-        return {
-            'female': "{}%".format(percentage(female_count, len(goals))),
-            'male': "{}%".format(percentage(male_count, len(goals))),
-        }
+    @instrumented
+    def goals_by_gender(cls, backend=None, team_id=None, year=None,
+                        start=None, end=None):
+        return run_metric(
+            'goals_by_gender', backend, team_id, year, start, end
+        )
 
     @classmethod
-    def full_line_events(cls):
+    @instrumented
+    def full_line_events(cls, team_id=None, year=None, start=None, end=None):
         """
         return all events that we have a full line of players for.
         many lines don't have all 7 players listed. drat.
         """
         return cls.query.filter(
+            and_(
+                *team_season_filter(cls.__table__, team_id, year, start, end)
+            ),
             and_(
                 Event.player_1.isnot(None),
                 Event.player_2.isnot(None),
@@ -248,40 +332,37 @@ class Event(db.Model):
             )).all()
 
     @classmethod
-    def num_points_by_line_split(cls):
+    @instrumented
+    def num_points_by_line_split(cls, team_id=None, year=None,
+                                 start=None, end=None):
         """
         Calculate how many lines we have as 4-3, 3-4,
         or other per POINT, not event
         """
-        points_to_events = cls.points_to_events()
-        male_players = Player.male_ids()
+        male_counts = dict(
+            db.session.query(point_players.c.point_id, func.count()).join(
+                Player, Player.id == point_players.c.player_id
+            ).filter(
+                Player.gender == "M",
+                *team_season_filter(Player.__table__, team_id, year)
+            ).group_by(point_players.c.point_id)
+        )
 
         four_three_points = []
         three_four_points = []
         other = []
 
-        for point, events in points_to_events.iteritems():
-            event = events[0]
-            male_count = 0
-            players = [
-                event.player_1,
-                event.player_2,
-                event.player_3,
-                event.player_4,
-                event.player_5,
-                event.player_6,
-                event.player_7
-            ]
-            for player in players:
-                if player in male_players:
-                    male_count += 1
-
+        points = Point.query.filter(
+            *team_season_filter(Point.__table__, team_id, year, start, end)
+        )
+        for point in points:
+            male_count = male_counts.get(point.id, 0)
             if male_count == 4:
-                four_three_events.append(event)
+                four_three_points.append(point)
             elif male_count == 3:
-                three_four_events.append(event)
+                three_four_points.append(point)
             else:
-                other.append(event)
+                other.append(point)
 
         return {
             '4-3': four_three_points,
@@ -290,7 +371,9 @@ class Event(db.Model):
         }
 
     @classmethod
-    def handler_gender_split(cls):
+    @instrumented
+    def handler_gender_split(cls, backend=None, team_id=None, year=None,
+                             start=None, end=None):
         """
         This takes all events and counts how many "handlers" we have on the
         line. It's not great because lots of people go back and forth between
@@ -299,38 +382,14 @@ class Event(db.Model):
         It's also not great because it goes by events. Probably we should be
         going by points.
         """
-        handler_ids = Player.handler_ids()
-        female_handlers = [f for f in Player.female_ids() if f in handler_ids]
-        male_handlers = [f for f in Player.male_ids() if f in handler_ids]
-
-        all_events = cls.query.all()
-        ret = {}
-
-        for event in all_events:
-            male_count = 0
-            female_count = 0
-            players = [
-                event.player_1,
-                event.player_2,
-                event.player_3,
-                event.player_4,
-                event.player_5,
-                event.player_6,
-                event.player_7
-            ]
-            for player in players:
-                if player in male_handlers:
-                    male_count += 1
-                elif player in female_handlers:
-                    female_count += 1
-            breakdown = "{}-{}".format(male_count, female_count)
-            ret['total'] = ret.get('total', 0) + 1
-            ret[breakdown] = ret.get(breakdown, 0) + 1
-
-        return ret
+        return run_metric(
+            'handler_gender_split', backend, team_id, year, start, end
+        )
 
     @classmethod
-    def line_split_count(cls, line="O"):
+    @instrumented
+    def line_split_count(cls, line="O", team_id=None, year=None,
+                         start=None, end=None):
         """
         On offense we get to choose 3-4 or 4-3. Calculate what
         lines are chosen based on offense or defense.
@@ -338,37 +397,88 @@ class Event(db.Model):
         if line not in ["O", "D"]:
             return "line has to be 'O' or 'D'"
 
-        num_points_by_line_split = cls.num_points_by_line_split()
+        num_points_by_line_split = cls.num_points_by_line_split(
+            team_id, year, start, end)
 
         return {
-            '4-3': len([e for e in num_points_by_line_split['4-3'] if e.line == line]),
-            '3-4': len([e for e in num_points_by_line_split['3-4'] if e.line == line]),
-            'other': len([e for e in num_points_by_line_split['other'] if e.line == line]),
+            '4-3': len([p for p in num_points_by_line_split['4-3'] if p.line == line]),
+            '3-4': len([p for p in num_points_by_line_split['3-4'] if p.line == line]),
+            'other': len([p for p in num_points_by_line_split['other'] if p.line == line]),
         }
 
     @classmethod
-    def dees_by_gender(cls):
-        female_ids = Player.female_ids()
-        male_ids = Player.male_ids()
-        dee_events = cls.query.filter(cls.defender.isnot(None)).all()
+    @instrumented
+    @versioned
+    def top_lineups(cls, size=2, k=10, by='plus_minus', min_points=5,
+                    team_id=None, year=None, start=None, end=None):
+        """
+        Best player combinations by points won and lost together.
 
-        male_count = 0
-        female_count = 0
+        args:
+            - size: players per combination, 2 for pairs, 3 for trios,
+                7 for full lines
+            - k: how many to return
+            - by: stat to rank on, see app.lib.lineups.SORT_KEYS
+            - min_points: leave out combinations that played fewer
+                points together
+
+        returns: [
+            {'player_ids': [1, 2], 'points': 30, 'o_points': 18,
+             'd_points': 12, 'won': 20, 'lost': 10, 'plus_minus': 10,
+             'holds': 14, 'breaks': 6, 'hold_rate': '77.78',
+             'break_rate': '50.00'},
+        ]
+        """
+        engine = lineups.get_lineups(team_id, year, start, end)
+        return [
+            lineups.to_api_dict(stats)
+            for stats in engine.top(size, k, by, min_points)
+        ]
+
+    @classmethod
+    @instrumented
+    @versioned
+    def pass_network(cls, k=5, team_id=None, year=None, start=None, end=None):
+        """
+        Who passes to whom, for every player at once. See
+        app.lib.pass_network.
+
+        returns {
+            'players': [
+                {'id': 1, 'total': 50, 'female': '40.00%', 'male': '60.00%',
+                 'connections': [
+                    {'receiver_id': 2, 'passes': 10, 'completions': 9,
+                     'drops': 1, 'goals': 2},
+                 ]},
+            ],
+            'gender_flow': {'F': {'F': 120, 'M': 80, 'unknown': 0}, ...},
+        }
+        """
+        network = get_pass_network(team_id, year, start, end)
 
-        for d in dee_events:
-            if d.defender in female_ids:
-                female_count += 1
-            elif d.defender in male_ids:
-                male_count += 1
+        players = []
+        for player_id, split in sorted(network.gender_splits().items()):
+            players.append(dict(
+                split, id=player_id,
+                connections=network.connections(player_id, k)
+            ))
 
         return {
-            'female': "{}%".format(percentage(female_count, len(dee_events))),
-            'male': "{}%".format(percentage(male_count, len(dee_events))),
-            'total': len(dee_events)
+            'players': players,
+            'gender_flow': network.gender_flow(),
         }
 
     @classmethod
-    def receives_by_gender(cls, receive_events=None, breakdown=None):
+    @instrumented
+    def dees_by_gender(cls, backend=None, team_id=None, year=None,
+                       start=None, end=None):
+        return run_metric('dees_by_gender', backend, team_id, year, start, end)
+
+    @classmethod
+    @instrumented
+    def receives_by_gender(cls, receive_events=None, breakdown=None,
+                           backend=None, team_id=None, year=None,
+                           start=None, end=None):
         """
         For the sake of this analysis, we're going to include all
         actions where there is a receiver. This includes:
@@ -386,6 +496,8 @@ class Event(db.Model):
             - events: list. can pass in your own events to analyze
                 otherwise, will search entire set of events.
             - breakdown: '3-4' or '4-3' for line composition
+            - backend: 'python', 'sql' or 'aggregate', see app.lib.reports
+            - team_id, year: only count that team's and/or season's events
 
         returns:
             - Total number of receives
@@ -394,32 +506,35 @@ class Event(db.Model):
         """
         if receive_events is None:
             if breakdown is None:
-                receive_events = (
-                    cls.query.filter(Event.receiver.isnot(None)).all()
+                return run_metric(
+                    'receives_by_gender', backend, team_id, year, start, end
                 )
             elif breakdown in ['3-4', '4-3']:
-                events_by_line = cls.num_points_by_line_split()
-                all_events = events_by_line[breakdown]
-                receive_events = [
-                    e for e in all_events if e.receiver is not None
-                ]
+                points_by_line = cls.num_points_by_line_split(
+                    team_id, year, start, end)
+                point_ids = [p.id for p in points_by_line[breakdown]]
+                receive_events = []
+                if point_ids:
+                    receive_events = cls.query.filter(
+                        cls.point_id.in_(point_ids),
+                        cls.receiver.isnot(None)
+                    ).all()
             else:
                 return "breakdown {} unknown".format(breakdown)
 
-        male_ids = Player.male_ids()
+        players = get_player_index()
+        male_ids = players.ids(gender="M")
         male = [e for e in receive_events if e.receiver in male_ids]
 
-        female_ids = Player.female_ids()
+        female_ids = players.ids(gender="F")
         fem = [e for e in receive_events if e.receiver in female_ids]
 
-        return {
-            'total': len(receive_events),
-            'female': "{}%".format(percentage(len(fem), len(receive_events))),
-            'male': "{}%".format(percentage(len(male), len(receive_events))),
-        }
+        return gender_split(len(receive_events), len(fem), len(male))
 
     @classmethod
-    def gender_contribution_to_score(cls):
+    @instrumented
+    def gender_contribution_to_score(cls, backend=None, team_id=None,
+                                     year=None, start=None, end=None):
         """
         Find out percentage of touches on winning vs losing points. For
         example, on winning points, are we using our women more? Or are
@@ -430,96 +545,236 @@ class Event(db.Model):
             'losing': {'male': 50%, 'female': 50%, 'total': 250}
         }
         """
-        winning_events = []
-        losing_events = []
-
-        for point, events in cls.points_to_events().iteritems():
-            for event in events:
-                if event.action == "Goal":
-                    if event.receiver is None:
-                        losing_events.extend(
-                            [e for e in events if e.receiver is not None]
-                        )
-                    else:
-                        winning_events.extend(
-                            [e for e in events if e.receiver is not None]
-                        )
-
-        return {
-            'winning': cls.receives_by_gender(receive_events=winning_events),
-            'losing': cls.receives_by_gender(receive_events=losing_events)
-        }
+        return run_metric(
+            'gender_contribution_to_score', backend, team_id, year, start, end
+        )
 
     @classmethod
-    def receives_for_position(cls, position="handlers"):
+    @instrumented
+    def receives_for_position(cls, position="handlers", backend=None,
+                              team_id=None, year=None, start=None, end=None):
         """
         Returns breakdown of receives by gender for position - handler, cutter
         """
         if position == "handlers":
-            position_ids = Player.handler_ids()
+            return run_metric(
+                'receives_for_handlers', backend, team_id, year, start, end
+            )
         elif position == "cutters":
-            position_ids = Player.cutter_ids()
+            return run_metric(
+                'receives_for_cutters', backend, team_id, year, start, end
+            )
         else:
             return "Position {} unknown".format(position)
 
-        events = cls.query.filter(Event.receiver.isnot(None)).all()
-        position_receives = [e for e in events if e.receiver in position_ids]
-
-        female_players = Player.female_ids()
-        female_position = [p for p in female_players if p in position_ids]
-        female_receives = [e for e in events if e.receiver in female_position]
-
-        male_players = Player.male_ids()
-        male_position = [p for p in male_players if p in position_ids]
-        male_receives = [e for e in events if e.receiver in male_position]
-
-        return {
-            'position': position,
-            'female': "{}%".format(
-                percentage(len(female_receives), len(position_receives))
-            ),
-            'male': "{}%".format(
-                percentage(len(male_receives), len(position_receives))
-            )
-        }
-
     @classmethod
-    def conversion_rate(cls):
+    @instrumented
+    @versioned
+    def conversion_rate(cls, team_id=None, year=None, start=None, end=None):
         """
-        Take each point, figure out what line we start off on, and then count
-        how many times it switches.
+        How well each line scores, from the possessions (see
+        app.lib.possessions) and points of the points it started.
+
+        - conversion: out of our possessions, how many ended in a goal
+        - hold_rate for O, break_rate for D: out of the points, how many
+          we won
+
+        returns {
+            'O': {'points': 40, 'won': 26, 'possessions': 55, 'goals': 26,
+                  'conversion': '47.27', 'hold_rate': '65.00'},
+            'D': {'points': 38, 'won': 14, 'possessions': 30, 'goals': 14,
+                  'conversion': '46.67', 'break_rate': '36.84'},
+        }
+        """
+        def count_where(condition):
+            return func.sum(case([(condition, 1)], else_=0))
+
+        possessions = db.session.query(
+            Possession.line, func.count(),
+            count_where(Possession.outcome == "goal")
+        ).filter(
+            Possession.offense.is_(True),
+            *team_season_filter(Possession.__table__, team_id, year)
+        )
+        if start is not None or end is not None:
+            # possessions are dated by their point
+            possessions = possessions.join(
+                Point, Point.id == Possession.point_id
+            ).filter(
+                *team_season_filter(Point.__table__, start=start, end=end)
+            )
+        possessions = dict(
+            (line, (count, goals)) for line, count, goals in
+            possessions.group_by(Possession.line)
+        )
+        points = dict(
+            (line, (count, won)) for line, count, won in db.session.query(
+                Point.line, func.count(), count_where(Point.outcome == "won")
+            ).filter(
+                *team_season_filter(Point.__table__, team_id, year, start, end)
+            ).group_by(Point.line)
+        )
 
-        If O, count number of drops, throwaways in one point to get number of posessions.
+        rates = {}
+        for line, rate in [('O', 'hold_rate'), ('D', 'break_rate')]:
+            num_points, won = points.get(line, (0, 0))
+            num_possessions, goals = possessions.get(line, (0, 0))
+            rates[line] = {
+                'points': int(num_points),
+                'won': int(won or 0),
+                'possessions': int(num_possessions),
+                'goals': int(goals or 0),
+                'conversion': (
+                    percentage(goals, num_possessions) if num_possessions else None
+                ),
+                rate: percentage(won, num_points) if num_points else None,
+            }
+
+        return rates
+
+
+class Possession(db.Model):
+    """
+    A run of events where one team had the disc, written by the importer.
+    See app.lib.possessions.
+    """
+    __tablename__ = "possessions"
+    __table_args__ = (
+        db.Index('ix_possessions_team_year', 'team_id', 'year'),
+    )
 
-        all posessions that end in score/all possessions
-        """
-        points_to_events = cls.points_to_events()
+    id = db.Column(db.Integer, primary_key=True)
+    point_id = db.Column(db.Integer, db.ForeignKey('points.id'), index=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'))
+    year = db.Column(db.String(25))
 
-        line_to_possessions = {
-            'O': None,
-            'D': None,
-        }
-        line_to_goals = {
-            'O': None,
-            'D': None,
-        }
+    sequence = db.Column(db.Integer)  # 0 for the point's first possession
+    line = db.Column(db.String(25))  # O or D, the line the point started on
+    offense = db.Column(db.Boolean)  # ours, rather than theirs
+    seconds_elapsed = db.Column(db.Integer)  # into the point, at its start
+    duration = db.Column(db.Integer)  # seconds
+    events = db.Column(db.Integer)
+    outcome = db.Column(db.String(25))  # goal, drop, throwaway, d; None if unfinished
+
+
+# Aggregate tables. The importer adds each new event's counts to them
+# (see app.lib.aggregates), so reading a season's stats never has to
+# scan the events. `python manage.py rebuild_aggregates` recomputes them.
+
+class PlayerStats(db.Model):
+    __tablename__ = "player_stats"
+
+    player_id = db.Column(db.Integer, db.ForeignKey('players.id'), primary_key=True)
+
+    # as passer
+    passes = db.Column(db.Integer, nullable=False, default=0)
+    assists = db.Column(db.Integer, nullable=False, default=0)
+    throwaways = db.Column(db.Integer, nullable=False, default=0)
+    # as receiver
+    receives = db.Column(db.Integer, nullable=False, default=0)
+    goals = db.Column(db.Integer, nullable=False, default=0)
+    drops = db.Column(db.Integer, nullable=False, default=0)
+    # as defender: blocks and pulls
+    dees = db.Column(db.Integer, nullable=False, default=0)
+
+    points_played = db.Column(db.Integer, nullable=False, default=0)
+    o_points = db.Column(db.Integer, nullable=False, default=0)
+    d_points = db.Column(db.Integer, nullable=False, default=0)
+
+
+class PassStats(db.Model):
+    __tablename__ = "pass_stats"
+
+    passer_id = db.Column(db.Integer, db.ForeignKey('players.id'), primary_key=True)
+    receiver_id = db.Column(db.Integer, db.ForeignKey('players.id'), primary_key=True)
+    passes = db.Column(db.Integer, nullable=False, default=0)
+    # out of passes: caught (goals included), dropped, and caught for a goal
+    completions = db.Column(db.Integer, nullable=False, default=0)
+    drops = db.Column(db.Integer, nullable=False, default=0)
+    goals = db.Column(db.Integer, nullable=False, default=0)
+
+
+class TeamCounts(object):
+    """
+    Counters kept per point, game and tournament.
+    """
+    events = db.Column(db.Integer, nullable=False, default=0)
+    passes = db.Column(db.Integer, nullable=False, default=0)
+    receives = db.Column(db.Integer, nullable=False, default=0)
+    goals_for = db.Column(db.Integer, nullable=False, default=0)
+    goals_against = db.Column(db.Integer, nullable=False, default=0)
+    turnovers = db.Column(db.Integer, nullable=False, default=0)
+    dees = db.Column(db.Integer, nullable=False, default=0)
+
+
+class PointStats(TeamCounts, db.Model):
+    __tablename__ = "point_stats"
+
+    point_id = db.Column(db.Integer, db.ForeignKey('points.id'), primary_key=True)
+
+
+class PointReceives(db.Model):
+    """
+    Receives per player per point, for stats that weigh receives by
+    how the point went.
+    """
+    __tablename__ = "point_receives"
+
+    point_id = db.Column(db.Integer, db.ForeignKey('points.id'), primary_key=True)
+    player_id = db.Column(db.Integer, db.ForeignKey('players.id'), primary_key=True)
+    receives = db.Column(db.Integer, nullable=False, default=0)
+
+
+class LineupEvents(db.Model):
+    """
+    Events per point by the line on for them, as sorted, comma separated
+    player ids: a point's line can change partway (an injury sub), and
+    stats by each event's line need those.
+    """
+    __tablename__ = "lineup_events"
+
+    point_id = db.Column(db.Integer, db.ForeignKey('points.id'), primary_key=True)
+    lineup = db.Column(db.String(100), primary_key=True)
+    events = db.Column(db.Integer, nullable=False, default=0)
+
+
+class GameStats(TeamCounts, db.Model):
+    """
+    Counts per game. Games, like tournaments, are counted per team and
+    season: two of our teams can play the same opponent on the same day.
+    """
+    __tablename__ = "game_stats"
+
+    team_id = db.Column(
+        db.Integer, db.ForeignKey('teams.id'), primary_key=True,
+        autoincrement=False
+    )
+    year = db.Column(db.String(25), primary_key=True)
+    date = db.Column(db.String(55), primary_key=True)
+    tournament = db.Column(db.String(55), primary_key=True)
+    opponent = db.Column(db.String(55), primary_key=True)
+    points = db.Column(db.Integer, nullable=False, default=0)
 
-        for point, events in points_to_events:
-            posessions = 0
-            goals = 0
-            line = events[0].line # determine if this is an O or D line
-            line_to_points[line] = line_to_points.get(line, 0) + 1
+    def to_api_dict(self):
+        return dict(
+            (column.name, getattr(self, column.name))
+            for column in self.__table__.columns
+        )
 
-            for event in events:
-                if event.line == 'O' and event.action in ['Drop', 'Throwaway']:
-                    posessions += 1
-                if event.line == 'O' and event.action in ['Goal']:
-                    goals += 1
 
-            line_to_possessions[line] = line_to_possessions.get(line, 0) + posessions
+class TournamentStats(TeamCounts, db.Model):
+    __tablename__ = "tournament_stats"
 
-        return {
-            'O': percentage(line_to_points['O']/line_to_possessions['O']),
-            'D': percentage(line_to_points['D']/line_to_possessions['D'])
-        }
+    team_id = db.Column(
+        db.Integer, db.ForeignKey('teams.id'), primary_key=True,
+        autoincrement=False
+    )
+    year = db.Column(db.String(25), primary_key=True)
+    tournament = db.Column(db.String(55), primary_key=True)
+    points = db.Column(db.Integer, nullable=False, default=0)
 
+    def to_api_dict(self):
+        return dict(
+            (column.name, getattr(self, column.name))
+            for column in self.__table__.columns
+        )
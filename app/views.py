@@ -1,9 +1,48 @@
 import json
+from datetime import timedelta
 
-from flask import render_template
+from flask import abort, render_template, request
 
-from app import app
-from app.models import Player
+from app import app, db
+from app.lib.helpers import parse_timestamp, team_season_filter
+from app.lib.instrument import snapshot
+from app.lib.reports import build_report
+from app.lib.season_reports import season_report
+from app.lib.stats_snapshot import snapshotted
+from app.models import Event, GameStats, Player, TournamentStats
+
+
+# /api/_metrics is only served to requests from this machine.
+LOCAL_ADDRS = ['127.0.0.1', '::1']
+
+
+def team_season_args():
+    """
+    Optional team_id and year parameters, to limit stats to one team
+    and/or season.
+    """
+    return request.values.get('team_id', type=int), request.values.get('year')
+
+
+def date_range_args():
+    """
+    Optional start and end parameters (2016-06-04, or with a time as in
+    the exports), to limit stats to games played in that range. A plain
+    end date includes that day.
+    """
+    dates = []
+    for name in ['start', 'end']:
+        value = request.values.get(name)
+        if not value:
+            dates.append(None)
+            continue
+        date = parse_timestamp(value)
+        if date is None:
+            abort(400)
+        if name == 'end' and ':' not in value:
+            date += timedelta(days=1)
+        dates.append(date)
+    return dates
 
 
 @app.route('/', defaults={'path': ''})
@@ -15,9 +54,91 @@ def catch_all(path):
     return render_template('base.html')
 
 
-@app.route('/api/players', methods=['POST'])
+@app.route('/api/players', methods=['GET', 'POST'])
+@snapshotted()
 def team():
     players = Player.query.all()
     resp = [p.to_api_dict() for p in players]
 
     return json.dumps(resp)
+
+
+@app.route('/api/players/points', methods=['GET', 'POST'])
+@snapshotted(scoped=True)
+def points_played():
+    team_id, year = team_season_args()
+    start, end = date_range_args()
+    points_played = Event.points_played_by_players(team_id, year, start, end)
+    players = db.session.query(Player.id, Player.name).filter(
+        *team_season_filter(Player.__table__, team_id, year)
+    )
+
+    resp = []
+    for player_id, name in players:
+        played = points_played.get(
+            player_id, {'total': 0, 'O': 0, 'D': 0, 'seasons': {}}
+        )
+        resp.append(dict(played, id=player_id, name=name))
+
+    return json.dumps(resp)
+
+
+@app.route('/api/passes', methods=['GET', 'POST'])
+@snapshotted(scoped=True)
+def passes():
+    # every player's passing split and top receivers, plus the flow
+    # between genders. k sets how many receivers per player.
+    team_id, year = team_season_args()
+    start, end = date_range_args()
+    k = request.values.get('k', 5, type=int)
+    return json.dumps(Event.pass_network(k, team_id, year, start, end))
+
+
+@app.route('/api/report', methods=['GET', 'POST'])
+@snapshotted(scoped=True)
+def report():
+    # every metric for the dashboard, from a single scan of the events.
+    team_id, year = team_season_args()
+    start, end = date_range_args()
+    return json.dumps(
+        build_report(team_id=team_id, year=year, start=start, end=end)
+    )
+
+
+@app.route('/api/season', methods=['GET', 'POST'])
+@snapshotted(scoped=True)
+def season():
+    # every Event analytic for one team and/or season, see
+    # app.lib.season_reports.
+    team_id, year = team_season_args()
+    return json.dumps(season_report(team_id, year), sort_keys=True)
+
+
+@app.route('/api/games', methods=['GET', 'POST'])
+@snapshotted(scoped=True)
+def games():
+    team_id, year = team_season_args()
+    games = GameStats.query.filter(
+        *team_season_filter(GameStats.__table__, team_id, year)
+    ).order_by(GameStats.date, GameStats.team_id).all()
+    return json.dumps([g.to_api_dict() for g in games])
+
+
+@app.route('/api/tournaments', methods=['GET', 'POST'])
+@snapshotted(scoped=True)
+def tournaments():
+    team_id, year = team_season_args()
+    tournaments = TournamentStats.query.filter(
+        *team_season_filter(TournamentStats.__table__, team_id, year)
+    ).order_by(
+        TournamentStats.team_id, TournamentStats.year,
+        TournamentStats.tournament
+    ).all()
+    return json.dumps([t.to_api_dict() for t in tournaments])
+
+
+@app.route('/api/_metrics', methods=['GET'])
+def metrics():
+    if request.remote_addr not in LOCAL_ADDRS:
+        abort(404)
+    return json.dumps(snapshot())
@@ -0,0 +1,195 @@
+"""
+Write synthetic roster and event csvs, in the ultianalytics export
+layout import_data expects, for benchmarking.
+
+    $ python -m benchmarks.generate --games 50 --seasons 3 --teams 2 --out /tmp/bench
+
+One roster and one stats file per team and season. Every team has the
+same player names, as real teams often share a few.
+"""
+import argparse
+import csv
+import os
+import random
+
+ROSTER_HEADER = ['Name', 'Gender', 'Position', 'OD']
+STATS_HEADER = [
+    'Date/Time', 'Tournamemnt', 'Opponent', 'Point Elapsed Seconds', 'Line',
+    'Our Score - End of Point', 'Their Score - End of Point', 'Event Type',
+    'Action', 'Passer', 'Receiver', 'Defender', 'Player 0', 'Player 1',
+    'Player 2', 'Player 3', 'Player 4', 'Player 5', 'Player 6',
+]
+
+FIRST_SEASON = 2016
+GAMES_PER_TOURNAMENT = 6
+GAME_TO = 13
+
+
+def team_name(team):
+    return "Team{}".format(team)
+
+
+def roster(team, players):
+    """
+    Roster rows for a mixed team: alternating genders, a third handlers.
+    Teams alternate which gender goes first, so a name two teams share
+    isn't the same player.
+    """
+    return [
+        {
+            'Name': "P{}".format(i),
+            'Gender': "F" if (i + team) % 2 else "M",
+            'Position': "Handler" if i % 3 == 0 else "Cutter",
+            'OD': "O" if i % 4 < 2 else "D",
+        }
+        for i in range(players)
+    ]
+
+
+def point_events(rng, names, line):
+    """
+    Plays of one point, starting on line ('O' or 'D').
+
+    returns
+        - list of (event type, action, passer, receiver, defender, lineup)
+        - True if we scored
+    """
+    lineup = rng.sample(names, 7)
+    if rng.random() < 0.1:
+        # a line with a missing player, like the real data has
+        lineup[6] = ''
+    on_field = [name for name in lineup if name]
+
+    side = "Offense" if line == "O" else "Defense"
+    events = []
+    if side == "Defense":
+        events.append((side, "Pull", '', '', rng.choice(on_field)))
+
+    while True:
+        if side == "Offense":
+            passer, receiver = rng.sample(on_field, 2)
+            roll = rng.random()
+            if roll < 0.12:
+                events.append((side, "Goal", passer, receiver, ''))
+                return events, lineup, True
+            elif roll < 0.18:
+                events.append((side, "Drop", passer, receiver, ''))
+                side = "Defense"
+            elif roll < 0.25:
+                events.append((side, "Throwaway", passer, '', ''))
+                side = "Defense"
+            else:
+                events.append((side, "Catch", passer, receiver, ''))
+        else:
+            roll = rng.random()
+            if roll < 0.15:
+                events.append((side, "Goal", '', '', ''))
+                return events, lineup, False
+            elif roll < 0.3:
+                events.append((side, "D", '', '', rng.choice(on_field)))
+                side = "Offense"
+            elif roll < 0.4:
+                events.append((side, "Throwaway", '', '', ''))
+                side = "Offense"
+
+
+def game_rows(rng, names, date, tournament, opponent):
+    """
+    Stats rows for one game to GAME_TO.
+    """
+    rows = []
+    us = them = 0
+    line = rng.choice("OD")
+    while us < GAME_TO and them < GAME_TO:
+        events, lineup, scored = point_events(rng, names, line)
+        if scored:
+            us += 1
+        else:
+            them += 1
+
+        seconds = 0
+        for event_type, action, passer, receiver, defender in events:
+            seconds += rng.randint(2, 9)
+            rows.append([
+                date, tournament, opponent, seconds, line, us, them,
+                event_type, action, passer, receiver, defender,
+            ] + lineup)
+
+        # the team that scored pulls next
+        line = "D" if scored else "O"
+
+    return rows
+
+
+def write_csv(path, header, rows):
+    with open(path, 'wb') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(header)
+        # the real exports have an empty row after the header, which
+        # import_data.read_csv skips.
+        writer.writerow([''] * len(header))
+        writer.writerows(rows)
+
+
+def generate(out_dir, games=20, seasons=1, teams=1, players=28, seed=1):
+    """
+    Write the csvs for every team and season.
+
+    returns
+        - list of (team name, year, roster path, stats path)
+    """
+    rng = random.Random(seed)
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+
+    files = []
+    for team in range(teams):
+        rows = roster(team, players)
+        names = [row['Name'] for row in rows]
+        for season in range(seasons):
+            year = str(FIRST_SEASON + season)
+            roster_path = os.path.join(
+                out_dir, "roster_{}_{}.csv".format(team_name(team), year))
+            stats_path = os.path.join(
+                out_dir, "stats_{}_{}.csv".format(team_name(team), year))
+
+            write_csv(roster_path, ROSTER_HEADER, [
+                [row[column] for column in ROSTER_HEADER] for row in rows
+            ])
+
+            stats = []
+            for game in range(games):
+                date = "{}-{:02d}-{:02d} {:02d}:00".format(
+                    year, game // 28 % 12 + 1, game % 28 + 1, 9 + game % 8)
+                tournament = "Tournament {}".format(game // GAMES_PER_TOURNAMENT)
+                # every team plays the same schedule of opponents, as
+                # teams in one league do
+                opponent = "Opponent {}".format(game)
+                stats.extend(game_rows(rng, names, date, tournament, opponent))
+            write_csv(stats_path, STATS_HEADER, stats)
+
+            files.append((team_name(team), year, roster_path, stats_path))
+
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument('--out', default='bench_data')
+    parser.add_argument('--games', type=int, default=20,
+                        help="games per team per season")
+    parser.add_argument('--seasons', type=int, default=1)
+    parser.add_argument('--teams', type=int, default=1)
+    parser.add_argument('--players', type=int, default=28,
+                        help="players per team")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    files = generate(args.out, args.games, args.seasons, args.teams,
+                     args.players, args.seed)
+    for team, year, roster_path, stats_path in files:
+        print "{} {}: {} {}".format(team, year, roster_path, stats_path)
+
+
+if __name__ == '__main__':
+    main()
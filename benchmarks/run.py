@@ -0,0 +1,225 @@
+"""
+Time imports and analytics against a scratch database and write the
+results as JSON, to compare between commits.
+
+    $ python -m benchmarks.run --games 50 --seasons 3 --output before.json
+    $ git checkout other-branch
+    $ python -m benchmarks.run --games 50 --seasons 3 --output after.json
+
+By default it uses a throwaway SQLite file. --database-url points it at
+a Postgres stand-in instead; every table there is dropped and recreated.
+"""
+import argparse
+import inspect
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+from app import app, db
+from app.lib.instrument import tally
+from benchmarks.generate import generate
+
+
+def clear_caches():
+    """
+    Forget everything cached, so each timed call does the full work.
+    """
+    from app.lib.event_frame import _frame
+    from app.lib.lineups import _engine
+    from app.lib.pass_network import _network
+    from app.lib.player_index import _index
+
+    app.cache.clear()
+    _frame.clear()
+    _engine.clear()
+    _network.clear()
+    _index.clear()
+
+
+def timed(fn, repeat):
+    """
+    Time fn cold (caches cleared) repeat times, then once warm. Queries
+    and rows scanned are from the last cold run.
+    """
+    cold = []
+    for _ in range(repeat):
+        clear_caches()
+        start = time.time()
+        with tally() as current:
+            fn()
+        cold.append(time.time() - start)
+
+    start = time.time()
+    fn()
+    warm = time.time() - start
+
+    return {
+        'cold': cold,
+        'min': min(cold),
+        'warm': warm,
+        'queries': current.queries,
+        'rows': current.rows,
+    }
+
+
+def unwrap(fn):
+    while hasattr(fn, '__wrapped__'):
+        fn = fn.__wrapped__
+    return fn
+
+
+def analytics():
+    """
+    (name, callable) for every Event classmethod, once per report backend
+    for the ones that take one, plus the players endpoint.
+    """
+    from app.lib.reports import BACKENDS, build_report
+    from app.models import Event, Player
+
+    player_id = db.session.query(Player.id).order_by(Player.id).first()[0]
+    args = {
+        'points_played_by_player': (player_id,),
+    }
+
+    calls = []
+    for name, attr in sorted(vars(Event).items()):
+        if name.startswith('_') or not isinstance(attr, classmethod):
+            continue
+        method = getattr(Event, name)
+        method_args = args.get(name, ())
+        if 'backend' in inspect.getargspec(unwrap(attr.__func__)).args:
+            for backend in sorted(BACKENDS):
+                calls.append((
+                    "Event.{}[{}]".format(name, backend),
+                    lambda m=method, a=method_args, b=backend: m(*a, backend=b)
+                ))
+        else:
+            calls.append((
+                "Event.{}".format(name),
+                lambda m=method, a=method_args: m(*a)
+            ))
+
+    for backend in sorted(BACKENDS):
+        calls.append((
+            "build_report[{}]".format(backend),
+            lambda b=backend: build_report(backend=b)
+        ))
+
+    client = app.test_client()
+    calls.append(("POST /api/players", lambda: client.post('/api/players')))
+
+    return calls
+
+
+def import_all(files):
+    """
+    Import every generated roster and stats file, timing each step.
+    """
+    import import_data
+    from app.models import Team
+
+    for team in sorted(set(team for team, _, _, _ in files)):
+        db.session.add(Team(name=team))
+    db.session.commit()
+
+    roster_time = events_time = 0
+    for team, year, roster_path, stats_path in files:
+        start = time.time()
+        name_to_id = import_data.update_roster(roster_path, year, team)
+        roster_time += time.time() - start
+
+        start = time.time()
+        import_data.import_events(
+            name_to_id, stats_path, team_name=team, year=year)
+        events_time += time.time() - start
+
+    return {'roster': roster_time, 'events': events_time}
+
+
+def counts():
+    from app.models import Event, Player, Point
+
+    return {
+        'events': Event.query.count(),
+        'points': Point.query.count(),
+        'players': Player.query.count(),
+    }
+
+
+def git_commit():
+    with open(os.devnull, 'w') as devnull:
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], stderr=devnull
+            ).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+
+def run(database_url, games, seasons, teams, repeat):
+    data_dir = tempfile.mkdtemp(prefix='frisbee-bench-')
+    try:
+        if database_url is None:
+            database_url = 'sqlite:///' + os.path.join(data_dir, 'bench.db')
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+
+        files = generate(data_dir, games=games, seasons=seasons, teams=teams)
+
+        with app.test_request_context():
+            db.drop_all()
+            db.create_all()
+
+            results = {
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'database': db.engine.dialect.name,
+                'size': {'games': games, 'seasons': seasons, 'teams': teams},
+                'import': import_all(files),
+                'timings': {},
+            }
+            results['size'].update(counts())
+
+            for name, fn in analytics():
+                try:
+                    results['timings'][name] = timed(fn, repeat)
+                except Exception as e:
+                    db.session.rollback()
+                    results['timings'][name] = {
+                        'error': "{}: {}".format(type(e).__name__, e)
+                    }
+                print "{:<50} {}".format(
+                    name, results['timings'][name].get('min', 'error'))
+
+            db.session.remove()
+    finally:
+        shutil.rmtree(data_dir)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument('--database-url',
+                        help="defaults to a temporary sqlite file")
+    parser.add_argument('--games', type=int, default=20,
+                        help="games per team per season")
+    parser.add_argument('--seasons', type=int, default=1)
+    parser.add_argument('--teams', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="cold runs per analytic")
+    parser.add_argument('--output', default='bench_output.json')
+    args = parser.parse_args()
+
+    results = run(args.database_url, args.games, args.seasons, args.teams,
+                  args.repeat)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print "Wrote {}".format(args.output)
+
+
+if __name__ == '__main__':
+    main()
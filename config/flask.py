@@ -14,3 +14,8 @@ class Development(Config):
 class Production(Config):
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', '')
+
+    # shared by all gunicorn workers, so each value is computed once
+    # per import instead of once per worker.
+    CACHE_TYPE = 'filesystem'
+    CACHE_DIR = os.environ.get('CACHE_DIR', '/tmp/frisbee-stats-cache')
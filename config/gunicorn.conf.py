@@ -1 +1,27 @@
 timeout = 200
+
+# Load the app once in the master and warm it up there (see
+# app.lib.warmup), so workers fork with the player index, EventFrame and
+# cached responses already in memory instead of each loading them on
+# its first requests.
+preload_app = True
+
+
+def when_ready(server):
+    # runs in the master, before any worker is forked
+    if not server.cfg.preload_app:
+        return
+
+    from app import app
+    from app.lib.warmup import warm_up
+
+    with app.app_context():
+        warm_up()
+
+
+def post_fork(server, worker):
+    # connections the master left in the pool can't be shared between
+    # processes.
+    from app import db
+
+    db.engine.dispose()
@@ -1,49 +1,278 @@
 import csv
+import glob
+import json
+import multiprocessing
+import os
+import re
+import time
+from collections import OrderedDict
+from Queue import Empty
+
+from sqlalchemy import bindparam
 
 from app import db
-from app.models import Player, Event, Team
+from app.lib.aggregates import AggregateDeltas
+from app.lib.bulk import insert_rows, insert_rows_returning_ids, replace_rows
+from app.lib.cache import bump_data_version
+from app.lib.event_frame import LINEUP_COLUMNS
+from app.lib.helpers import EventHasher
+from app.lib.possessions import POSSESSION_COLUMNS, PossessionSegmenter
+from app.models import Player, Point, Possession, Event, Team, point_players
 
 YEAR = '2016'
 ROSTER_FILE = 'data/classy_roster_{}.csv'.format(YEAR)
 STATS_FILE = 'data/classy_data_{}.csv'.format(YEAR)
 
-def create_player(player_info):
-    name = player_info['Name']
-    team_name = "Classy"
+# Number of events to hold in memory before writing them out.
+BATCH_SIZE = 1000
 
-    existing = Player.query.filter_by(name=name, year=YEAR).first()
-    if existing:
-        print "Already found player {}. skipping.".format(name)
-        return
+# Bytes of a JSON dump to read at a time, see iter_json_array.
+JSON_CHUNK_SIZE = 64 * 1024
 
-    team = Team.query.filter_by(name=team_name).first()
-    team_id = team.id if team else None
-
-    print "Adding new player {}.".format(name)
-    db.session.add(
-        Player(
-            name=name,
-            gender=player_info['Gender'],
-            position=player_info['Position'],
-            od=player_info['OD'],
-            team_id=team_id,
-            year=YEAR,
-        )
+# import_files: event rows per message from a parse worker, and messages
+# waiting for the writer before the workers block.
+PARSE_CHUNK_SIZE = 1000
+QUEUE_SIZE = 16
+
+EVENT_COLUMNS = [
+    'date', 'played_at', 'title', 'content_hash', 'point_id', 'team_id',
+    'year', 'tournament', 'opponent',
+    'seconds_elapsed', 'line', 'our_score', 'their_score', 'event_type',
+    'action', 'passer', 'receiver', 'defender', 'player_1', 'player_2',
+    'player_3', 'player_4', 'player_5', 'player_6', 'player_7',
+]
+
+PLAYER_FIELDS = ['gender', 'position', 'od']
+
+
+def decode_row(row):
+    """
+    A csv row's values as unicode, as the JSON dumps and the db have
+    them. Exports are utf-8.
+    """
+    return dict(
+        (column, value.decode('utf-8') if isinstance(value, str) else value)
+        for column, value in row.iteritems()
     )
 
 
-def update_roster():
-    with open(ROSTER_FILE, 'rb') as csvfile:
+def read_csv(path):
+    """
+    Stream rows of an ultianalytics export one dict at a time, so
+    large files never have to be held in memory.
+    """
+    with open(path, 'rb') as csvfile:
         reader = csv.DictReader(csvfile, delimiter=',')
         reader.next()
-        roster_data = [row for row in reader]
+        for row in reader:
+            yield decode_row(row)
+
+
+def iter_json_array(path, chunk_size=JSON_CHUNK_SIZE):
+    """
+    Stream the items of a file holding one JSON array, decoding one item
+    at a time. Only the current item and the unread part of the current
+    chunk are ever in memory.
+    """
+    decoder = json.JSONDecoder()
+    separators = " \t\r\n,"
+
+    with open(path, 'rb') as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError("{} isn't a JSON array".format(path))
+        buffer = buffer[1:]
+
+        while True:
+            buffer = buffer.lstrip(separators)
+            if buffer.startswith(']'):
+                return
+            try:
+                if not buffer:
+                    raise ValueError("need more data")
+                item, end = decoder.raw_decode(buffer)
+            except ValueError:
+                # an item cut off by the chunk: read at least as much
+                # again, so items bigger than chunk_size stay linear.
+                chunk = f.read(max(chunk_size, len(buffer)))
+                if not chunk:
+                    raise ValueError("{} ends mid-array".format(path))
+                buffer += chunk
+                continue
+
+            yield item
+            buffer = buffer[end:]
+
+
+def game_rows(game):
+    """
+    The rows of one ultianalytics game (as from the gamesdata endpoint),
+    shaped like read_csv's (text as unicode), so they go through
+    create_event like any other export. Uses:
+
+        game: timestamp, tournamentName, opponentName, points (a list,
+            or a JSON string of one)
+        point: line (player names), startSeconds,
+            summary: lineType, score: ours, theirs
+        event: type, action, passer, receiver, defender, timestamp
+    """
+    points = game['points']
+    if isinstance(points, basestring):
+        points = json.loads(points)
+
+    for point in points:
+        summary = point.get('summary', {})
+        score = summary.get('score', {})
+        line = list(point.get('line') or [])[:7]
+        line += [''] * (7 - len(line))
+        start = point.get('startSeconds')
+
+        for event in point.get('events', []):
+            timestamp = event.get('timestamp')
+            elapsed = (
+                timestamp - start
+                if timestamp is not None and start is not None else 0
+            )
+            row = {
+                'Date/Time': game.get('timestamp', ''),
+                'Tournamemnt': game.get('tournamentName', ''),  # sic, see read_csv
+                'Opponent': game.get('opponentName', ''),
+                'Point Elapsed Seconds': elapsed,
+                'Line': summary.get('lineType', ''),
+                'Our Score - End of Point': score.get('ours', ''),
+                'Their Score - End of Point': score.get('theirs', ''),
+                'Event Type': event.get('type', ''),
+                'Action': event.get('action', ''),
+                'Passer': event.get('passer') or '',
+                'Receiver': event.get('receiver') or '',
+                'Defender': event.get('defender') or '',
+            }
+            for i, name in enumerate(line):
+                row['Player {}'.format(i)] = name
+            yield row
+
+
+def read_games(path, chunk_size=JSON_CHUNK_SIZE):
+    """
+    Stream the event rows of a saved gamesdata dump (a JSON array of
+    games), one game in memory at a time.
+    """
+    for game in iter_json_array(path, chunk_size):
+        for row in game_rows(game):
+            yield row
+
+
+def create_player(player_info, team_id, year=YEAR):
+    """
+    Build the column values for one player row from a roster csv row.
+    """
+    return {
+        'name': player_info['Name'],
+        'gender': player_info['Gender'],
+        'position': player_info['Position'],
+        'od': player_info['OD'],
+        'team_id': team_id,
+        'year': year,
+    }
+
+
+def diff_roster(roster_rows, existing):
+    """
+    Compare roster rows against existing players ({name: Player row}).
+
+    returns
+        - dict of 'added', 'changed' and 'unchanged' lists of rows.
+          changed rows carry the existing player 'id'.
+    """
+    diff = {'added': [], 'changed': [], 'unchanged': []}
+    for row in roster_rows:
+        player = existing.get(row['name'])
+        if player is None:
+            diff['added'].append(row)
+        elif any(getattr(player, f) != row[f] for f in PLAYER_FIELDS):
+            diff['changed'].append(dict(row, id=player.id))
+        else:
+            diff['unchanged'].append(row)
+
+    return diff
+
+
+def print_roster_diff(diff):
+    # names can be anything, and stdout may be ascii
+    for sign, rows in [("+", diff['added']), ("~", diff['changed'])]:
+        for row in rows:
+            print u"{} {name} ({gender}, {position}, {od})".format(
+                sign, **row).encode('utf-8')
+    print "{} to add, {} to update, {} unchanged.".format(
+        len(diff['added']), len(diff['changed']), len(diff['unchanged']))
+
+
+def update_roster(roster_file=ROSTER_FILE, year=YEAR, team_name="Classy",
+                  dry_run=False):
+    """
+    Sync a team's roster for a season: one query for the team, one for
+    its players already in that season, one batch insert for the new
+    players.
+
+    returns
+        - dict of player name to id, for this team and season only.
+          With dry_run nothing is written, so new players aren't in it.
+    """
+    # games are counted per team (see app.lib.aggregates), so this
+    # creates the team if it's new, unless nothing is to be written
+    _, team_id = get_team_names([team_name], create=not dry_run)[team_name]
+
+    roster_rows = []
+    names = set()
+    for player_info in read_csv(roster_file):
+        row = create_player(player_info, team_id, year)
+        if row['name'] in names:
+            continue
+        names.add(row['name'])
+        roster_rows.append(row)
+
+    existing = dict(
+        (player.name, player) for player in db.session.query(
+            Player.id, Player.name, Player.gender, Player.position, Player.od
+        ).filter(Player.team_id == team_id, Player.year == year)
+    )
 
-    for player_info_list in roster_data:
-        create_player(player_info_list)
+    diff = diff_roster(roster_rows, existing)
+    print_roster_diff(diff)
 
+    name_to_id = dict(
+        (name, int(player.id)) for name, player in existing.iteritems()
+    )
+    if dry_run:
+        return name_to_id
+
+    new_ids = insert_rows_returning_ids(Player.__table__, diff['added'], 'name')
+    for name, player_id in new_ids.iteritems():
+        name_to_id[name] = int(player_id)
+
+    if diff['changed']:
+        db.session.execute(
+            Player.__table__.update().where(
+                Player.id == bindparam('player_id')
+            ).values(
+                dict((f, bindparam('new_' + f)) for f in PLAYER_FIELDS)
+            ),
+            [
+                dict(
+                    [('player_id', row['id'])] +
+                    [('new_' + f, row[f]) for f in PLAYER_FIELDS]
+                )
+                for row in diff['changed']
+            ]
+        )
+
+    if diff['added'] or diff['changed']:
+        bump_data_version()
     db.session.commit()
     print "Finished updating roster."
 
+    return name_to_id
+
 
 def generate_play(event_info):
     action = event_info['Action']
@@ -52,27 +281,31 @@ def generate_play(event_info):
     defender = event_info['Defender']
 
     if action == "Catch":
-        play = "{} to {}".format(passer, receiver)
+        play = u"{} to {}".format(passer, receiver)
     elif action == "Drop":
-        play = "Drop by {}".format(receiver)
+        play = u"Drop by {}".format(receiver)
     elif action == "D":
-        play = "Block by {}".format(defender)
+        play = u"Block by {}".format(defender)
     elif action == "Goal":
-        play = "Goal from {} to {}".format(passer, receiver)
+        play = u"Goal from {} to {}".format(passer, receiver)
     elif action == "Pull":
-        play = "Pull by {}".format(defender)
+        play = u"Pull by {}".format(defender)
     elif action == "PullOb":
-        play = "OB pull by {}".format(defender)
+        play = u"OB pull by {}".format(defender)
     elif action == "Throwaway":
-        play = "Throwaway by {}".format(passer)
+        play = u"Throwaway by {}".format(passer)
     else:
-        play = "Unknown play"
+        play = u"Unknown play"
 
     return play
 
 
 def create_event(event_info, name_to_id):
-    title = "{tourny} > {opp} > {our_score}-{their_score} > {play}".format(
+    """
+    Build the column values for one event row. Nothing is written
+    here - rows are collected and handed to write_events in batches.
+    """
+    title = u"{tourny} > {opp} > {our_score}-{their_score} > {play}".format(
         tourny=event_info['Tournamemnt'],
         opp=event_info['Opponent'],
         our_score=event_info['Our Score - End of Point'],
@@ -80,71 +313,688 @@ def create_event(event_info, name_to_id):
         play=generate_play(event_info)
     )
 
-    # Note: Finding existing title is not perfect. You could have
-    # same people throwing to each other in same point.
-    existing = Event.query.filter_by(title=title).first()
-    if existing:
-        print "Already found event {}".format(title)
-        return
+    return {
+        'date': event_info['Date/Time'],
+        'title': title,
+        'tournament': event_info['Tournamemnt'],  # their typo.
+        'opponent': event_info['Opponent'],
+        'seconds_elapsed': int(event_info['Point Elapsed Seconds']),
+        'line': event_info['Line'],
+        'our_score': event_info['Our Score - End of Point'],
+        'their_score': event_info['Their Score - End of Point'],
+        'event_type': event_info['Event Type'],
+        'action': event_info['Action'],
+        'passer': name_to_id.get(event_info['Passer']),
+        'receiver': name_to_id.get(event_info['Receiver']),
+        'defender': name_to_id.get(event_info['Defender']),
+        'player_1': name_to_id.get(event_info['Player 0']),
+        'player_2': name_to_id.get(event_info['Player 1']),
+        'player_3': name_to_id.get(event_info['Player 2']),
+        'player_4': name_to_id.get(event_info['Player 3']),
+        'player_5': name_to_id.get(event_info['Player 4']),
+        'player_6': name_to_id.get(event_info['Player 5']),
+        'player_7': name_to_id.get(event_info['Player 6']),
+    }
+
+
+def create_point(row, key):
+    """
+    Build the column values for a new point from its first event row.
+    outcome and duration are filled in once all its events are seen.
+    """
+    return {
+        'key': key,
+        'team_id': row['team_id'],
+        'year': row['year'],
+        'date': row['date'],
+        'played_at': row['played_at'],
+        'tournament': row['tournament'],
+        'opponent': row['opponent'],
+        'our_score': row['our_score'],
+        'their_score': row['their_score'],
+        'line': row['line'],
+        'outcome': None,
+        'duration': None,
+    }
+
+
+def lineup(row):
+    """
+    Distinct player ids on the line for an event row.
+    """
+    return set(row[column] for column in LINEUP_COLUMNS) - set([None])
+
+
+def existing_event_hashes():
+    """
+    Load every hash we already have in one (index only) query, so
+    duplicates can be dropped in memory before they are ever sent.
+    """
+    return set(h for (h,) in db.session.query(Event.content_hash))
+
+
+def existing_point_ids():
+    return dict(db.session.query(Point.key, Point.id))
+
+
+def stamp_event(row, hasher, team_id, year):
+    """
+    Set team_id, year, played_at and content_hash on an event row (see
+    create_event). hasher is the file's EventHasher.
+
+    returns
+        - the row's point key
+    """
+    row['team_id'] = team_id
+    row['year'] = year
+    return hasher.stamp(row)
+
+
+def write_events(rows):
+    # Anything that slipped past existing_event_hashes (say, a concurrent
+    # import) is dropped by the unique index instead of failing the batch.
+    insert_rows(Event.__table__, EVENT_COLUMNS, rows, ignore_conflicts=True)
+
+
+class EventImporter(object):
+    """
+    Dedupes event rows (see create_event) and writes them, along with
+    their points and lineups, in batches.
+
+        importer = EventImporter()
+        for row in rows:
+            importer.add(row)
+        importer.finish()
+
+    Rows have to be added in file order: an event's identity includes
+    its position within its point. Every event and point is stamped
+    with team_id and year.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, team_id=None, year=YEAR,
+                 seen=None, point_ids=None):
+        self.batch_size = batch_size
+        self.team_id = team_id
+        self.year = year
+        # importers writing side by side share these, see import_files
+        self.seen = existing_event_hashes() if seen is None else seen
+        self.point_ids = existing_point_ids() if point_ids is None else point_ids
+
+        # point keys and positions of the events seen so far
+        self.hasher = EventHasher()
+        # point key to its outcome and duration, from the rows seen
+        self.points = {}
+        # points not in the db yet: key to (row, lineup)
+        self.new_points = OrderedDict()
+        # points that got new events, and need outcome/duration updated
+        self.updated_points = set()
+        # counts of the new events, for the aggregate tables
+        self.aggregates = AggregateDeltas()
+        # every point's possessions, from all of its rows (not only new
+        # ones), so the points that changed can be rewritten whole
+        self.possessions = PossessionSegmenter()
+
+        self.batch = []
+        self.total = 0
+        self.added = 0
+        self.committed = 0
+        self.start = time.time()
+
+    def add(self, row, key=None):
+        """
+        key: the row's point key, if stamp_event was already run on it
+        """
+        self.total += 1
+        if key is None:
+            key = stamp_event(row, self.hasher, self.team_id, self.year)
+        self.track_point(key, row)
+        self.possessions.add(key, row)
+
+        if row['content_hash'] in self.seen:
+            return
+        self.seen.add(row['content_hash'])
+        self.updated_points.add(key)
+
+        self.batch.append((key, row))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def track_point(self, key, row):
+        point = self.points.get(key)
+        if point is None:
+            point = self.points[key] = {'duration': 0, 'outcome': None}
+            if key not in self.point_ids:
+                # the first event has the lineup for the entire point.
+                self.new_points[key] = (create_point(row, key), lineup(row))
+
+        point['duration'] = max(point['duration'], row['seconds_elapsed'])
+        if row['action'] == "Goal":
+            if row['event_type'] == "Offense":
+                point['outcome'] = "won"
+            else:
+                point['outcome'] = "lost"
+
+    def write_points(self):
+        if not self.new_points:
+            return
+
+        ids = insert_rows_returning_ids(
+            Point.__table__,
+            [point for point, _ in self.new_points.itervalues()],
+            'key'
+        )
+        self.point_ids.update(ids)
+        for key, (point, player_ids) in self.new_points.iteritems():
+            self.aggregates.add_point(point, player_ids)
+        insert_rows(
+            point_players,
+            ['point_id', 'player_id'],
+            [
+                {'point_id': ids[key], 'player_id': player_id}
+                for key, (_, player_ids) in self.new_points.iteritems()
+                for player_id in player_ids
+            ],
+            ignore_conflicts=True
+        )
+        self.new_points.clear()
+
+    def flush(self):
+        self.write_points()
+
+        rows = []
+        for key, row in self.batch:
+            row['point_id'] = self.point_ids[key]
+            rows.append(row)
+            self.aggregates.add_event(row)
+        write_events(rows)
+
+        self.added += len(rows)
+        self.batch = []
+
+    def write_possessions(self):
+        # only ever this team's: its points are its own (see
+        # app.lib.helpers.POINT_COLUMNS), and the replace is limited to
+        # its rows too
+        replace_rows(
+            Possession.__table__, 'point_id',
+            [self.point_ids[key] for key in self.updated_points],
+            POSSESSION_COLUMNS,
+            [
+                row for key in self.updated_points
+                for row in self.possessions.rows(key, self.point_ids[key])
+            ],
+            scope={'team_id': self.team_id, 'year': self.year}
+        )
 
-    print "Adding event {}".format(title)
-    db.session.add(
-        Event(
-            date=event_info['Date/Time'],
-            title=title,
-            tournament=event_info['Tournamemnt'],  # their typo.
-            opponent=event_info['Opponent'],
-            seconds_elapsed=int(event_info['Point Elapsed Seconds']),
-            line=event_info['Line'],
-            our_score=event_info['Our Score - End of Point'],
-            their_score=event_info['Their Score - End of Point'],
-            event_type=event_info['Event Type'],
-            action=event_info['Action'],
-            passer=name_to_id.get(event_info['Passer']),
-            receiver=name_to_id.get(event_info['Receiver']),
-            defender=name_to_id.get(event_info['Defender']),
-            player_1=name_to_id.get(event_info['Player 0']),
-            player_2=name_to_id.get(event_info['Player 1']),
-            player_3=name_to_id.get(event_info['Player 2']),
-            player_4=name_to_id.get(event_info['Player 3']),
-            player_5=name_to_id.get(event_info['Player 4']),
-            player_6=name_to_id.get(event_info['Player 5']),
-            player_7=name_to_id.get(event_info['Player 6']),
+    def update_points(self):
+        if not self.updated_points:
+            return
+
+        db.session.execute(
+            Point.__table__.update().where(
+                Point.id == bindparam('point_id')
+            ).values(
+                duration=bindparam('new_duration'),
+                outcome=bindparam('new_outcome'),
+            ),
+            [
+                {
+                    'point_id': self.point_ids[key],
+                    'new_duration': self.points[key]['duration'],
+                    'new_outcome': self.points[key]['outcome'],
+                }
+                for key in self.updated_points
+            ]
+        )
+        self.updated_points.clear()
+
+    def commit(self):
+        """
+        Write out everything added so far and commit. The importer keeps
+        its state, so more rows can be added afterwards.
+
+        returns
+            - number of new events since the last commit
+        """
+        self.flush()
+        self.write_possessions()
+        self.update_points()
+        self.aggregates.apply()
+        added = self.added - self.committed
+        if added:
+            bump_data_version()
+        db.session.commit()
+
+        self.committed = self.added
+        return added
+
+    def finish(self):
+        self.commit()
+
+        elapsed = max(time.time() - self.start, 0.001)
+        print "Imported {} new of {} events in {:.2f}s ({:.0f} rows/sec).".format(
+            self.added, self.total, elapsed, self.total / elapsed
         )
-    )
 
 
-def import_events(players_name_to_id):
+def import_events(players_name_to_id, stats_file=STATS_FILE,
+                  batch_size=BATCH_SIZE, team_name="Classy", year=YEAR,
+                  rows=None):
     # hey, get this from the API instead of downloading a csv.
     # http://www.ultianalytics.com/rest/view/team/5699535384870912/gamesdata
-    with open(STATS_FILE, 'rb') as csvfile:
-        reader = csv.DictReader(csvfile, delimiter=',')
-        reader.next()
-        event_data = [row for row in reader]
-
-    for event_info_list in event_data:
-        create_event(event_info_list, players_name_to_id)
-
-    db.session.commit()
-
+    # A saved copy of that imports with import_games.
+    _, team_id = get_team_names([team_name])[team_name]
+    importer = EventImporter(batch_size, team_id, year)
+    if rows is None:
+        rows = read_csv(stats_file)
+    for event_info in rows:
+        importer.add(create_event(event_info, players_name_to_id))
+
+    importer.finish()
+
+
+def import_games(players_name_to_id, games_file, batch_size=BATCH_SIZE,
+                 team_name="Classy", year=YEAR):
+    """
+    Import a saved gamesdata JSON dump, the same way as a csv export.
+    """
+    import_events(players_name_to_id, batch_size=batch_size,
+                  team_name=team_name, year=year, rows=read_games(games_file))
+
+
+class CsvTail(object):
+    """
+    Rows appended to a csv file since the last read(). Only whole lines
+    are parsed: a row that's still being written waits for the next
+    read. The file is expected to grow by appending; if it shrinks it's
+    read again from the start.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.fieldnames = None
+        # exports have an empty row after the header, see read_csv
+        self.skip = 1
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return []
+
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < self.offset:
+                self.offset, self.fieldnames, self.skip = 0, None, 1
+            f.seek(self.offset)
+            data = f.read()
+
+        end = data.rfind('\n') + 1
+        self.offset += end
+
+        rows = []
+        for values in csv.reader(data[:end].splitlines(True)):
+            if not values:
+                continue
+            if self.fieldnames is None:
+                self.fieldnames = values
+                continue
+            if self.skip:
+                self.skip -= 1
+                continue
+            values += [None] * (len(self.fieldnames) - len(values))
+            rows.append(decode_row(dict(zip(self.fieldnames, values))))
+
+        return rows
+
+
+class EventFollower(object):
+    """
+    Imports the rows appended to a stats file, a poll() at a time.
+
+    One EventImporter is kept for the whole run, so events keep their
+    position within their point and the points' outcomes, possessions
+    and aggregates are updated from where the last poll left off. Each
+    poll that adds events bumps the data version, so every cache picks
+    the new numbers up on its next request.
+
+    Event identity depends on all the rows before it in its point, so a
+    new follower starts at the top of the file; anything already
+    imported is skipped as in a normal import.
+    """
+
+    def __init__(self, players_name_to_id, stats_file=STATS_FILE,
+                 batch_size=BATCH_SIZE, team_id=None, year=YEAR):
+        self.name_to_id = players_name_to_id
+        self.tail = CsvTail(stats_file)
+        self.importer = EventImporter(batch_size, team_id, year)
+
+    def poll(self):
+        """
+        returns
+            - number of new events imported
+        """
+        for event_info in self.tail.read():
+            self.importer.add(create_event(event_info, self.name_to_id))
+        return self.importer.commit()
+
+
+def follow_events(players_name_to_id, stats_file=STATS_FILE, interval=2.0,
+                  batch_size=BATCH_SIZE, team_name="Classy", year=YEAR):
+    """
+    Keep importing rows as they're appended to stats_file, checking
+    every interval seconds, until interrupted.
+    """
+    _, team_id = get_team_names([team_name])[team_name]
+    follower = EventFollower(
+        players_name_to_id, stats_file, batch_size, team_id, year)
+
+    print "Following {} (ctrl-c to stop).".format(stats_file)
+    try:
+        while True:
+            added = follower.poll()
+            if added:
+                print "{} imported {} new events ({} so far).".format(
+                    time.strftime('%H:%M:%S'), added, follower.importer.added)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        follower.importer.finish()
+
+
+# Importing many teams and seasons at once: parse workers read, check
+# and hash the stats files, a single writer (this process) dedupes and
+# writes them.
+
+FILE_PATTERNS = [
+    # classy_roster_2016.csv, classy_data_2016.csv
+    re.compile(r'^(?P<team>.+)_(?P<kind>roster|data)_(?P<year>\d{4})\.(csv|json)$'),
+    # roster_Classy_2016.csv, stats_Classy_2016.csv (see benchmarks.generate)
+    re.compile(r'^(?P<kind>roster|stats)_(?P<team>.+)_(?P<year>\d{4})\.(csv|json)$'),
+]
+
+REQUIRED_COLUMNS = [
+    'Date/Time', 'Tournamemnt', 'Opponent', 'Point Elapsed Seconds', 'Line',
+    'Our Score - End of Point', 'Their Score - End of Point', 'Event Type',
+    'Action', 'Passer', 'Receiver', 'Defender',
+] + ['Player {}'.format(i) for i in range(7)]
+NUMBER_COLUMNS = [
+    'Point Elapsed Seconds', 'Our Score - End of Point',
+    'Their Score - End of Point',
+]
+
+
+def find_import_files(paths):
+    """
+    Roster and stats files in paths (directories, files or globs), paired
+    up by the team and season in their names. Stats can be csv exports or
+    gamesdata JSON dumps.
+
+    returns
+        - list of (team name, year, roster path, stats path). Either path
+          is None if there's no such file.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+            ))
+        else:
+            files.extend(sorted(glob.glob(path)))
+
+    pairs = {}
+    for path in files:
+        for pattern in FILE_PATTERNS:
+            match = pattern.match(os.path.basename(path))
+            if match:
+                break
+        else:
+            continue
+
+        kind = 'roster' if match.group('kind') == 'roster' else 'stats'
+        pairs.setdefault((match.group('team'), match.group('year')), {})[kind] = path
+
+    return [
+        (team, year, pair.get('roster'), pair.get('stats'))
+        for (team, year), pair in sorted(pairs.iteritems())
+    ]
+
+
+def validate_event(event_info):
+    """
+    returns
+        - why an event row (as from read_csv) can't be imported, or None
+    """
+    missing = [c for c in REQUIRED_COLUMNS if event_info.get(c) is None]
+    if missing:
+        return "missing {}".format(", ".join(missing))
+    for column in NUMBER_COLUMNS:
+        try:
+            int(event_info[column])
+        except ValueError:
+            return "{} isn't a number: {!r}".format(column, event_info[column])
+    if event_info['Line'] not in ("O", "D"):
+        return "unknown line {!r}".format(event_info['Line'])
+    if event_info['Event Type'] not in ("Offense", "Defense"):
+        return "unknown event type {!r}".format(event_info['Event Type'])
+    return None
+
+
+def read_events(stats_file):
+    if stats_file.endswith('.json'):
+        return read_games(stats_file)
+    return read_csv(stats_file)
+
+
+_parse_queue = None
+
+
+def _init_parse_worker(queue):
+    global _parse_queue
+    _parse_queue = queue
+
+
+def parse_events(task):
+    """
+    Parse worker: read, check and hash one stats file, and send its rows
+    to the writer PARSE_CHUNK_SIZE at a time, in file order.
+
+    Messages are (kind, task id, payload): 'rows' with a list of (point
+    key, row), then 'done' with counts, or 'error' with what went wrong.
+    """
+    task_id, stats_file, name_to_id, team_id, year = task
+    start = time.time()
+    hasher = EventHasher()
+    chunk = []
+    count = invalid = 0
+    problems = []
+    try:
+        for number, event_info in enumerate(read_events(stats_file), 1):
+            problem = validate_event(event_info)
+            if problem:
+                invalid += 1
+                if len(problems) < 5:
+                    problems.append("event {}: {}".format(number, problem))
+                continue
+
+            row = create_event(event_info, name_to_id)
+            chunk.append((stamp_event(row, hasher, team_id, year), row))
+            count += 1
+            if len(chunk) >= PARSE_CHUNK_SIZE:
+                _parse_queue.put(('rows', task_id, chunk))
+                chunk = []
+
+        _parse_queue.put(('rows', task_id, chunk))
+        _parse_queue.put(('done', task_id, {
+            'rows': count,
+            'invalid': invalid,
+            'problems': problems,
+            'parse_time': time.time() - start,
+        }))
+    except Exception as e:
+        _parse_queue.put(('error', task_id, "{}: {}".format(type(e).__name__, e)))
+
+
+def get_team_names(names, create=True):
+    """
+    The team for each name, matched case-insensitively, creating the ones
+    that don't exist yet.
+
+    args:
+        - create: False to leave new teams out instead, with id None
+
+    returns
+        - dict of name to (team name, team id)
+    """
+    teams = dict(
+        (name.lower(), (name, team_id))
+        for name, team_id in db.session.query(Team.name, Team.id)
+    )
+    if create:
+        for name in names:
+            if name.lower() not in teams:
+                team = Team(name=name)
+                db.session.add(team)
+                db.session.flush()
+                teams[name.lower()] = (team.name, team.id)
+        db.session.commit()
+
+    return dict(
+        (name, teams.get(name.lower(), (name, None))) for name in names
+    )
 
-def get_names_to_ids():
-    players = Player.query.all()
 
-    players_name_to_id = {}
-    for player in players:
-        players_name_to_id[player.name] = int(player.id)
+def import_files(paths, processes=None, batch_size=BATCH_SIZE):
+    """
+    Import every roster and stats file in paths (see find_import_files).
 
-    return players_name_to_id
+    Rosters are synced first, in this process: they're small, and the
+    workers need the player ids. Stats files are then parsed on a pool of
+    processes (one per core by default), which hand their rows over a
+    bounded queue to this process, the only one writing. Each file gets
+    its own EventImporter, sharing the dedupe state.
+    """
+    files = find_import_files(paths)
+    if not files:
+        print "No roster or stats files in {}.".format(" ".join(paths))
+        return
 
+    teams = get_team_names(set(team for team, _, _, _ in files))
+    tasks = []
+    for team, year, roster_file, stats_file in files:
+        team_name, team_id = teams[team]
+        if roster_file:
+            name_to_id = update_roster(roster_file, year, team_name)
+        else:
+            name_to_id = get_names_to_ids(team_id, year)
+        if stats_file:
+            tasks.append((len(tasks), stats_file, name_to_id, team_id, year))
+    if not tasks:
+        return
 
-def main():
-    update_roster()
+    seen = existing_event_hashes()
+    point_ids = existing_point_ids()
 
-    players_name_to_id = get_names_to_ids()
+    start = time.time()
+    queue = multiprocessing.Queue(QUEUE_SIZE)
+    pool = multiprocessing.Pool(
+        min(processes or multiprocessing.cpu_count(), len(tasks)),
+        initializer=_init_parse_worker, initargs=(queue,)
+    )
+    parsed = pool.map_async(parse_events, tasks)
+    pool.close()
+
+    importers = {}
+    remaining = len(tasks)
+    added = total = 0
+    try:
+        while remaining:
+            try:
+                kind, task_id, payload = queue.get(timeout=1)
+            except Empty:
+                if parsed.ready():
+                    raise RuntimeError("parse workers exited early")
+                continue
+
+            _, stats_file, _, team_id, year = tasks[task_id]
+            importer = importers.get(task_id)
+            if importer is None:
+                importer = importers[task_id] = EventImporter(
+                    batch_size, team_id, year, seen, point_ids)
+
+            if kind == 'rows':
+                for key, row in payload:
+                    importer.add(row, key)
+                continue
+
+            importer.commit()
+            del importers[task_id]
+            remaining -= 1
+            added += importer.added
+            total += importer.total
+
+            elapsed = max(time.time() - importer.start, 0.001)
+            if kind == 'error':
+                print "{}: failed after {} rows: {}".format(
+                    stats_file, importer.total, payload)
+                continue
+            print "{}: {} new of {} events in {:.2f}s ({:.0f} rows/sec, {:.2f}s parsing){}".format(
+                stats_file, importer.added, importer.total, elapsed,
+                importer.total / elapsed, payload['parse_time'],
+                ", {} invalid".format(payload['invalid']) if payload['invalid'] else ""
+            )
+            for problem in payload['problems']:
+                print "  " + problem
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    elapsed = max(time.time() - start, 0.001)
+    print "Imported {} new of {} events from {} files in {:.2f}s ({:.0f} rows/sec).".format(
+        added, total, len(tasks), elapsed, total / elapsed)
+
+
+def get_names_to_ids(team_id, year=YEAR):
+    """
+    Names are only unique within a team's season (two teams can both
+    have a Sam), so only look at that one.
+    """
+    players = db.session.query(Player.name, Player.id).filter(
+        Player.team_id == team_id, Player.year == year)
+
+    return dict((name, int(player_id)) for name, player_id in players)
+
+
+def main(dry_run=False, follow=False, stats_file=STATS_FILE, interval=2.0,
+         games_file=None):
+    players_name_to_id = update_roster(dry_run=dry_run)
+    if dry_run:
+        return
 
-    import_events(players_name_to_id)
+    if games_file:
+        import_games(players_name_to_id, games_file)
+    elif follow:
+        follow_events(players_name_to_id, stats_file, interval)
+    else:
+        import_events(players_name_to_id, stats_file)
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dry-run', action='store_true',
+                        help="show roster changes without writing anything")
+    parser.add_argument('--stats-file', default=STATS_FILE)
+    parser.add_argument('--games-file',
+                        help="import a saved ultianalytics gamesdata JSON "
+                             "dump instead of the stats csv")
+    parser.add_argument('--follow', action='store_true',
+                        help="keep importing rows appended to the stats file")
+    parser.add_argument('--interval', type=float, default=2.0,
+                        help="seconds between checks for new rows, with --follow")
+    args = parser.parse_args()
+
+    main(dry_run=args.dry_run, follow=args.follow, stats_file=args.stats_file,
+         interval=args.interval, games_file=args.games_file)
@@ -1,5 +1,12 @@
-from app import create_app, create_db
-from flask.ext.script import Manager
+import json
+
+import import_data
+from app import app, create_app, create_db, db
+from app.lib import (
+    aggregates, possessions, season_reports, stats_snapshot, warmup
+)
+from app.lib.cache import bump_data_version
+from flask.ext.script import Command, Manager, Option
 
 manager = Manager(create_app, with_default_commands=True)
 manager.add_option('-x', '--xconfig', dest='config', default='Development')
@@ -12,5 +19,74 @@ def initdb(env='Development'):
     app = create_app(env)
     create_db(app)
 
+
+@manager.command
+def rebuild_aggregates():
+    # recount the aggregate tables from every event, see app.lib.aggregates,
+    # and resegment the possessions, see app.lib.possessions
+    aggregates.rebuild()
+    possessions.rebuild()
+    bump_data_version()
+    db.session.commit()
+    print "Rebuilt aggregate and possession tables."
+
+
+@manager.command
+def verify_aggregates():
+    mismatches = aggregates.verify()
+    for name, key, stored, expected in mismatches:
+        print "{} {}: stored {}, expected {}".format(name, key, stored, expected)
+    print "{} aggregate rows differ from the events.".format(len(mismatches))
+    return 1 if mismatches else 0
+
+
+@manager.command
+def report(output='season_report.json', processes=0):
+    # every analytic for each team and season, on one process per core
+    # unless --processes says otherwise. see app.lib.season_reports
+    pairs = season_reports.report_pairs()
+    reports = season_reports.generate_reports(pairs, int(processes) or None)
+    with open(output, 'w') as f:
+        json.dump(reports, f, indent=2, sort_keys=True)
+    print "Wrote {}".format(output)
+
+
+@manager.command
+def snapshot(output=None):
+    # every read-only API response, for the views to serve without the
+    # database. Writes SNAPSHOT_PATH unless --output says otherwise. see
+    # app.lib.stats_snapshot
+    output = output or app.config['SNAPSHOT_PATH'] or 'stats_snapshot.bin'
+    responses, size = stats_snapshot.build(output)
+    print "Wrote {} responses to {} ({} bytes).".format(
+        responses, output, size)
+
+
+@manager.command
+def warm_up():
+    # load and time what gunicorn's master loads before forking workers,
+    # see app.lib.warmup
+    warmup.warm_up()
+
+
+class Import(Command):
+    """
+    Import roster and stats files for any number of teams and seasons,
+    parsing on every core. Files are paired up by name, see
+    import_data.find_import_files.
+    """
+
+    option_list = (
+        Option('paths', nargs='+', help="directories, files or globs"),
+        Option('-p', '--processes', type=int, default=0,
+               help="parse workers, one per core by default"),
+    )
+
+    def run(self, paths, processes):
+        import_data.import_files(paths, processes or None)
+
+
+manager.add_command('import', Import())
+
 if __name__ == '__main__':
     manager.run()
@@ -0,0 +1,122 @@
+"""
+Fixtures shared by the tests.
+
+Tests run against a throwaway SQLite file. Set TEST_DATABASE_URL to a
+scratch Postgres database to run them there instead, along with the
+Postgres-only ones (COPY, ON CONFLICT); every table in it is dropped.
+
+    $ TEST_DATABASE_URL=postgresql://localhost/frisbee_test python -m pytest
+"""
+import os
+from contextlib import contextmanager
+
+import pytest
+
+import import_data
+from app import app, db
+from app.models import Event, Point, Possession, Team, point_players
+from benchmarks.generate import generate
+from benchmarks.run import clear_caches
+
+# two games of one team, as a csv export (stats.csv, with roster.csv) and
+# as a gamesdata JSON dump (gamesdata.json)
+DATA = os.path.join(os.path.dirname(__file__), 'data')
+ROSTER = os.path.join(DATA, 'roster.csv')
+STATS = os.path.join(DATA, 'stats.csv')
+GAMES = os.path.join(DATA, 'gamesdata.json')
+
+
+@contextmanager
+def empty_database(tmpdir):
+    """
+    Empty tables, and nothing cached from another test's database.
+    """
+    app.config['SQLALCHEMY_DATABASE_URI'] = (
+        os.environ.get('TEST_DATABASE_URL') or
+        'sqlite:///' + str(tmpdir.join('test.db'))
+    )
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        clear_caches()
+        yield db
+        db.session.remove()
+        db.drop_all()
+    clear_caches()
+
+
+@pytest.fixture
+def database(tmpdir):
+    with empty_database(tmpdir) as database:
+        yield database
+
+
+@pytest.fixture
+def postgres(database):
+    if db.engine.dialect.name != 'postgresql':
+        pytest.skip("needs TEST_DATABASE_URL to be a Postgres database")
+    return database
+
+
+def imported():
+    """
+    Every event, point, lineup and possession, told apart by content
+    rather than id, to compare two imports of the same games.
+    """
+    keys = dict(db.session.query(Point.id, Point.key))
+
+    def rows(table):
+        columns = [column for column in table.columns if column.name != 'id']
+        return sorted(
+            tuple(
+                keys.get(value) if column.name == 'point_id' else value
+                for column, value in zip(columns, row)
+            )
+            for row in db.session.execute(
+                table.select().with_only_columns(columns))
+        )
+
+    return (
+        rows(Event.__table__), rows(Point.__table__),
+        rows(point_players), rows(Possession.__table__),
+    )
+
+
+def import_generated(files):
+    """
+    Import what benchmarks.generate wrote, as benchmarks.run does.
+    """
+    for team in sorted(set(team for team, _, _, _ in files)):
+        db.session.add(Team(name=team))
+    db.session.commit()
+
+    for team, year, roster_path, stats_path in files:
+        name_to_id = import_data.update_roster(roster_path, year, team)
+        import_data.import_events(
+            name_to_id, stats_path, team_name=team, year=year)
+
+
+def import_season(tmpdir):
+    files = generate(str(tmpdir.join('data')), games=3, seasons=2, teams=2)
+    import_generated(files)
+    return files
+
+
+@pytest.fixture
+def season(database, tmpdir):
+    """
+    A few generated games for two teams over two seasons, imported.
+    """
+    return import_season(tmpdir)
+
+
+@pytest.fixture(scope='module')
+def shared_season(tmpdir_factory):
+    """
+    season, imported once for all the tests of a module. For tests that
+    only read it.
+    """
+    tmpdir = tmpdir_factory.mktemp('season')
+    with empty_database(tmpdir):
+        yield import_season(tmpdir)
@@ -0,0 +1,112 @@
+import json
+
+import pytest
+
+import import_data
+from app import app, db
+from app.lib import aggregates
+from app.lib.cache import bump_data_version
+from app.lib.reports import build_report
+from app.models import DataVersion, Event, GameStats, Point, TournamentStats
+from tests.conftest import ROSTER, STATS
+
+# the aggregate tables have no dates
+SCOPES = [
+    {},
+    {'team_id': 1},
+    {'year': '2017'},
+    {'team_id': 2, 'year': '2016'},
+    {'team_id': 3},
+]
+
+
+def test_import_matches_rebuild(season):
+    assert aggregates.verify() == []
+
+    aggregates.rebuild()
+    assert aggregates.verify() == []
+
+
+def test_tournaments_per_team_and_season(season):
+    # generated teams play the same tournaments
+    rows = TournamentStats.query.all()
+    assert len(set(row.tournament for row in rows)) == 1
+    assert len(rows) == 4
+
+    for row in rows:
+        events = Event.query.filter_by(
+            team_id=row.team_id, year=row.year, tournament=row.tournament)
+        points = Point.query.filter_by(
+            team_id=row.team_id, year=row.year, tournament=row.tournament)
+        assert row.events == events.count()
+        assert row.points == points.count()
+
+    games = db.session.query(
+        GameStats.team_id, GameStats.year, db.func.sum(GameStats.points)
+    ).group_by(GameStats.team_id, GameStats.year).all()
+    assert dict(((t, y), p) for t, y, p in games) == dict(
+        ((row.team_id, row.year), row.points) for row in rows
+    )
+
+
+def test_games_and_tournaments_views(season):
+    client = app.test_client()
+    for path in ['/api/games', '/api/tournaments']:
+        everything = json.loads(client.get(path).data)
+        team = json.loads(client.get(path + '?team_id=1&year=2016').data)
+        assert team
+        assert all(
+            row['team_id'] == 1 and row['year'] == '2016' for row in team
+        )
+        assert len(team) < len(everything)
+
+
+@pytest.mark.parametrize('name', sorted(aggregates.READERS))
+@pytest.mark.parametrize('scope', SCOPES)
+def test_aggregate_matches_python(shared_season, name, scope):
+    assert build_report([name], backend='aggregate', **scope) == \
+        build_report([name], backend='python', **scope)
+
+
+def test_handler_split_by_each_events_line(database, tmpdir):
+    # Fay, a handler, goes off for Hal, a cutter, after the first point's
+    # third event
+    with open(STATS, 'rb') as f:
+        lines = f.read().splitlines(True)
+    lines[5:9] = [line.replace(",Fay", ",Hal") for line in lines[5:9]]
+    path = tmpdir.join('stats.csv')
+    path.write(''.join(lines), mode='wb')
+
+    import_data.import_events(
+        import_data.update_roster(ROSTER, '2016', "Classy"), str(path),
+        year='2016')
+
+    split = build_report(['handler_gender_split'], backend='aggregate')
+    assert split == build_report(['handler_gender_split'], backend='python')
+    assert split == build_report(['handler_gender_split'], backend='sql')
+    assert split['handler_gender_split'] == {
+        'total': 11, '1-2': 5, '1-1': 4, '0-1': 2,
+    }
+
+
+def test_python_until_rebuilt(season, monkeypatch):
+    monkeypatch.setitem(app.config, 'STATS_BACKEND', 'aggregate')
+    assert aggregates.built()
+    report = build_report()
+
+    # as a migration leaves tables it adds to a database with events
+    for name in aggregates.TABLES:
+        db.session.execute(aggregates._table(name).delete())
+    DataVersion.query.filter_by(id=1).update({'aggregates_built': False})
+    bump_data_version()
+    db.session.commit()
+
+    assert not aggregates.built()
+    assert build_report() == report
+    assert build_report(backend='aggregate') != report
+
+    aggregates.rebuild()
+    bump_data_version()
+    db.session.commit()
+    assert aggregates.built()
+    assert build_report(backend='aggregate') == report
@@ -0,0 +1,89 @@
+from datetime import datetime
+
+from app import db
+from app.lib.bulk import copy_rows, csv_field, insert_rows, replace_rows
+from app.lib.possessions import POSSESSION_COLUMNS
+from app.models import Event, Point, Possession, Team
+
+
+def test_csv_field():
+    assert csv_field(None) == ''
+    assert csv_field(3) == '3'
+    assert csv_field('') == '""'
+    assert csv_field(u'Bob "the arm" \xe9') == '"Bob ""the arm"" \xc3\xa9"'
+    assert csv_field(datetime(2016, 6, 4, 9)) == '"2016-06-04 09:00:00"'
+
+
+def test_copy_rows_loads_none_as_null(postgres):
+    columns = ['content_hash', 'date', 'action', 'passer', 'receiver',
+               'player_7', 'played_at']
+    copy_rows(Event.__table__, columns, [
+        dict(content_hash='a', date='', action='Pull', passer=None,
+             receiver=None, player_7=None, played_at=None),
+    ])
+
+    event = Event.query.one()
+    assert event.passer is None
+    assert event.receiver is None
+    assert event.player_7 is None
+    assert event.played_at is None
+    # a quoted empty string is still a string
+    assert event.date == ''
+
+
+def test_copy_rows_ignore_conflicts_keeps_nulls(postgres):
+    # through the staging table, as event batches and point lineups go
+    columns = ['content_hash', 'action', 'passer', 'receiver', 'defender']
+    rows = [
+        dict(content_hash='a', action='Pull', passer=None, receiver=None,
+             defender=None),
+        dict(content_hash='b', action='Goal', passer=None, receiver=None,
+             defender=None),
+    ]
+    copy_rows(Event.__table__, columns, rows, ignore_conflicts=True)
+    copy_rows(Event.__table__, columns, rows + [
+        dict(content_hash='c', action='Throwaway', passer=None,
+             receiver=None, defender=None),
+    ], ignore_conflicts=True)
+
+    events = Event.query.order_by(Event.content_hash).all()
+    assert [e.content_hash for e in events] == ['a', 'b', 'c']
+    assert all(
+        e.passer is None and e.receiver is None and e.defender is None
+        for e in events
+    )
+
+
+def test_insert_rows_nullable_columns(postgres):
+    # points and possessions are written with outcome and duration unset
+    insert_rows(Possession.__table__, POSSESSION_COLUMNS, [
+        dict(dict.fromkeys(POSSESSION_COLUMNS), offense=True),
+    ])
+    insert_rows(Point.__table__, ['key', 'outcome', 'duration'], [
+        dict(key='p', outcome=None, duration=None),
+    ], ignore_conflicts=True)
+
+    possession = Possession.query.one()
+    assert possession.outcome is None and possession.offense is True
+    point = Point.query.one()
+    assert point.outcome is None and point.duration is None
+
+
+def test_replace_rows_scope(database):
+    db.session.add_all([Team(id=1, name="Classy"), Team(id=2, name="Other")])
+    db.session.add(Point(id=1, key='p'))
+    db.session.flush()
+
+    def possession(team_id, events):
+        return dict(dict.fromkeys(POSSESSION_COLUMNS), point_id=1,
+                    team_id=team_id, year='2016', events=events)
+
+    insert_rows(Possession.__table__, POSSESSION_COLUMNS, [
+        possession(1, 3), possession(2, 4),
+    ])
+    replace_rows(Possession.__table__, 'point_id', [1], POSSESSION_COLUMNS,
+                 [possession(2, 5)], scope={'team_id': 2, 'year': '2016'})
+
+    assert sorted(
+        (p.team_id, p.events) for p in Possession.query
+    ) == [(1, 3), (2, 5)]
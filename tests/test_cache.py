@@ -0,0 +1,94 @@
+from datetime import datetime
+
+from werkzeug.contrib.cache import _test_memcached_key
+
+from app import app
+from app.lib.cache import cache_key, versioned
+from app.lib.cache_backends import LRUCache
+from app.lib.instrument import instrumented
+from app.lib.reports import build_report
+from app.models import Event
+from benchmarks.run import unwrap
+
+
+def test_cache_key_is_a_memcached_key():
+    key = cache_key(
+        'app.lib.reports.build_report', 12,
+        ([u'receives by gender'], None), {'start': datetime(2016, 6, 4)}
+    )
+    assert _test_memcached_key(key)
+    assert key.startswith('app.lib.reports.build_report:12:')
+
+    assert key == cache_key(
+        'app.lib.reports.build_report', 12,
+        ([u'receives by gender'], None), {'start': datetime(2016, 6, 4)}
+    )
+    assert key != cache_key(
+        'app.lib.reports.build_report', 12,
+        ([u'receives by gender'], None), {'start': datetime(2016, 6, 5)}
+    )
+    assert key != cache_key(
+        'app.lib.reports.build_report', 13,
+        ([u'receives by gender'], None), {'start': datetime(2016, 6, 4)}
+    )
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_bytes=300)
+    for key in 'abc':
+        assert cache.set(key, key * 80)
+    assert cache.get('a') == 'a' * 80
+
+    # b was used longest ago
+    assert cache.set('d', 'd' * 80)
+    assert cache.get('b') is None
+    assert [cache.get(key) is not None for key in 'acd'] == [True] * 3
+    assert cache.size <= 300
+
+
+def test_lru_refuses_values_over_max_bytes():
+    cache = LRUCache(max_bytes=300)
+    cache.set('a', 'a' * 80)
+    cache.set('big', 'b' * 80)
+
+    # too big on its own: not kept, and the rest are left alone
+    assert not cache.set('big', 'b' * 400)
+    assert cache.get('big') is None
+    assert cache.get('a') == 'a' * 80
+    assert cache.size == len(cache._entries['a'])
+    assert cache.size <= 300
+
+
+def test_versioned_keys(season, monkeypatch):
+    keys = []
+    get = app.cache.get
+
+    def record(key):
+        keys.append(key)
+        return get(key)
+    monkeypatch.setattr(app.cache, 'get', record)
+
+    build_report(team_id=1, year='2016', start=datetime(2016, 1, 1))
+    Event.top_lineups(3, team_id=1)
+    Event.conversion_rate(year=u'2016')
+    assert len(keys) == 3
+    assert all(_test_memcached_key(key) for key in keys)
+
+    # and they're found again
+    build_report(team_id=1, year='2016', start=datetime(2016, 1, 1))
+    assert keys[-1] == keys[0]
+    assert app.cache.get(keys[0]) is not None
+
+
+def test_decorators_keep_the_undecorated_function():
+    def points(player_id):
+        """
+        Points played.
+        """
+        return player_id
+
+    decorated = instrumented(versioned(points))
+    assert decorated.__name__ == 'points'
+    assert decorated.__doc__ == points.__doc__
+    assert decorated.__wrapped__.__wrapped__ is points
+    assert unwrap(decorated) is points
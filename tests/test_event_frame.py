@@ -0,0 +1,196 @@
+"""
+The python backend's metrics, computed over an EventFrame a column at a
+time, against plain loops over Event rows like the ones they replaced.
+"""
+from collections import Counter, OrderedDict
+
+import numpy as np
+import pytest
+
+from app import app
+from app.lib.event_frame import (
+    LINEUP_COLUMNS, NO_PLAYER, EventFrame, get_frame
+)
+from app.lib.helpers import gender_split
+from app.lib.reports import METRICS, _build_report, build_report
+from app.models import Event, Player
+
+SCOPES = [(None, None), (1, None), (None, '2017'), (2, '2016'), (3, None)]
+
+
+def events_in(team_id, year):
+    query = Event.query
+    if team_id is not None:
+        query = query.filter(Event.team_id == team_id)
+    if year is not None:
+        query = query.filter(Event.year == year)
+    return query.order_by(Event.point_id, Event.id).all()
+
+
+def reference_report(team_id, year):
+    """
+    Every metric, from Event and Player rows.
+    """
+    events = events_in(team_id, year)
+    players = Player.query.all()
+    female = set(p.id for p in players if p.gender == "F")
+    male = set(p.id for p in players if p.gender == "M")
+    handlers = set(p.id for p in players if p.position == "Handler")
+    cutters = set(p.id for p in players if p.position == "Cutter")
+
+    points = OrderedDict()
+    for event in events:
+        points.setdefault(event.point_id, []).append(event)
+
+    def split(ids):
+        return gender_split(
+            len(ids),
+            len([i for i in ids if i in female]),
+            len([i for i in ids if i in male])
+        )
+
+    def for_position(ids, position, name):
+        split = gender_split(*[
+            len([i for i in ids if i in position and i in gender])
+            for gender in [position, female, male]
+        ])
+        return {
+            'position': name,
+            'female': split['female'],
+            'male': split['male'],
+        }
+
+    passes = [
+        e for e in events if e.passer is not None and e.receiver is not None
+    ]
+    same_gender = [
+        e for e in passes
+        if e.passer in male and e.receiver in male or
+        e.passer in female and e.receiver in female
+    ]
+    receivers = [e.receiver for e in events if e.receiver is not None]
+    scorers = [
+        e.receiver for e in events
+        if e.action == "Goal" and e.receiver is not None
+    ]
+    goals = split(scorers)
+    del goals['total']
+
+    handler_split = Counter()
+    for event in events:
+        lineup = [getattr(event, column) for column in LINEUP_COLUMNS]
+        handler_split["{}-{}".format(
+            len([p for p in lineup if p in male & handlers]),
+            len([p for p in lineup if p in female & handlers]),
+        )] += 1
+    if events:
+        handler_split['total'] = len(events)
+
+    # every receive in a point, once per goal scored in it
+    winning = []
+    losing = []
+    for point in points.itervalues():
+        point_receivers = [e.receiver for e in point if e.receiver is not None]
+        for event in point:
+            if event.action == "Goal":
+                if event.receiver is None:
+                    losing.extend(point_receivers)
+                else:
+                    winning.extend(point_receivers)
+
+    points_played = Counter()
+    for point in points.itervalues():
+        # the first event has the lineup for the entire point
+        for column in LINEUP_COLUMNS:
+            player_id = getattr(point[0], column)
+            if player_id is not None:
+                points_played[player_id] += 1
+
+    return {
+        'off_gender_passes': {
+            'off_gender': len(passes) - len(same_gender),
+            'same_gender': len(same_gender),
+        },
+        'goals_by_gender': goals,
+        'dees_by_gender': split(
+            [e.defender for e in events if e.defender is not None]
+        ),
+        'receives_by_gender': split(receivers),
+        'handler_gender_split': dict(handler_split),
+        'gender_contribution_to_score': {
+            'winning': split(winning),
+            'losing': split(losing),
+        },
+        'receives_for_handlers': for_position(receivers, handlers, 'handlers'),
+        'receives_for_cutters': for_position(receivers, cutters, 'cutters'),
+        'points_played': dict(points_played),
+    }
+
+
+def test_reference_covers_every_metric(shared_season):
+    assert sorted(reference_report(None, None)) == sorted(METRICS)
+
+
+@pytest.mark.parametrize('team_id,year', SCOPES)
+def test_python_backend_matches_rows(shared_season, team_id, year):
+    expected = reference_report(team_id, year)
+    report = build_report(backend='python', team_id=team_id, year=year)
+    for name in METRICS:
+        assert report[name] == expected[name], name
+
+
+@pytest.mark.parametrize('team_id,year', SCOPES)
+def test_chunked_scan_matches_rows(shared_season, monkeypatch, team_id, year):
+    # chunks smaller than a point, so points are held back between them
+    monkeypatch.setitem(app.config, 'SCAN_BATCH_SIZE', 7)
+    assert _build_report(None, 'python', team_id, year) == \
+        reference_report(team_id, year)
+
+
+def test_frame_columns_match_rows(shared_season):
+    frame = get_frame()
+    events = events_in(None, None)
+
+    def column(name):
+        return [getattr(e, name) or NO_PLAYER for e in events]
+
+    assert frame.ids.tolist() == [e.id for e in events]
+    assert [frame.action_names[a] for a in frame.actions] == \
+        [e.action for e in events]
+    assert frame.passer.tolist() == column('passer')
+    assert frame.receiver.tolist() == column('receiver')
+    assert frame.defender.tolist() == column('defender')
+    assert frame.lineups.tolist() == [
+        [getattr(e, c) or NO_PLAYER for c in LINEUP_COLUMNS] for e in events
+    ]
+
+    point_ids = sorted(set(e.point_id for e in events))
+    assert frame.num_points == len(point_ids)
+    assert frame.points.tolist() == [point_ids.index(e.point_id) for e in events]
+    # every point's first event
+    first = dict((e.point_id, e) for e in reversed(events))
+    assert frame.lines.tolist() == [first[p].line for p in point_ids]
+    assert frame.point_lineups().tolist() == [
+        [getattr(first[p], c) or NO_PLAYER for c in LINEUP_COLUMNS]
+        for p in point_ids
+    ]
+
+
+def test_chunks_concat_to_the_whole_frame(shared_season):
+    frame = get_frame()
+    chunks = list(EventFrame.iter_chunks(batch_size=50))
+    assert len(chunks) > 1
+    joined = EventFrame.concat(chunks)
+
+    for name in ['ids', 'passer', 'receiver', 'defender', 'lineups',
+                 'points', 'lines']:
+        assert np.array_equal(getattr(joined, name), getattr(frame, name))
+    assert [joined.action_names[a] for a in joined.actions] == \
+        [frame.action_names[a] for a in frame.actions]
+
+
+def test_empty_frame():
+    frame = EventFrame.from_rows([])
+    assert len(frame) == 0
+    assert frame.num_points == 0
+    assert frame.id_space() == 1
@@ -0,0 +1,64 @@
+"""
+Follow mode: rows appended to a stats file between polls.
+"""
+import import_data
+from app.models import Event
+from tests.conftest import ROSTER, STATS, empty_database, imported
+
+
+def stats_lines():
+    with open(STATS, 'rb') as f:
+        return f.read().splitlines(True)
+
+
+def test_follow_matches_one_shot_import(tmpdir):
+    lines = stats_lines()
+    # the header and the empty row after it, then 11 events
+    assert len(lines) == 13
+    path = tmpdir.join('stats.csv')
+
+    with empty_database(tmpdir.mkdir('follow')):
+        name_to_id = import_data.update_roster(ROSTER, '2016', "Classy")
+        team_id = import_data.get_team_names(["Classy"])["Classy"][1]
+        follower = import_data.EventFollower(
+            name_to_id, str(path), team_id=team_id, year='2016')
+
+        assert follower.poll() == 0
+
+        # partway into a point, and partway through writing a row
+        path.write(''.join(lines[:6]) + lines[6][:20], mode='wb')
+        assert follower.poll() == 4
+        assert Event.query.count() == 4
+
+        path.write(lines[6][20:] + ''.join(lines[7:10]), mode='ab')
+        assert follower.poll() == 4
+        assert follower.poll() == 0
+
+        path.write(''.join(lines[10:]), mode='ab')
+        assert follower.poll() == 3
+        assert Event.query.count() == 11
+        followed = imported()
+
+    with empty_database(tmpdir.mkdir('once')):
+        import_data.import_events(
+            import_data.update_roster(ROSTER, '2016', "Classy"), STATS,
+            year='2016')
+        assert imported() == followed
+
+
+def test_follow_skips_what_was_imported(database, tmpdir):
+    lines = stats_lines()
+    path = tmpdir.join('stats.csv')
+    path.write(''.join(lines[:8]), mode='wb')
+
+    name_to_id = import_data.update_roster(ROSTER, '2016', "Classy")
+    import_data.import_events(name_to_id, str(path), year='2016')
+    team_id = import_data.get_team_names(["Classy"])["Classy"][1]
+
+    # a new follower starts from the top, and only adds what's new
+    follower = import_data.EventFollower(
+        name_to_id, str(path), team_id=team_id, year='2016')
+    assert follower.poll() == 0
+    path.write(''.join(lines[8:]), mode='ab')
+    assert follower.poll() == 5
+    assert Event.query.count() == 11
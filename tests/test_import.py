@@ -0,0 +1,106 @@
+import import_data
+from app import db
+from app.lib.event_frame import LINEUP_COLUMNS
+from app.lib.reports import build_report
+from app.models import Event, Player, Point, Possession, Team
+from benchmarks.generate import generate
+from tests.conftest import ROSTER, STATS
+
+PLAYER_COLUMNS = ['passer', 'receiver', 'defender'] + LINEUP_COLUMNS
+
+
+def players_per_team_season():
+    return dict(
+        ((team_id, year), count) for team_id, year, count in
+        db.session.query(
+            Player.team_id, Player.year, db.func.count()
+        ).group_by(Player.team_id, Player.year)
+    )
+
+
+def events_with_other_teams_players():
+    """
+    Events naming a player who isn't on the event's team that season.
+    """
+    rosters = dict(
+        (player_id, (team_id, year)) for player_id, team_id, year in
+        db.session.query(Player.id, Player.team_id, Player.year)
+    )
+    wrong = []
+    for event in Event.query:
+        for column in PLAYER_COLUMNS:
+            player_id = getattr(event, column)
+            if player_id is not None and \
+                    rosters[player_id] != (event.team_id, event.year):
+                wrong.append((event.id, column))
+    return wrong
+
+
+def test_update_roster_per_team(season):
+    # generated teams share every player name
+    counts = players_per_team_season()
+    assert len(counts) == 4
+    assert set(counts.values()) == set([28])
+    assert events_with_other_teams_players() == []
+
+
+def test_import_files_shared_names(database, tmpdir):
+    data = str(tmpdir.join('data'))
+    generate(data, games=2, seasons=1, teams=2)
+    import_data.import_files([data], processes=2)
+
+    counts = players_per_team_season()
+    assert sorted(counts.values()) == [28, 28]
+    assert events_with_other_teams_players() == []
+
+    for (team_id,) in db.session.query(Team.id):
+        # what stats files without a roster are imported with
+        name_to_id = import_data.get_names_to_ids(team_id, '2016')
+        assert set(name_to_id.values()) == set(
+            player_id for (player_id,) in
+            db.session.query(Player.id).filter(Player.team_id == team_id)
+        )
+        assert build_report(backend='aggregate', team_id=team_id) == \
+            build_report(backend='python', team_id=team_id)
+
+
+def test_same_file_for_two_teams(database):
+    team_ids = []
+    for team in ["Classy", "Other"]:
+        name_to_id = import_data.update_roster(ROSTER, '2016', team)
+        import_data.import_events(name_to_id, STATS, team_name=team, year='2016')
+        team_ids.append(import_data.get_team_names([team])[team][1])
+
+    for team_id in team_ids:
+        assert Event.query.filter_by(team_id=team_id).count() == 11
+        assert Point.query.filter_by(team_id=team_id).count() == 3
+        players = set(
+            player_id for (player_id,) in
+            db.session.query(Player.id).filter(Player.team_id == team_id)
+        )
+        played = Event.points_played_by_players(team_id=team_id)
+        assert played and set(played) <= players
+    assert db.session.query(Event.id).join(Point).filter(
+        Event.team_id != Point.team_id).count() == 0
+    assert events_with_other_teams_players() == []
+
+
+def test_possessions_per_team(database):
+    possessions = {}
+    for team in ["Classy", "Other"]:
+        name_to_id = import_data.update_roster(ROSTER, '2016', team)
+        import_data.import_events(name_to_id, STATS, team_name=team, year='2016')
+        team_id = import_data.get_team_names([team])[team][1]
+        possessions[team] = sorted(
+            (p.sequence, p.offense, p.events, p.outcome) for p in
+            Possession.query.filter_by(team_id=team_id)
+        )
+
+    # the second import left the first team's alone
+    classy = import_data.get_team_names(["Classy"])["Classy"][1]
+    assert sorted(
+        (p.sequence, p.offense, p.events, p.outcome) for p in
+        Possession.query.filter_by(team_id=classy)
+    ) == possessions["Classy"]
+    assert possessions["Classy"] == possessions["Other"]
+    assert len(possessions["Classy"]) == 7
@@ -0,0 +1,66 @@
+"""
+A saved gamesdata JSON dump imports the same as the csv export of the
+same games. tests/data has both, for two games of one team, with some
+non-ASCII names.
+"""
+import import_data
+from app import db
+from app.models import Event
+from tests.conftest import GAMES, ROSTER, STATS, empty_database, imported
+
+
+def import_roster():
+    # adds the team too; importing it again changes nothing
+    return import_data.update_roster(ROSTER, '2016', "Classy")
+
+
+def import_csv():
+    import_data.import_events(import_roster(), STATS, year='2016')
+
+
+def import_json(chunk_size=import_data.JSON_CHUNK_SIZE):
+    name_to_id = import_roster()
+    import_data.import_events(
+        name_to_id, year='2016',
+        rows=import_data.read_games(GAMES, chunk_size))
+
+
+def test_read_games_matches_read_csv():
+    fields = import_data.read_csv(STATS).next().keys()
+    csv_rows = [
+        dict((field, unicode(row[field])) for field in fields)
+        for row in import_data.read_csv(STATS)
+    ]
+    json_rows = [
+        dict((field, unicode(row[field])) for field in fields)
+        for row in import_data.read_games(GAMES)
+    ]
+    assert json_rows == csv_rows
+
+
+def test_json_import_matches_csv(tmpdir):
+    with empty_database(tmpdir.mkdir('csv')):
+        import_csv()
+        from_csv = imported()
+        tournaments = set(t for (t,) in db.session.query(Event.tournament))
+    with empty_database(tmpdir.mkdir('json')):
+        # small chunks, so games are cut off mid-item
+        import_json(chunk_size=64)
+        from_json = imported()
+
+    events, points, lineups, possessions = from_csv
+    assert len(events) == 11
+    assert tournaments == set([u"Summer League", u"Coupe d'\xc9t\xe9"])
+    assert len(points) == 3
+    # the second point was played with six
+    assert len(lineups) == 20
+    assert from_json == from_csv
+
+
+def test_json_after_csv_adds_nothing(database):
+    import_csv()
+    from_csv = imported()
+
+    import_json()
+    assert imported() == from_csv
+    assert Event.query.count() == 11
@@ -0,0 +1,68 @@
+"""
+Query budgets for the analytics the dashboard hits. None of them should
+run more queries as the data grows; an N+1 slipping in blows the budget.
+"""
+import pytest
+
+from app import app
+from app.lib.instrument import QueryBudgetExceeded, query_budget
+from app.lib.reports import build_report
+from app.models import Event, Player
+from benchmarks.run import clear_caches
+
+# name, queries cold, queries once cached (the data version), analytic
+# of one player
+BUDGETS = [
+    ('female_passing_percentage', 6, 1,
+     lambda player: player.female_passing_percentage()),
+    ('build_report[aggregate]', 12, 1,
+     lambda player: build_report(backend='aggregate')),
+    ('build_report[aggregate] for a season', 12, 1,
+     lambda player: build_report(backend='aggregate', team_id=1, year='2016')),
+    ('build_report[python]', 5, 1,
+     lambda player: build_report(backend='python')),
+    ('build_report[python] for a season', 4, 1,
+     lambda player: build_report(backend='python', team_id=1, year='2016')),
+    ('build_report[sql]', 13, 1,
+     lambda player: build_report(backend='sql')),
+    ('points_played_by_players', 2, 1,
+     lambda player: Event.points_played_by_players()),
+    ('pass_network', 8, 1,
+     lambda player: Event.pass_network()),
+    ('top_lineups', 4, 1,
+     lambda player: Event.top_lineups(3)),
+    ('conversion_rate', 3, 1,
+     lambda player: Event.conversion_rate()),
+    ('line_split_count', 2, 2,
+     lambda player: Event.line_split_count("O")),
+    ('receives_by_gender 4-3', 5, 4,
+     lambda player: Event.receives_by_gender(breakdown="4-3")),
+]
+
+
+@pytest.mark.parametrize(
+    'cold,warm,analytic', [budget[1:] for budget in BUDGETS],
+    ids=[budget[0] for budget in BUDGETS]
+)
+def test_query_budget(shared_season, cold, warm, analytic):
+    player = Player.query.order_by(Player.id).first()
+    clear_caches()
+
+    with query_budget(cold):
+        analytic(player)
+    with query_budget(warm):
+        analytic(player)
+
+
+def test_report_request_budget(shared_season):
+    clear_caches()
+    client = app.test_client()
+    with query_budget(12):
+        assert client.get('/api/report').status_code == 200
+
+
+def test_query_budget_exceeded(shared_season):
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(1):
+            Player.query.all()
+            Event.query.count()
@@ -0,0 +1,93 @@
+"""
+The bitset engine against a plain count over point_players.
+"""
+from collections import defaultdict
+from itertools import combinations
+
+import pytest
+
+from app import db
+from app.lib.lineups import FULL_LINE, STATS, LineupEngine, get_lineups
+from app.models import Point, point_players
+
+
+def brute_force(size, team_id=None, min_points=1):
+    """
+    Stats for every group of size players (whole lineups for FULL_LINE),
+    counted point by point.
+    """
+    query = db.session.query(Point.id, Point.line, Point.outcome)
+    if team_id is not None:
+        query = query.filter(Point.team_id == team_id)
+    points = dict((point_id, (line, outcome)) for point_id, line, outcome in query)
+
+    lineups = defaultdict(set)
+    for point_id, player_id in db.session.execute(point_players.select()):
+        if point_id in points:
+            lineups[point_id].add(player_id)
+
+    counts = defaultdict(lambda: dict((stat, 0) for stat in STATS))
+    for point_id, players in lineups.items():
+        line, outcome = points[point_id]
+        if size == FULL_LINE:
+            groups = [tuple(sorted(players))] if len(players) == FULL_LINE else []
+        else:
+            groups = combinations(sorted(players), size)
+        for group in groups:
+            stats = counts[group]
+            stats['points'] += 1
+            stats['o_points'] += line == "O"
+            stats['d_points'] += line == "D"
+            stats['won'] += outcome == "won"
+            stats['lost'] += outcome == "lost"
+            stats['holds'] += line == "O" and outcome == "won"
+            stats['breaks'] += line == "D" and outcome == "won"
+
+    return dict(
+        (group, stats) for group, stats in counts.items()
+        if stats['points'] >= min_points
+    )
+
+
+def engine_counts(engine, size, min_points=1):
+    if size == FULL_LINE:
+        groups = engine.full_lines(min_points)
+    else:
+        groups = engine.combinations(size, min_points)
+    return dict(
+        (stats.player_ids, dict((stat, getattr(stats, stat)) for stat in STATS))
+        for stats in groups
+    )
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, FULL_LINE])
+def test_counts_match_brute_force(shared_season, size):
+    expected = brute_force(size)
+    assert expected
+    assert engine_counts(get_lineups(), size) == expected
+
+
+# generated lines are random sevens, so no full line repeats
+@pytest.mark.parametrize('size', [2, 3])
+def test_min_points(shared_season, size):
+    min_points = 3
+    expected = brute_force(size, min_points=min_points)
+    assert expected
+    assert engine_counts(get_lineups(), size, min_points) == expected
+
+
+def test_team_counts_match_brute_force(shared_season):
+    for size in [2, FULL_LINE]:
+        assert engine_counts(LineupEngine.load(team_id=1), size) == \
+            brute_force(size, team_id=1)
+
+
+def test_group_matches_brute_force(shared_season):
+    pairs = brute_force(2)
+    engine = get_lineups()
+    for group, stats in sorted(pairs.items())[:20]:
+        line = engine.group(group)
+        assert dict((stat, getattr(line, stat)) for stat in STATS) == stats
+
+    # a player that never played
+    assert engine.group(group + (-1,)).points == 0
@@ -0,0 +1,120 @@
+"""
+Backfills in alembic/versions, run against a database shaped like the
+one they upgrade.
+"""
+import imp
+import os
+
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+import import_data
+from benchmarks.generate import generate
+
+VERSIONS = os.path.join(os.path.dirname(__file__), '..', 'alembic', 'versions')
+
+
+def migration(name):
+    return imp.load_source(
+        'migration_' + name.split('_')[0], os.path.join(VERSIONS, name))
+
+
+def run(engine, fn, *args):
+    with engine.begin() as conn:
+        with Operations.context(MigrationContext.configure(conn)):
+            fn(*args)
+
+
+def legacy_events(tmpdir):
+    """
+    A generated stats file imported the way the importer did before
+    content hashes: a row is left out if its title was seen before.
+
+    returns
+        - the engine, the stats file, and every row of it as
+          create_event makes them
+    """
+    roster, stats = generate(str(tmpdir.join('data')), games=3)[0][2:]
+    name_to_id = dict(
+        (row['Name'], i) for i, row in enumerate(import_data.read_csv(roster), 1)
+    )
+    rows = [
+        import_data.create_event(row, name_to_id)
+        for row in import_data.read_csv(stats)
+    ]
+
+    engine = sa.create_engine('sqlite:///' + str(tmpdir.join('legacy.db')))
+    metadata = sa.MetaData()
+    events = sa.Table(
+        'events', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('title', sa.String(255)),
+        sa.Column('date', sa.String(55)),
+        sa.Column('tournament', sa.String(55)),
+        sa.Column('opponent', sa.String(55)),
+        sa.Column('our_score', sa.Integer),
+        sa.Column('their_score', sa.Integer),
+        sa.Column('action', sa.String(25)),
+        sa.Column('passer', sa.Integer),
+        sa.Column('receiver', sa.Integer),
+        sa.Column('defender', sa.Integer),
+        sa.Column('content_hash', sa.String(40)),
+    )
+    metadata.create_all(engine)
+
+    titles = set()
+    stored = []
+    for row in rows:
+        if row['title'] not in titles:
+            titles.add(row['title'])
+            stored.append(dict(
+                (column.name, row.get(column.name)) for column in events.columns
+                if column.name not in ('id', 'content_hash')
+            ))
+    engine.execute(events.insert(), stored)
+
+    return engine, stats, rows
+
+
+def file_hashes(module, rows):
+    """
+    Every row's hash, as importing the whole file computes them.
+    """
+    positions = {}
+    hashes = []
+    for row in rows:
+        point = module.point_key(row)
+        position = positions.get(point, 0)
+        hashes.append(module.event_hash(row, position))
+        positions[point] = position + 1
+    return hashes
+
+
+def test_content_hash_backfill_of_a_legacy_import(tmpdir):
+    module = migration('1c5e9a7b2d40_add_event_content_hash.py')
+    engine, stats, rows = legacy_events(tmpdir)
+    stored = engine.execute('SELECT count(*) FROM events').scalar()
+    # the generated games do repeat titles
+    assert stored < len(rows)
+
+    run(engine, module.backfill, stats)
+    hashes = set(h for (h,) in engine.execute('SELECT content_hash FROM events'))
+
+    # importing the file again only adds the rows left out
+    full = set(file_hashes(module, rows))
+    assert len(hashes) == stored
+    assert hashes <= full
+    assert len(full - hashes) == len(rows) - stored
+
+
+def test_content_hash_backfill_without_the_file(tmpdir):
+    module = migration('1c5e9a7b2d40_add_event_content_hash.py')
+    engine, stats, rows = legacy_events(tmpdir)
+
+    # numbered in the order they were stored: every event still gets a
+    # hash of its own, but positions after a left out row are off
+    run(engine, module.backfill, str(tmpdir.join('missing.csv')))
+    hashes = set(h for (h,) in engine.execute('SELECT content_hash FROM events'))
+    assert len(hashes) == engine.execute('SELECT count(*) FROM events').scalar()
+    assert not hashes <= set(file_hashes(module, rows))
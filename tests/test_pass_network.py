@@ -0,0 +1,108 @@
+"""
+The pass network of tests/data, worked out by hand:
+
+    Ann -> Dan  catch        Dan -> Cat  catch     Dan  throwaway
+    Cat -> Bea  catch        Cat -> Hal  goal
+    Bea -> Eli  drop         Fay -> Ann  goal
+"""
+import numpy as np
+import pytest
+
+import import_data
+from app.lib.pass_network import PassNetwork
+from tests.conftest import ROSTER, STATS
+
+# (passes, completions, drops, goals)
+PASSES = {
+    (u"Ann", u"Dan"): (1, 1, 0, 0),
+    (u"B\xe9a", u"Eli"): (1, 0, 1, 0),
+    (u"Cat", u"B\xe9a"): (1, 1, 0, 0),
+    (u"Cat", u"Hal"): (1, 1, 0, 1),
+    (u"Dan", u"Cat"): (1, 1, 0, 0),
+    (u"Fay", u"Ann"): (1, 1, 0, 1),
+}
+
+
+@pytest.fixture
+def name_to_id(database):
+    name_to_id = import_data.update_roster(ROSTER, '2016', "Classy")
+    import_data.import_events(name_to_id, STATS, year='2016')
+    return name_to_id
+
+
+def edges(network, names):
+    """
+    Every (passer, receiver): counts, read off the CSR arrays.
+    """
+    result = {}
+    for i, passer in enumerate(network.player_ids):
+        for j in range(network.indptr[i], network.indptr[i + 1]):
+            receiver = network.player_ids[network.receivers[j]]
+            result[names[passer], names[receiver]] = tuple(
+                int(network.counts[name][j])
+                for name in ['passes', 'completions', 'drops', 'goals']
+            )
+    return result
+
+
+def test_csr():
+    network = PassNetwork(
+        [(7, 3, 4, 3, 1, 0), (3, 7, 2, 2, 0, 1), (3, 1, 5, 5, 0, 0)],
+        [(9, 2), (1, 0)]
+    )
+    assert network.player_ids.tolist() == [1, 3, 7, 9]
+    # 3 throws to 1 and 7, 7 to 3
+    assert network.indptr.tolist() == [0, 0, 2, 3, 3]
+    assert network.receivers.tolist() == [0, 2, 1]
+    assert network.counts['passes'].tolist() == [5, 2, 4]
+    assert network.counts['goals'].tolist() == [0, 1, 0]
+    assert network.throwaways.tolist() == [0, 0, 0, 2]
+    assert network.throws().tolist() == [0, 7, 4, 2]
+
+
+@pytest.mark.parametrize('load', [PassNetwork.load, PassNetwork.load_events])
+def test_edge_weights(name_to_id, load):
+    names = dict((player_id, name) for name, player_id in name_to_id.items())
+    network = load()
+
+    assert edges(network, names) == PASSES
+    # everyone but Gus, who never threw or caught
+    assert sorted(names[i] for i in network.player_ids) == sorted(
+        set(names.values()) - set([u"Gus"]))
+
+    throws = dict(
+        (names[i], int(n)) for i, n in zip(network.player_ids, network.throws())
+    )
+    assert throws == {
+        u"Ann": 1, u"B\xe9a": 1, u"Cat": 2, u"Dan": 2, u"Eli": 0, u"Fay": 1,
+        u"Hal": 0,
+    }
+
+
+def test_connections_and_genders(name_to_id):
+    network = PassNetwork.load()
+
+    # Bea and Hal tie on completions: in receiver order
+    assert network.connections(name_to_id[u"Cat"]) == [
+        {'receiver_id': name_to_id[u"B\xe9a"], 'passes': 1, 'completions': 1,
+         'drops': 0, 'goals': 0},
+        {'receiver_id': name_to_id[u"Hal"], 'passes': 1, 'completions': 1,
+         'drops': 0, 'goals': 1},
+    ]
+    assert network.connections(name_to_id[u"Cat"], k=1, by='goals')[0][
+        'receiver_id'] == name_to_id[u"Hal"]
+    assert network.connections(name_to_id[u"Gus"]) == []
+
+    assert network.gender_flow() == {
+        'F': {'F': 2, 'M': 3, 'unknown': 0},
+        'M': {'F': 1, 'M': 0, 'unknown': 0},
+        'unknown': {'F': 0, 'M': 0, 'unknown': 0},
+    }
+    assert network.gender_flow('goals')['F'] == {'F': 1, 'M': 1, 'unknown': 0}
+
+    # Dan's throwaway counts as a throw, to no one
+    assert network.gender_counts(name_to_id[u"Dan"]) == (2, 1, 0)
+    assert network.gender_splits()[name_to_id[u"Cat"]] == {
+        'total': 2, 'female': '50.00%', 'male': '50.00%',
+    }
+    assert not np.any(network.passes_to("M")[network.throws() == 0])
@@ -0,0 +1,127 @@
+"""
+Possessions of hand-built points, and the conversion rates of the
+tests/data games.
+"""
+import import_data
+from app import db
+from app.lib import possessions
+from app.lib.possessions import PossessionSegmenter
+from app.models import Event, Possession
+from tests.conftest import ROSTER, STATS
+
+
+def events(line, *actions):
+    """
+    Rows for one point, an event every 5 seconds: actions are
+    (event_type, action).
+    """
+    return [
+        {'event_type': event_type, 'action': action, 'line': line,
+         'seconds_elapsed': 5 * i, 'team_id': 1, 'year': '2016'}
+        for i, (event_type, action) in enumerate(actions, 1)
+    ]
+
+
+def summary(rows):
+    return [
+        (row['sequence'], row['offense'], row['seconds_elapsed'],
+         row['duration'], row['events'], row['outcome'])
+        for row in rows
+    ]
+
+
+def test_segments_a_point():
+    segmenter = PossessionSegmenter()
+    for row in events(
+        "D",
+        ("Defense", "Pull"),
+        ("Defense", "Catch"),
+        ("Defense", "D"),
+        ("Offense", "Catch"),
+        ("Offense", "Catch"),
+        ("Offense", "Throwaway"),
+        ("Defense", "Catch"),
+        ("Defense", "Drop"),
+        ("Offense", "Catch"),
+        ("Offense", "Goal"),
+    ):
+        segmenter.add('point', row)
+
+    rows = segmenter.rows('point', 7)
+    assert summary(rows) == [
+        (0, False, 5, 10, 3, "d"),
+        (1, True, 20, 10, 3, "throwaway"),
+        (2, False, 35, 5, 2, "drop"),
+        (3, True, 45, 5, 2, "goal"),
+    ]
+    assert all(row['point_id'] == 7 and row['line'] == "D" for row in rows)
+
+
+def test_unfinished_possessions():
+    segmenter = PossessionSegmenter()
+    first = events("O", ("Offense", "Catch"), ("Defense", "Catch"))
+    second = events("D", ("Defense", "Pull"), ("Defense", "Catch"))
+
+    # points interleaved, each in order; a change of side without an
+    # ending action starts a new possession
+    for a, b in zip(first, second):
+        segmenter.add('first', a)
+        segmenter.add('second', b)
+
+    assert summary(segmenter.rows('first', 1)) == [
+        (0, True, 5, 0, 1, None),
+        (1, False, 10, 0, 1, None),
+    ]
+    assert summary(segmenter.rows('second', 2)) == [
+        (0, False, 5, 5, 2, None),
+    ]
+    assert segmenter.rows('missing', 3) == []
+
+
+def test_ended_possession_is_not_reopened():
+    # their turnover went unrecorded: our next throw starts a new one
+    segmenter = PossessionSegmenter()
+    for row in events(
+        "O",
+        ("Offense", "Throwaway"),
+        ("Offense", "Catch"),
+        ("Offense", "Goal"),
+    ):
+        segmenter.add('point', row)
+
+    assert summary(segmenter.rows('point', 1)) == [
+        (0, True, 5, 0, 1, "throwaway"),
+        (1, True, 10, 5, 2, "goal"),
+    ]
+
+
+def test_conversion_rate(database):
+    name_to_id = import_data.update_roster(ROSTER, '2016', "Classy")
+    import_data.import_events(name_to_id, STATS, year='2016')
+
+    # two O points, both won: a throwaway, a drop and a goal, then a
+    # goal; one D point, lost without getting the disc
+    assert Event.conversion_rate() == {
+        'O': {'points': 2, 'won': 2, 'possessions': 4, 'goals': 2,
+              'conversion': '50.00', 'hold_rate': '100.00'},
+        'D': {'points': 1, 'won': 0, 'possessions': 0, 'goals': 0,
+              'conversion': None, 'break_rate': '0.00'},
+    }
+
+
+def test_rebuild_matches_import(database):
+    name_to_id = import_data.update_roster(ROSTER, '2016', "Classy")
+    import_data.import_events(name_to_id, STATS, year='2016')
+
+    def rows():
+        return sorted(
+            (p.point_id, p.sequence, p.line, p.offense, p.seconds_elapsed,
+             p.duration, p.events, p.outcome)
+            for p in Possession.query
+        )
+
+    imported = rows()
+    assert len(imported) == 7
+    possessions.rebuild()
+    db.session.commit()
+    assert rows() == imported
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+import pytest
+
+from app.lib.pushdown import PUSHDOWNS
+from app.lib.reports import METRICS, build_report
+
+SCOPES = [
+    {},
+    {'team_id': 1},
+    {'year': '2017'},
+    {'team_id': 2, 'year': '2016'},
+    {'team_id': 3},
+    {'start': datetime(2016, 1, 2)},
+    {'team_id': 1, 'start': datetime(2017, 1, 1), 'end': datetime(2017, 1, 3)},
+]
+
+
+def test_pushdowns_are_metrics():
+    # metrics without one use the python backend either way
+    assert set(PUSHDOWNS) <= set(METRICS)
+
+
+@pytest.mark.parametrize('name', list(METRICS))
+@pytest.mark.parametrize('scope', SCOPES)
+def test_sql_matches_python(shared_season, name, scope):
+    assert build_report([name], backend='sql', **scope) == \
+        build_report([name], backend='python', **scope)
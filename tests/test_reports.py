@@ -0,0 +1,41 @@
+import pytest
+
+from app import db
+from app.lib.cache import bump_data_version
+from app.lib.helpers import gender_split
+from app.lib.reports import BACKENDS, build_report
+from app.models import Player
+
+
+def test_gender_split_of_nothing():
+    assert gender_split(0, 0, 0) == {'total': 0, 'female': None, 'male': None}
+    assert gender_split(4, 1, 3) == {
+        'total': 4, 'female': '25.00%', 'male': '75.00%'
+    }
+
+
+@pytest.mark.parametrize('backend', sorted(BACKENDS))
+def test_report_for_a_season_without_games(season, backend):
+    report = build_report(backend=backend, year='1999')
+
+    nothing = {'total': 0, 'female': None, 'male': None}
+    assert report['receives_by_gender'] == nothing
+    assert report['dees_by_gender'] == nothing
+    assert report['goals_by_gender'] == {'female': None, 'male': None}
+    assert report['gender_contribution_to_score'] == {
+        'winning': nothing, 'losing': nothing,
+    }
+    assert report['receives_for_handlers'] == {
+        'position': 'handlers', 'female': None, 'male': None,
+    }
+    assert report['off_gender_passes'] == {'off_gender': 0, 'same_gender': 0}
+    assert report['points_played'] == {}
+
+
+def test_female_passing_percentage_without_throws(season):
+    player = Player(name="Bench", gender="F", year='2016')
+    db.session.add(player)
+    bump_data_version()
+    db.session.commit()
+
+    assert player.female_passing_percentage() == "Bench: no throws"
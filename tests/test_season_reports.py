@@ -0,0 +1,25 @@
+import json
+
+from app.lib import season_reports
+
+
+def test_report_pairs(shared_season):
+    assert season_reports.report_pairs() == [
+        (1, "Team0", "2016"), (1, "Team0", "2017"),
+        (2, "Team1", "2016"), (2, "Team1", "2017"),
+    ]
+
+
+def test_pooled_reports_match_serial(shared_season):
+    pairs = season_reports.report_pairs()
+    serial = {}
+    for team_id, team_name, year in pairs:
+        report = season_reports.season_report(team_id, year)
+        assert not [
+            name for name, value in report.items()
+            if isinstance(value, dict) and 'error' in value
+        ]
+        serial.setdefault(team_name, {})[year] = report
+
+    pooled = season_reports.generate_reports(pairs, processes=2)
+    assert json.dumps(pooled, sort_keys=True) == json.dumps(serial, sort_keys=True)
@@ -0,0 +1,104 @@
+import gzip
+import hashlib
+import json
+from StringIO import StringIO
+
+import pytest
+
+from app import app, db
+from app.lib import stats_snapshot
+from app.lib.cache import bump_data_version
+from app.lib.instrument import tally
+from app.models import Player
+
+
+@pytest.fixture
+def snapshot_path(season, tmpdir, monkeypatch):
+    """
+    A snapshot of the season, served by a loader of its own.
+    """
+    path = str(tmpdir.join('stats_snapshot.bin'))
+    monkeypatch.setitem(app.config, 'SNAPSHOT_PATH', path)
+    monkeypatch.setitem(app.config, 'SNAPSHOT_CHECK_SECONDS', 0)
+    monkeypatch.setattr(stats_snapshot, '_loader', stats_snapshot.SnapshotLoader())
+    stats_snapshot.build(path)
+    return path
+
+
+def add_player(name):
+    # as an import would: the data version moves on with it
+    with app.test_request_context():
+        db.session.add(Player(name=name, gender="F", team_id=1, year="2016"))
+        bump_data_version()
+        db.session.commit()
+
+
+def names(response):
+    return set(player['name'] for player in json.loads(response.data))
+
+
+def test_served_from_snapshot(snapshot_path):
+    client = app.test_client()
+    with tally() as current:
+        response = client.get('/api/players')
+    assert current.queries == 0
+    assert response.status_code == 200
+
+    live = stats_snapshot.render('/api/players', [])
+    assert response.data == live
+    assert response.headers['ETag'] == '"{}"'.format(hashlib.sha1(live).hexdigest())
+
+    zipped = client.get('/api/players', headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.GzipFile(fileobj=StringIO(zipped.data)).read() == live
+
+
+def test_not_modified(snapshot_path):
+    client = app.test_client()
+    etag = client.get('/api/players?team_id=1').headers['ETag']
+
+    response = client.get('/api/players?team_id=1', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == ''
+    assert client.get(
+        '/api/players', headers={'If-None-Match': '"other"'}
+    ).status_code == 200
+
+
+def test_live_responses_have_the_snapshot_etag(snapshot_path, monkeypatch):
+    client = app.test_client()
+    served = client.get('/api/players')
+    monkeypatch.setitem(app.config, 'SNAPSHOT_PATH', None)
+    live = client.get('/api/players')
+    assert live.headers['ETag'] == served.headers['ETag']
+    assert live.data == served.data
+
+
+def test_reloaded_when_the_file_changes(snapshot_path):
+    client = app.test_client()
+    assert "New" not in names(client.get('/api/players'))
+
+    # the snapshot is never checked against the db (SNAPSHOT_CHECK_SECONDS
+    # is 0), so only a new file shows the new player
+    add_player("New")
+    assert "New" not in names(client.get('/api/players'))
+
+    stats_snapshot.build(snapshot_path)
+    assert "New" in names(client.get('/api/players'))
+
+
+def test_stale_snapshot_is_computed_live(snapshot_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'SNAPSHOT_CHECK_SECONDS', 30)
+    client = app.test_client()
+    etag = client.get('/api/players').headers['ETag']
+    assert stats_snapshot.get_snapshot() is not None
+
+    add_player("New")
+    # checked less than 30 seconds ago
+    assert "New" not in names(client.get('/api/players'))
+
+    stats_snapshot._loader.checked = 0
+    response = client.get('/api/players')
+    assert "New" in names(response)
+    assert response.headers['ETag'] != etag
+    assert stats_snapshot.get_snapshot() is None
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from app import app
+
+
+@pytest.fixture
+def client(season):
+    return app.test_client()
+
+
+@pytest.mark.parametrize('query', [
+    'year=1999',
+    'start=2030-01-01',
+    'start=2016-02-01&end=2016-02-28',
+    'team_id=99',
+])
+def test_report_without_games(client, query):
+    response = client.get('/api/report?' + query)
+    assert response.status_code == 200
+
+    report = json.loads(response.data)
+    assert report['receives_by_gender'] == {
+        'total': 0, 'female': None, 'male': None,
+    }
+    assert report['points_played'] == {}
+
+
+def test_report_date_range(client):
+    # every generated game is in January
+    everything = json.loads(client.get('/api/report?year=2016').data)
+    january = json.loads(client.get(
+        '/api/report?year=2016&start=2016-01-01&end=2016-01-31').data)
+    assert january == everything
+
+
+@pytest.mark.parametrize('query', ['start=yesterday', 'end=2016-13-01'])
+def test_bad_dates(client, query):
+    assert client.get('/api/report?' + query).status_code == 400